@@ -4,6 +4,8 @@ This directory is a configuration file for all paths used by this application.
 
 """
 
+import os
+
 dirs = {
     'models':                   {'install': False, 'path': 'models/'},
     'config':                   {'install': False, 'path': 'config/'},
@@ -29,7 +31,9 @@ dirs = {
     'output_rel':               {'install': True,  'path': 'data/output/rel/'},
     'output_ngram':             {'install': True,  'path': 'data/output/ngram/'},
     'output_html':              {'install': True,  'path': 'data/output/html/'},
+    'output_json':              {'install': True,  'path': 'data/output/json/'},
     'output_cache':             {'install': True,  'path': 'data/output/cache/'},
+    'output_cache_corpus':      {'install': True,  'path': 'data/output/cache/corpus/'},
 
     'output_comparison':        {'install': True,  'path': 'data/output/comparison/sentences/'},
     'output_allenai_openie':    {'install': True,  'path': 'data/output/comparison/allenai_openie/'},
@@ -55,3 +59,21 @@ def should_skip_file(fn):
         return True
     else:
         return False
+
+
+def get_dir(name):
+    """Returns the path of one of the folders above, creating it if it does not exist yet, e.g.: for the folders
+    added after the setup was run.
+
+    Args:
+        name: The key of the folder in dirs.
+
+    Returns:
+        A string with the path.
+    """
+    path = dirs[name]['path']
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    return path
@@ -1,11 +1,8 @@
-import spacy
-import os
+from parsers_cache import get_cached_tokens_by_word
+from parsers_backend import get_input_files, load_spacy_model, parse_texts_from_spacy
 
-from directories import dirs, should_skip_file
-from parsers_cache import get_cached_tokens
 
-
-def get_uncached_tokens():
+def get_uncached_tokens(batch_size=16):
     """Loops through the input files and yields each token, avoids reading from cache files
     given that these cache files are word oriented (e.g.: they keep sentences only for specific
     words such as "improves" or "finds" and ignores all others).
@@ -13,40 +10,51 @@ def get_uncached_tokens():
     This iterator is appropriate for when all words need to be considered (e.g.: when attempting
     to calculate global statistics on the corpus).
 
+    Args:
+        batch_size: How many files are parsed in each batch by the SpaCy pipeline.
+
     Yields:
         A pair with the Spacy token (spacy.Token) and its sentence (spacy.Span).
      """
-    en_nlp = spacy.load('en')
+    en_nlp = load_spacy_model()
 
-    for fn in os.listdir(dirs['raw_input']['path']):
+    def texts():
+        for file_id, name in get_input_files():
+            with open(name, 'r') as file_input:
+                yield file_input.read()
 
-        if should_skip_file(fn):
-            continue
+    for en_doc in parse_texts_from_spacy(en_nlp, texts(), batch_size):
+        for sentence in en_doc.sents:
+            for token in sentence:
+                yield token, sentence
 
-        name = dirs['raw_input']['path'] + fn
 
-        with open(name, 'r') as file_input:
-            raw_text = file_input.read()
+def get_tokens_by_word(args, words):
+    """Iterates through tokens for all the given words at once, reading the corpus only once. Tokens are streamed
+    from the cache, so the first ones are yielded before the sentences of the next ones are read.
 
-        en_doc = en_nlp(raw_text)
+    Args:
+        args: The command line arguments.
+        words: A list with the words being searched for.
 
-        for sentence in en_doc.sents:
-            for token in sentence:
-                yield token, sentence
+    Yields:
+        A tuple with the word, the Spacy token (spacy.Token) and its sentence (spacy.Span).
+    """
+    for word, token, sentence in get_cached_tokens_by_word(args, words):
+        if token.pos_ != "VERB":
+            continue
+
+        yield word, token, sentence
 
 
 def get_tokens(args):
-    """Iterates through tokens for the given word being currently searched.
+    """Iterates through tokens for the given word being currently searched. Tokens are streamed from the cache, so
+    the first ones are yielded before the sentences of the next ones are read.
 
     Yields:
         A pair with the Spacy token (spacy.Token) and its sentence (spacy.Span).
     """
-    sentences = get_cached_tokens(args)
-
-    for token, sentence in sentences:
-        if token.pos_ != "VERB":
-            continue
-            
+    for word, token, sentence in get_tokens_by_word(args, [args.tetre_word]):
         yield token, sentence
 
 
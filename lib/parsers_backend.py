@@ -4,11 +4,13 @@ from __future__ import unicode_literals
 import os
 import re
 import sys
+import multiprocessing
 
 import spacy
 import spacy.en
 from directories import dirs, should_skip_file
-from tree_utils import spacysentence_to_fullsentence
+from tree_utils import spacysentence_to_fullsentence, SpacySentence
+from tree_columnar import materialize
 
 
 def raw_parsing(text):
@@ -36,19 +38,14 @@ def raw_parsing(text):
     return text
 
 
-def get_tree_from_spacy(argv):
-    """Parses the raw text using SpaCy.
-
-    Args:
-        argv: The command line arguments.
+def get_input_files():
+    """Lists the raw input files in a stable order, assigning each of them its file id.
 
     Returns:
-        A list of tree.FullSentence objects, the sentences parsed from the raw text.
+        A list of pairs with the file id and the full path of each file to be parsed. The file id is the position
+        of the file in the sorted folder listing, so skipped files still consume an id.
     """
-
-    en_nlp = spacy.en.English()
-
-    sentences = []
+    files = []
 
     file_id = 0
 
@@ -61,30 +58,319 @@ def get_tree_from_spacy(argv):
         if should_skip_file(fn):
             continue
 
-        name = dirs['raw_input']['path'] + fn
+        files.append((file_id, dirs['raw_input']['path'] + fn))
 
-        with open(name, 'r') as file_input:
-            raw_text = file_input.read()
+    return files
 
-        if argv.tetre_word not in raw_text:
-            continue
 
-        raw_text = raw_parsing(raw_text)
-        en_doc = en_nlp(raw_text)
+def load_spacy_model():
+    """Loads the SpaCy English model.
+
+    Returns:
+        The loaded SpaCy model.
+    """
+    return spacy.en.English()
+
 
-        sentence_id = 0
-        for sentence in en_doc.sents:
-            sentence_id += 1
+def parse_texts_from_spacy(en_nlp, texts, batch_size=16):
+    """The streaming parsing stage: feeds the texts through the SpaCy pipeline in batches (nlp.pipe), yielding each
+    parsed document as soon as its batch is done. Only the tagger and the dependency parser run, as TETRE uses no
+    other annotation (e.g.: named entities).
 
-            sentence_tree = spacysentence_to_fullsentence(sentence, file_id, sentence_id)
+    Args:
+        en_nlp: The loaded SpaCy model.
+        texts: An iterable of strings, it is consumed lazily.
+        batch_size: How many texts are parsed in each batch.
 
-            for token in sentence_tree:
-                if token.orth_.lower() == argv.tetre_word.lower():
-                    sentences.append((token, sentence_tree))
+    Returns:
+        An iterator of the parsed SpaCy documents (spacy.Doc), in the same order as the texts.
+    """
+    return en_nlp.pipe(texts, entity=False, batch_size=batch_size)
+
+
+def doc_to_spacysentences(en_doc, file_id):
+    """Lists the sentences of a parsed SpaCy document without building their trees.
+
+    Args:
+        en_doc: The parsed SpaCy document (spacy.Doc) of a file.
+        file_id: A number identifyng the file being processed.
+
+    Returns:
+        A list of tree_utils.SpacySentence objects, one for each sentence in the file.
+    """
+    sentences = []
+
+    sentence_id = 0
+    for sentence in en_doc.sents:
+        sentence_id += 1
+        sentences.append(SpacySentence(sentence, file_id, sentence_id))
 
     return sentences
 
 
+def doc_to_fullsentences(en_doc, file_id):
+    """Transforms all the sentences of a parsed SpaCy document into FullSentence objects.
+
+    Args:
+        en_doc: The parsed SpaCy document (spacy.Doc) of a file.
+        file_id: A number identifyng the file being processed.
+
+    Returns:
+        A list of tree.FullSentence objects, one for each sentence in the file.
+    """
+    return [sentence.to_fullsentence() for sentence in doc_to_spacysentences(en_doc, file_id)]
+
+
+# a sentence ends at a full stop, question or exclamation mark followed by whitespace
+sentence_boundary = re.compile(r"(?<=[.!?])\s+")
+
+
+def segment_sentences(text):
+    """A cheap, rule based, sentence segmentation that does not need the dependency parse.
+
+    Args:
+        text: A string with the (already processed) text of a file.
+
+    Returns:
+        A list of pairs with the offset of each sentence in the text and the sentence string.
+    """
+    segments = []
+
+    start = 0
+    for boundary in sentence_boundary.finditer(text):
+        segments.append((start, text[start:boundary.start()]))
+        start = boundary.end()
+
+    segments.append((start, text[start:]))
+
+    return [(offset, segment) for offset, segment in segments if segment.strip() != ""]
+
+
+def segment_contains_word(en_nlp, segment, words):
+    """Checks whether one of the tokens of a sentence is one of the words being searched for, using only the
+    tokenizer.
+
+    Args:
+        en_nlp: The loaded SpaCy model.
+        segment: The sentence string.
+        words: A list with the words being searched for.
+
+    Returns:
+        A boolean, True if one of the words is one of the tokens of the sentence.
+    """
+    lowered = segment.lower()
+    words = set(word.lower() for word in words if word.lower() in lowered)
+
+    if len(words) == 0:
+        return False
+
+    return any(token.orth_.lower() in words for token in en_nlp.tokenizer(segment))
+
+
+def shift_sentence(sentence, offset):
+    """Moves the idx of all the tokens of a sentence parsed on its own, so they are relative to the whole file.
+
+    Args:
+        sentence: The tree.FullSentence object.
+        offset: The position of the sentence in the file.
+    """
+    for token in sentence:
+        token.idx += offset
+
+    sentence.invalidate()
+
+
+def filter_sentences(sentences, words):
+    """Selects the tokens matching the words being searched for out of already parsed sentences. The trees of
+    sentences given as tree_utils.SpacySentence handles are only built for the sentences containing one of the words.
+
+    Args:
+        sentences: A list of tree.FullSentence (or tree_utils.SpacySentence) objects.
+        words: A list with the words being searched for.
+
+    Returns:
+        A list of pairs with the matching tree.TreeNode and its tree.FullSentence.
+    """
+    tokens = []
+
+    words = set(word.lower() for word in words)
+
+    for sentence in sentences:
+        if not any(token.orth_.lower() in words for token in sentence):
+            continue
+
+        sentence_tree = materialize(sentence)
+
+        for token in sentence_tree:
+            if token.orth_.lower() in words:
+                tokens.append((token, sentence_tree))
+
+    return tokens
+
+
+# the SpaCy model of the current process, loaded once by init_spacy_worker
+worker_nlp = None
+
+
+def init_spacy_worker():
+    """Loads the SpaCy model for the current process. When parsing in parallel this is called once for each
+    worker process, so the model is not loaded again for every file.
+    """
+    global worker_nlp
+    worker_nlp = load_spacy_model()
+
+
+def parse_files_worker(task):
+    """Parses a chunk of files with the SpaCy model of the current process, streaming them through the pipeline in
+    batches.
+
+    With the sentence prefilter, parsing is done in two phases: each file is first segmented in sentences and
+    tokenized, and then only the sentences containing the word are streamed through the pipeline, each one on its
+    own. Sentence ids are then the positions in the whole file given by the first phase, and the idx of the tokens
+    are relative to the whole file, as when the file is parsed at once. Should the parser split one of these sentences
+    further, its parts get consecutive ids and the ids of the following sentences of the file are moved along, so the
+    ids stay unique within the file.
+
+    Args:
+        task: A tuple with the list of pairs (file id, full path) of the files in this chunk, the list of words being
+            searched for, the batch size and whether the sentence prefilter is used. If the words are None, all
+            sentences of each file are returned.
+
+    Returns:
+        A list with, for each file in the chunk, a list of tree.FullSentence objects or, if words were given, a list
+        of pairs with the matching tree.TreeNode and its tree.FullSentence.
+    """
+    files, words, batch_size, prefilter = task
+
+    prefilter = prefilter and words is not None
+
+    results = [[] for f in files]
+    selected = []
+
+    # for each file, the number of sentences the parser split off the ones of the first phase so far
+    extra_ids = [0 for f in files]
+
+    def texts():
+        for position, (file_id, name) in enumerate(files):
+            with open(name, 'r') as file_input:
+                raw_text = file_input.read()
+
+            if words is not None and not any(word in raw_text for word in words):
+                continue
+
+            raw_text = raw_parsing(raw_text)
+
+            if not prefilter:
+                selected.append((position, file_id, None, 0))
+                yield raw_text
+                continue
+
+            sentence_id = 0
+            for offset, segment in segment_sentences(raw_text):
+                sentence_id += 1
+
+                if segment_contains_word(worker_nlp, segment, words):
+                    selected.append((position, file_id, sentence_id, offset))
+                    yield segment
+
+    # the generator above fills in "selected" before each of its texts reaches the pipeline
+    for i, en_doc in enumerate(parse_texts_from_spacy(worker_nlp, texts(), batch_size)):
+        position, file_id, sentence_id, offset = selected[i]
+
+        if sentence_id is None and words is None:
+            sentences = doc_to_fullsentences(en_doc, file_id)
+        elif sentence_id is None:
+            # only the sentences containing the words will have their trees built, see filter_sentences
+            sentences = doc_to_spacysentences(en_doc, file_id)
+        else:
+            sentences = []
+            for part, sentence in enumerate(en_doc.sents):
+                sentences.append(spacysentence_to_fullsentence(sentence, file_id,
+                                                               sentence_id + extra_ids[position] + part))
+                shift_sentence(sentences[-1], offset)
+
+            extra_ids[position] += len(sentences) - 1
+
+        if words is None:
+            results[position].extend(sentences)
+        else:
+            results[position].extend(filter_sentences(sentences, words))
+
+    return results
+
+
+def parse_each_file_from_spacy(argv, files, words=None):
+    """Parses the given files using SpaCy, splitting them in chunks of --tetre_worker_chunk_size files across
+    --tetre_workers processes if more than one is requested. Results are merged back in the order of the files, so
+    file and sentence ids are the same as in a sequential run.
+
+    Args:
+        argv: The command line arguments.
+        files: A list of pairs with the file id and the full path of each file, as in get_input_files.
+        words: A list with the words being searched for, or None for parsing every sentence of every file.
+
+    Returns:
+        A list with the result of parse_files_worker for each file, in the same order as the files.
+    """
+    batch_size = argv.tetre_batch_size
+    prefilter = argv.tetre_prefilter
+
+    results = []
+
+    if argv.tetre_workers > 1:
+        # the chunks only split the files across the processes, each one then feeds the pipeline in batches
+        chunk_size = argv.tetre_worker_chunk_size
+        tasks = [(files[i:i + chunk_size], words, batch_size, prefilter) for i in range(0, len(files), chunk_size)]
+
+        pool = multiprocessing.Pool(argv.tetre_workers, initializer=init_spacy_worker)
+        try:
+            # imap yields in the order of the tasks, regardless of which worker finishes first
+            for result in pool.imap(parse_files_worker, tasks):
+                results.extend(result)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        init_spacy_worker()
+        results = parse_files_worker((files, words, batch_size, prefilter))
+
+    return results
+
+
+def get_tree_from_spacy(argv, words=None):
+    """Parses the raw text using SpaCy, only for the files containing the words being searched for.
+
+    Args:
+        argv: The command line arguments.
+        words: A list with the words being searched for, by default only the --tetre_word.
+
+    Returns:
+        A list of pairs with the matching tree.TreeNode and its tree.FullSentence, parsed from the raw text.
+    """
+    if words is None:
+        words = [argv.tetre_word]
+
+    tokens = []
+
+    for result in parse_each_file_from_spacy(argv, get_input_files(), words):
+        tokens.extend(result)
+
+    return tokens
+
+
+def get_corpus_from_spacy(argv, files):
+    """Parses the raw text of the given input files using SpaCy, regardless of the word being searched for.
+
+    Args:
+        argv: The command line arguments.
+        files: A list of pairs with the file id and the full path of each file, as in get_input_files.
+
+    Returns:
+        A list with the tree.FullSentence objects parsed from each file, in the same order as the files.
+    """
+    return parse_each_file_from_spacy(argv, files)
+
+
 # def get_tree_from_stanford(argv):
 #     sentences = []
 #
@@ -112,11 +398,12 @@ def get_tree_from_spacy(argv):
 #     return sentences
 
 
-def get_tree(argv):
+def get_tree(argv, words=None):
     """Parses the raw text using the selected backend.
 
     Args:
         argv: The command line arguments.
+        words: A list with the words being searched for, by default only the --tetre_word.
 
     Returns:
         A list of tree.FullSentence objects, the sentences parsed from the raw text. It is expected that
@@ -124,8 +411,26 @@ def get_tree(argv):
     """
 
     if argv.tetre_backend == "spacy":
-        return get_tree_from_spacy(argv)
+        return get_tree_from_spacy(argv, words)
     elif argv.tetre_backend == "stanford":
         print("Not implemented!")
         # return get_tree_from_stanford(argv)
     return
+
+
+def get_corpus(argv, files):
+    """Parses the raw text of the given files of the corpus using the selected backend.
+
+    Args:
+        argv: The command line arguments.
+        files: A list of pairs with the file id and the full path of each file, as in get_input_files.
+
+    Returns:
+        A list with the tree.FullSentence objects parsed from each file, in the same order as the files.
+    """
+
+    if argv.tetre_backend == "spacy":
+        return get_corpus_from_spacy(argv, files)
+    elif argv.tetre_backend == "stanford":
+        print("Not implemented!")
+    return
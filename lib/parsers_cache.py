@@ -1,9 +1,18 @@
 import os
 import pickle
+import hashlib
 
-from parsers_backend import get_tree
+from parsers_backend import get_tree, get_corpus, get_input_files
+from parsers_index import TokenIndex
+from parsers_store import SentenceStore, get_shard_path
 from directories import dirs
 
+import tree_columnar
+
+
+# bumped whenever the structure of the cached objects changes, so older cache files are not loaded
+cache_version = 11
+
 
 def get_cached_sentence_image(argv, output_path, img_path):
     """Returns if the image is already generated or not, and avoids generating if yes.
@@ -25,30 +34,381 @@ def get_cached_sentence_image(argv, output_path, img_path):
         return os.path.isfile(cache_file_final)
 
 
-def get_cached_tokens(argv):
-    """Returns the already parsed sentences containing the word being search, if the folder was not modified.
+def get_cache_key():
+    """Returns the part of the word cache file names that changes whenever the input folder is modified.
+
+    Returns:
+        A string with the cache key.
+    """
+    updated_at_date = os.path.getmtime(dirs['raw_input']['path'])
+    return "v" + str(cache_version) + "-" + str(int(updated_at_date))
+
+
+def load_pickle(cache_file):
+    """Loads a pickled cache file.
 
     Args:
-        argv: The command line arguments.
+        cache_file: The path to the cache file.
 
     Returns:
-        A list of tree.FullSentence objects, the sentences parsed from the raw text.
+        The cached contents.
     """
+    with open(cache_file, 'rb') as f:
+        return pickle.load(f)
 
-    updated_at_date = os.path.getmtime(dirs['raw_input']['path'])
-    cache_key = argv.tetre_word.lower() + str(int(updated_at_date))
-    cache_file = dirs['output_cache']['path'] + cache_key + ".spacy"
 
-    if os.path.isfile(cache_file) and not argv.tetre_force_clean:
+def save_pickle(cache_file, contents):
+    """Saves contents to a pickled cache file.
+
+    Args:
+        cache_file: The path to the cache file.
+        contents: The contents to be cached.
+    """
+    with open(cache_file, "wb") as f:
+        pickle.dump(contents, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_or_generate(cache_file, generate, force_clean):
+    """Loads a pickled cache file, or generates its contents and saves them to disk if not cached yet.
+
+    Args:
+        cache_file: The path to the cache file.
+        generate: A callable generating the contents in case they are not cached.
+        force_clean: A boolean flagging if the cache should be ignored and regenerated.
+
+    Returns:
+        The cached (or freshly generated) contents.
+    """
+    if os.path.isfile(cache_file) and not force_clean:
         # is cached
-        with open(cache_file, 'rb') as f:
-            sentences = pickle.load(f)
+        return load_pickle(cache_file)
+
+    # is not cached, so generates it again
+    contents = generate()
+
+    # saves to disk
+    save_pickle(cache_file, contents)
+
+    return contents
+
+
+def get_file_hash(name):
+    """Calculates the hash of the contents of a file.
+
+    Args:
+        name: The path to the file.
+
+    Returns:
+        A string with the hexadecimal SHA1 digest of the file contents.
+    """
+    file_hash = hashlib.sha1()
+
+    with open(name, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+
+def save_shard(file_id, cache_format, sentences):
+    """Saves the parsed sentences of a single input file.
+
+    Args:
+        file_id: The id of the input file.
+        cache_format: The format of the file, either "pickle" (the tree.FullSentence objects are pickled) or
+            "columnar" (see tree_columnar).
+        sentences: A list of tree.FullSentence objects.
+    """
+    if cache_format == "pickle":
+        save_pickle(get_shard_path(file_id, cache_format), sentences)
     else:
-        # is not cached, so generates it again
-        sentences = get_tree(argv)
+        with open(get_shard_path(file_id, cache_format), "wb") as f:
+            f.write(tree_columnar.dumps(sentences))
+
+
+def load_shard(file_id, cache_format):
+    """Loads the parsed sentences of a single input file.
+
+    Args:
+        file_id: The id of the input file.
+        cache_format: The format of the file, either "pickle" or "columnar".
+
+    Returns:
+        A list of tree.FullSentence objects, or of tree_columnar.ColumnarSentence objects for the columnar format, in
+        which case the trees are only materialized when needed.
+    """
+    if cache_format == "pickle":
+        return load_pickle(get_shard_path(file_id, cache_format))
+
+    with open(get_shard_path(file_id, cache_format), "rb") as f:
+        return tree_columnar.loads(f.read())
+
+
+def new_manifest():
+    """Returns an empty manifest of the corpus cache.
+
+    Returns:
+        A dictionary with the manifest.
+    """
+    return {"version": cache_version, "format": "", "files": {}, "next_file_id": 1, "signature": ""}
+
+
+def update_corpus_cache(argv):
+    """Brings the corpus cache up to date with the input folder. The cache is split in one shard for each input file,
+    and a manifest keeps the content hash and the file id of each file. Only new or changed files are parsed again,
+    and the shards of deleted files are dropped.
+
+    File ids are stable: a file keeps its id for as long as it is in the input folder. On a clean cache the ids are
+    the same as in get_input_files, and files added afterwards receive new ids after the highest one assigned.
+
+    Args:
+        argv: The command line arguments.
+
+    Returns:
+        A dictionary with the updated manifest.
+    """
+    path = dirs['output_cache_corpus']['path']
+    manifest_file = path + "manifest.pickle"
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    manifest = None
+    if os.path.isfile(manifest_file) and not argv.tetre_force_clean:
+        manifest = load_pickle(manifest_file)
+
+    cache_format = argv.tetre_cache_format
+
+    if manifest is None or manifest["version"] != cache_version or manifest["format"] != cache_format:
+        manifest = new_manifest()
+        manifest["format"] = cache_format
+
+        for fn in os.listdir(path):
+            if fn.startswith("shard-"):
+                os.remove(path + fn)
+
+    files = {}
+    to_parse = []
+
+    for position_file_id, name in get_input_files():
+        fn = os.path.basename(name)
+        stat = os.stat(name)
+        entry = manifest["files"].get(fn)
+
+        if entry is not None and os.path.isfile(get_shard_path(entry["file_id"], cache_format)):
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                files[fn] = entry
+                continue
+
+            # touched, but possibly not changed
+            content_hash = get_file_hash(name)
+            if entry["hash"] == content_hash:
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+                files[fn] = entry
+                continue
+        else:
+            content_hash = get_file_hash(name)
+
+        if entry is None:
+            entry = {"file_id": max(position_file_id, manifest["next_file_id"])}
+            manifest["next_file_id"] = entry["file_id"] + 1
+
+        entry["hash"], entry["size"], entry["mtime"] = content_hash, stat.st_size, stat.st_mtime
+        files[fn] = entry
+        to_parse.append((entry["file_id"], name))
+
+    for fn, entry in manifest["files"].items():
+        if fn not in files and os.path.isfile(get_shard_path(entry["file_id"], cache_format)):
+            os.remove(get_shard_path(entry["file_id"], cache_format))
+
+    if len(to_parse) > 0:
+        for (file_id, name), sentences in zip(to_parse, get_corpus(argv, to_parse)):
+            save_shard(file_id, cache_format, sentences)
+
+    # the version is part of the signature, so the views derived from an older cache are not loaded either
+    signature = hashlib.sha1(("v" + str(cache_version) + "\n").encode())
+    for fn in sorted(files.keys()):
+        signature.update((fn + ":" + str(files[fn]["file_id"]) + ":" + files[fn]["hash"] + "\n").encode())
 
-        # saves to disk
-        with open(cache_file, "wb") as f:
-            pickle.dump(sentences, f, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest["files"] = files
+    manifest["signature"] = signature.hexdigest()
 
-    return sentences
+    save_pickle(manifest_file, manifest)
+
+    return manifest
+
+
+def get_cached_manifest():
+    """Loads the manifest of the corpus cache (see update_corpus_cache), as it was last saved.
+
+    Returns:
+        A dictionary with the manifest, or None if the corpus was not cached yet.
+    """
+    manifest_file = dirs['output_cache_corpus']['path'] + "manifest.pickle"
+
+    if not os.path.isfile(manifest_file):
+        print("No corpus cache found, please run the extract command first.")
+        return None
+
+    return load_pickle(manifest_file)
+
+
+def get_cached_corpus(argv, manifest=None):
+    """Returns the already parsed sentences of the corpus, parsing only the input files that are not cached yet.
+    The corpus cache is word agnostic, so it is shared by every word being searched for. An inverted index of the
+    tokens is built and cached along with it.
+
+    Args:
+        argv: The command line arguments.
+        manifest: The manifest returned by update_corpus_cache, if it was already called.
+
+    Returns:
+        store: The parsers_store.SentenceStore giving access to all the sentences parsed from the raw text.
+        index: The parsers_index.TokenIndex for these sentences.
+    """
+    if manifest is None:
+        manifest = update_corpus_cache(argv)
+
+    store = SentenceStore(manifest, load_pickle)
+
+    index_file = dirs['output_cache_corpus']['path'] + "index"
+
+    index = TokenIndex.open(index_file)
+
+    if index is None or index.get_signature() != manifest["signature"] or argv.tetre_force_clean:
+        if index is not None:
+            index.close()
+
+        index = TokenIndex.build(store)
+        index.set_signature(manifest["signature"])
+        index.save(index_file)
+
+        index = TokenIndex.open(index_file)
+
+    return store, index
+
+
+def get_word_cache_file(argv, word):
+    """Returns the path to the cache file of a word in the "word" cache mode.
+
+    Args:
+        argv: The command line arguments.
+        word: The word being searched for.
+
+    Returns:
+        A string with the path.
+    """
+    cache_key = word.lower() + "-" + get_cache_key()
+
+    # the sentences parsed with the prefilter have different ids, so they are cached apart
+    if argv.tetre_prefilter:
+        cache_key += "-prefilter"
+
+    return dirs['output_cache']['path'] + cache_key + ".spacy"
+
+
+def get_word_cached_tokens(argv, words):
+    """Returns the parsed sentences containing each word in the "word" cache mode. The words not cached yet are all
+    parsed together, in a single pass through the input files, and then cached one file per word.
+
+    Args:
+        argv: The command line arguments.
+        words: A list with the words being searched for.
+
+    Returns:
+        A dictionary with a list of pairs with the matching tree.TreeNode and its tree.FullSentence for each word.
+    """
+    tokens = {}
+    missing = []
+
+    for word in words:
+        cache_file = get_word_cache_file(argv, word)
+
+        if os.path.isfile(cache_file) and not argv.tetre_force_clean:
+            tokens[word] = load_pickle(cache_file)
+        else:
+            missing.append(word)
+
+    if len(missing) == 0:
+        return tokens
+
+    # words differing only in case match the same tokens, as in the corpus cache mode
+    by_lower = {}
+
+    for word in missing:
+        tokens[word] = []
+        by_lower.setdefault(word.lower(), []).append(word)
+
+    for token, sentence in get_tree(argv, missing):
+        for word in by_lower[token.orth_.lower()]:
+            tokens[word].append((token, sentence))
+
+    for word in missing:
+        save_pickle(get_word_cache_file(argv, word), tokens[word])
+
+    return tokens
+
+
+def get_cached_tokens_by_word(argv, words):
+    """Returns the already parsed sentences containing each of the words being searched for, reading the corpus only
+    once for all of them. See get_cached_tokens for the cache modes.
+
+    Args:
+        argv: The command line arguments.
+        words: A list with the words being searched for.
+
+    Yields:
+        A tuple with the word, the matching tree.TreeNode and its tree.FullSentence.
+    """
+
+    if argv.tetre_cache_mode == "word":
+        tokens = get_word_cached_tokens(argv, words)
+
+        for word in words:
+            for token, sentence in tokens[word]:
+                yield word, token, sentence
+
+        return
+
+    manifest = update_corpus_cache(argv)
+    store, index = get_cached_corpus(argv, manifest)
+
+    # also closed when the caller stops iterating early, as the generator is then closed too
+    try:
+        if not argv.tetre_cache_views:
+            for result in index.get_tokens_by_word(store.get_sentence, words, argv.tetre_match_lemma):
+                yield result
+
+            return
+
+        for word in words:
+            cache_key = word.lower() + "-" + manifest["signature"][:16]
+
+            if argv.tetre_match_lemma:
+                cache_key += "-lemma"
+
+            cache_file = dirs['output_cache']['path'] + cache_key + ".view.spacy"
+            generate = lambda: list(index.get_tokens(store.get_sentence, word, argv.tetre_match_lemma))
+
+            for token, sentence in load_or_generate(cache_file, generate, argv.tetre_force_clean):
+                yield word, token, sentence
+    finally:
+        store.close()
+        index.close()
+
+
+def get_cached_tokens(argv):
+    """Returns the already parsed sentences containing the word being search, if the folder was not modified.
+
+    In the "corpus" cache mode the sentences are streamed from the corpus cache through its index, and the per word
+    cache files are only derived views, kept when --tetre_cache_views is given. In the "word" cache mode only the
+    files containing the word are parsed and cached.
+
+    Args:
+        argv: The command line arguments.
+
+    Yields:
+        A pair with the matching tree.TreeNode and its tree.FullSentence.
+    """
+    for word, token, sentence in get_cached_tokens_by_word(argv, [argv.tetre_word]):
+        yield token, sentence
@@ -0,0 +1,184 @@
+import dbm
+import heapq
+import shelve
+
+from tree_columnar import materialize
+
+
+class TokenIndex(object):
+    def __init__(self, entries=None):
+        """Constructs a TokenIndex. A TokenIndex is an inverted index from the lowercased orthography (and lemma) of
+        the tokens to their positions in the parsed corpus, so the sentences containing a word can be found without
+        iterating through every sentence of the corpus.
+
+        Each position is a tuple (file_id, sentence_id, idx), in the order they appear in the corpus. The entries
+        are kept in a dictionary while the index is built, and in a shelve once saved, so a saved index is not
+        loaded in memory as a whole but only for the words being looked up.
+
+        Args:
+            entries: The mapping with the entries of the index, by default a new dictionary.
+        """
+        if entries is None:
+            entries = {"signature": ""}
+
+        self.entries = entries
+
+    @staticmethod
+    def build(sentences):
+        """Builds the index for the parsed sentences.
+
+        Args:
+            sentences: An iterable of tree.FullSentence (or tree_columnar.ColumnarSentence) objects, as in the
+                parsed corpus.
+
+        Returns:
+            The TokenIndex object.
+        """
+        index = TokenIndex()
+
+        for sentence in sentences:
+            index.add_sentence(sentence)
+
+        return index
+
+    @staticmethod
+    def open(path):
+        """Opens a saved index for reading.
+
+        Args:
+            path: The path the index was saved to.
+
+        Returns:
+            The TokenIndex object, or None if there is no index saved at this path.
+        """
+        if not dbm.whichdb(path):
+            return None
+
+        return TokenIndex(shelve.open(path, flag='r'))
+
+    def save(self, path):
+        """Saves the index.
+
+        Args:
+            path: The path the index is saved to.
+        """
+        db = shelve.open(path, flag='n', protocol=2)
+        try:
+            for key, value in self.entries.items():
+                db[key] = value
+        finally:
+            db.close()
+
+    def close(self):
+        """Closes a saved index opened for reading.
+        """
+        if isinstance(self.entries, shelve.Shelf):
+            self.entries.close()
+
+    def get_signature(self):
+        """Returns the signature identifying the version of the corpus this index was built for.
+
+        Returns:
+            A string with the signature.
+        """
+        return self.entries["signature"]
+
+    def set_signature(self, signature):
+        """Sets the signature identifying the version of the corpus this index was built for.
+
+        Args:
+            signature: A string with the signature.
+        """
+        self.entries["signature"] = signature
+
+    def add_sentence(self, sentence):
+        """Adds all the tokens of a sentence to the index.
+
+        Args:
+            sentence: The tree.FullSentence (or tree_columnar.ColumnarSentence) object.
+        """
+        entries = self.entries
+
+        for token in sentence:
+            location = (sentence.file_id, sentence.id, token.idx)
+            orth = token.orth_.lower()
+            lemma = token.lemma_.lower()
+
+            entries.setdefault("orth:" + orth, []).append(location)
+
+            if lemma != "":
+                entries.setdefault("lemma:" + lemma, []).append(location)
+                entries.setdefault("orth_lemmas:" + orth, set()).add(lemma)
+
+    def lookup(self, word, by_lemma=False):
+        """Returns the positions of a word in the corpus.
+
+        Args:
+            word: The word being searched for.
+            by_lemma: A boolean, if True all the tokens sharing a lemma with the word are returned (e.g.: "improves"
+                would also match "improved").
+
+        Returns:
+            A list of (file_id, sentence_id, idx) tuples, in the order they appear in the corpus.
+        """
+        word = word.lower()
+
+        if not by_lemma:
+            return self.entries.get("orth:" + word, [])
+
+        locations = []
+        for lemma in self.entries.get("orth_lemmas:" + word, set()):
+            locations.extend(self.entries["lemma:" + lemma])
+
+        return sorted(locations)
+
+    def get_tokens(self, get_sentence, word, by_lemma=False):
+        """Yields the tokens of a word, touching only the sentences that contain it.
+
+        Args:
+            get_sentence: A function returning a sentence given its file id and sentence id, as in
+                parsers_store.SentenceStore.get_sentence. Only the sentences containing the word have their trees
+                materialized.
+            word: The word being searched for.
+            by_lemma: A boolean, if True all the tokens sharing a lemma with the word are returned.
+
+        Yields:
+            A pair with the matching tree.TreeNode and its tree.FullSentence.
+        """
+        sentence = None
+
+        for file_id, sentence_id, idx in self.lookup(word, by_lemma):
+            if sentence is None or (sentence.file_id, sentence.id) != (file_id, sentence_id):
+                sentence = materialize(get_sentence(file_id, sentence_id))
+
+            token = sentence.get_token(idx)
+
+            if token is not None:
+                yield token, sentence
+
+    def get_tokens_by_word(self, get_sentence, words, by_lemma=False):
+        """Yields the tokens of several words in a single pass through the corpus. The positions of all the words are
+        merged in corpus order, so each sentence is read and materialized only once, even if it contains more than
+        one of the words.
+
+        Args:
+            get_sentence: A function returning a sentence given its file id and sentence id, as in
+                parsers_store.SentenceStore.get_sentence.
+            words: A list with the words being searched for.
+            by_lemma: A boolean, if True all the tokens sharing a lemma with each word are returned.
+
+        Yields:
+            A tuple with the word, the matching tree.TreeNode and its tree.FullSentence.
+        """
+        lookups = [[(location, word) for location in self.lookup(word, by_lemma)] for word in words]
+
+        sentence = None
+
+        for (file_id, sentence_id, idx), word in heapq.merge(*lookups):
+            if sentence is None or (sentence.file_id, sentence.id) != (file_id, sentence_id):
+                sentence = materialize(get_sentence(file_id, sentence_id))
+
+            token = sentence.get_token(idx)
+
+            if token is not None:
+                yield word, token, sentence
@@ -0,0 +1,96 @@
+import mmap
+
+from directories import dirs
+from tree_columnar import ColumnarFile
+
+
+def get_shard_path(file_id, cache_format):
+    """Returns the path to the cache file with the parsed sentences of a single input file.
+
+    Args:
+        file_id: The id of the input file.
+        cache_format: The format of the file, either "pickle" or "columnar".
+
+    Returns:
+        A string with the path.
+    """
+    extension = ".spacy" if cache_format == "pickle" else ".columnar"
+    return dirs['output_cache_corpus']['path'] + "shard-" + str(file_id) + extension
+
+
+class SentenceStore(object):
+    def __init__(self, manifest, load_pickle):
+        """Lazy access to the sentences of the corpus cache (see parsers_cache.update_corpus_cache). Shards are only
+        opened when one of their sentences is accessed. Shards in the columnar format are memory-mapped, and only
+        the records of the sentences being accessed are decoded, so memory stays proportional to what is used.
+
+        Args:
+            manifest: The manifest of the corpus cache.
+            load_pickle: The function loading a pickled shard.
+        """
+        self.format = manifest["format"]
+        self.file_ids = sorted(entry["file_id"] for entry in manifest["files"].values())
+        self.load_pickle = load_pickle
+        self.shards = {}
+        self.opened_files = []
+
+    def get_shard(self, file_id):
+        """Returns the sentences of a single input file, opening its shard if needed.
+
+        Args:
+            file_id: The id of the input file.
+
+        Returns:
+            A list of tree.FullSentence objects for the pickle format, or a tree_columnar.ColumnarFile.
+        """
+        shard = self.shards.get(file_id)
+
+        if shard is None:
+            path = get_shard_path(file_id, self.format)
+
+            if self.format == "pickle":
+                shard = self.load_pickle(path)
+            else:
+                f = open(path, 'rb')
+                self.opened_files.append(f)
+                shard = ColumnarFile(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+            self.shards[file_id] = shard
+
+        return shard
+
+    def get_sentence(self, file_id, sentence_id):
+        """Returns a single sentence of the corpus. Sentence ids start at 1 and follow the order of the sentences
+        in the file, so the sentence is found directly by its position in the shard.
+
+        Args:
+            file_id: The id of the input file.
+            sentence_id: The id of the sentence.
+
+        Returns:
+            The tree.FullSentence (or tree_columnar.ColumnarSentence) object.
+        """
+        return self.get_shard(file_id)[sentence_id - 1]
+
+    def __iter__(self):
+        """Iterates through all the sentences of the corpus, in file and sentence order.
+
+        Yields:
+            Each tree.FullSentence (or tree_columnar.ColumnarSentence) object.
+        """
+        for file_id in self.file_ids:
+            for sentence in self.get_shard(file_id):
+                yield sentence
+
+    def close(self):
+        """Releases the memory maps and files opened by the store.
+        """
+        for shard in self.shards.values():
+            if isinstance(shard, ColumnarFile):
+                shard.buffer.close()
+
+        for f in self.opened_files:
+            f.close()
+
+        self.shards = {}
+        self.opened_files = []
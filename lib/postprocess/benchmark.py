@@ -0,0 +1,130 @@
+import time
+import importlib
+
+from directories import dirs
+from tree_columnar import materialize
+from parsers_cache import load_pickle, load_shard, get_cached_manifest
+from parsers_index import TokenIndex
+from parsers_store import SentenceStore
+
+
+# the module and class measuring each of the --benchmark_target choices, one for each subsystem, only imported when
+# their target is run
+targets = {
+    "cache_format": ("postprocess.benchmark_cache", "CacheBenchmark"),
+    "sentence_store": ("postprocess.benchmark_cache", "CacheBenchmark"),
+    "sentence_pickle": ("postprocess.benchmark_cache", "CacheBenchmark"),
+    "parse_throughput": ("postprocess.benchmark_parsing", "ParsingBenchmark"),
+    "lazy_conversion": ("postprocess.benchmark_parsing", "ParsingBenchmark"),
+    "tree_memory": ("postprocess.benchmark_trees", "TreesBenchmark"),
+    "deep_trees": ("postprocess.benchmark_trees", "TreesBenchmark"),
+    "relation_stats": ("postprocess.benchmark_trees", "TreesBenchmark"),
+    "rule_dispatch": ("postprocess.benchmark_rules", "RulesBenchmark"),
+    "rule_memo": ("postprocess.benchmark_rules", "RulesBenchmark"),
+}
+
+
+def timed(function, repeat=3):
+    """Runs a function a few times and returns the best wall time.
+
+    Args:
+        function: The callable to be timed.
+        repeat: How many times it runs.
+
+    Returns:
+        A float with the best time in seconds.
+    """
+    best = None
+
+    for i in range(0, repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def get_cached_sentences():
+    """Loads all sentences from the corpus cache, with their trees.
+
+    Returns:
+        A list with a list of tree.FullSentence objects for each input file.
+    """
+    manifest = get_cached_manifest()
+
+    if manifest is None:
+        return []
+
+    shards = []
+    for file_id in sorted(entry["file_id"] for entry in manifest["files"].values()):
+        shards.append([materialize(sentence) for sentence in load_shard(file_id, manifest["format"])])
+
+    return shards
+
+
+def get_cached_word_tokens(word):
+    """Loads the tokens of a word from the corpus cache, through its index.
+
+    Args:
+        word: The word being searched for.
+
+    Returns:
+        A list with a (TreeNode, tree.FullSentence) pair for each token, or None if the corpus is not cached yet.
+    """
+    manifest = get_cached_manifest()
+    index = TokenIndex.open(dirs['output_cache_corpus']['path'] + "index")
+
+    if manifest is None or index is None:
+        return None
+
+    store = SentenceStore(manifest, load_pickle)
+
+    try:
+        return list(index.get_tokens(store.get_sentence, word))
+    finally:
+        store.close()
+        index.close()
+
+
+class Benchmark(object):
+    def __init__(self, argv):
+        """Constructor, simply stores command line parameters internally. The benchmarks of each subsystem extend
+        this class, with a method for each of their targets (see targets).
+
+         Args:
+             argv: An object with the command line arguments.
+
+         """
+        self.argv = argv
+
+    @staticmethod
+    def report(name, value):
+        """Prints a single measurement.
+
+        Args:
+            name: The name of the measurement.
+            value: The measured value.
+        """
+        print(name + "," + str(value))
+
+    def run(self):
+        """Runs the selected benchmark and prints its measurements as name,value lines.
+        """
+        getattr(self, self.argv.benchmark_target)()
+
+
+def run(argv):
+    """Module entry point for the command line.
+
+    Args:
+        argv: The command line parameters.
+
+    """
+    module_name, class_name = targets[argv.benchmark_target]
+    benchmark_class = getattr(importlib.import_module(module_name), class_name)
+
+    cmd = benchmark_class(argv)
+    cmd.run()
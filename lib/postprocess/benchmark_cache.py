@@ -0,0 +1,159 @@
+import time
+import pickle
+import resource
+
+from directories import dirs
+from tree import TreeNode, FullSentence
+from tree_columnar import dumps, loads
+from parsers_cache import load_pickle, get_cached_manifest
+from parsers_index import TokenIndex
+from parsers_store import SentenceStore
+from postprocess.benchmark import Benchmark, timed, get_cached_sentences, get_cached_word_tokens
+
+
+def to_tuples(sentence):
+    """Returns a sentence in the form it was pickled before its tree was kept as flat arrays: a dictionary with its
+    attributes and a tuple for each node, to be compared with FullSentence.__reduce__.
+
+    Args:
+        sentence: The tree.FullSentence object.
+
+    Returns:
+        A tuple with the dictionary of attributes and the list of node tuples.
+    """
+    nodes = list(sentence.root.walk())
+    positions = dict((id(node), position) for position, node in enumerate(nodes))
+
+    parents = [None] * len(nodes)
+    for position, node in enumerate(nodes):
+        for child in node.children:
+            parents[positions[id(child)]] = position
+
+    flat = [(node.dep_, node.pos_, node.orth_, node.lemma_, node.idx, node.n_lefts, node.n_rights, node.no_follow,
+             parents[position], positions[id(node.head)], positions[id(node.root)])
+            for position, node in enumerate(nodes)]
+
+    state = {"string_representation": sentence.string_representation, "file_id": sentence.file_id,
+             "id": sentence.id, "tokens": None, "tokens_by_idx": None, "subtree_index": None}
+
+    return state, flat
+
+
+def from_tuples(state, flat):
+    """Rebuilds a sentence out of the form returned by to_tuples.
+
+    Args:
+        state: The dictionary of attributes.
+        flat: The list of node tuples.
+
+    Returns:
+        The tree.FullSentence object.
+    """
+    nodes = []
+
+    for dep_, pos_, orth_, lemma_, idx, n_lefts, n_rights, no_follow, parent, head, root in flat:
+        node = TreeNode(dep_, pos_, orth_, idx, n_lefts, n_rights, lemma_)
+        node.no_follow = no_follow
+        nodes.append(node)
+
+        if parent is not None:
+            nodes[parent].add_child(node)
+
+    for node, (dep_, pos_, orth_, lemma_, idx, n_lefts, n_rights, no_follow, parent, head, root) in zip(nodes, flat):
+        node.head = nodes[head]
+        node.root = nodes[root]
+
+    sentence = FullSentence.__new__(FullSentence)
+    sentence.__dict__.update(state)
+    sentence.root = nodes[0]
+
+    return sentence
+
+
+class CacheBenchmark(Benchmark):
+    def cache_format(self):
+        """Compares the file size and load time of the corpus cache shards in the pickle and columnar formats.
+        """
+        shards = get_cached_sentences()
+
+        pickled = [pickle.dumps(sentences, protocol=pickle.HIGHEST_PROTOCOL) for sentences in shards]
+        columnar = [dumps(sentences) for sentences in shards]
+
+        self.report("sentences", sum(len(sentences) for sentences in shards))
+        self.report("pickle_bytes", sum(len(data) for data in pickled))
+        self.report("columnar_bytes", sum(len(data) for data in columnar))
+
+        self.report("pickle_load_seconds", timed(lambda: [pickle.loads(data) for data in pickled]))
+        self.report("columnar_load_seconds", timed(lambda: [loads(data) for data in columnar]))
+        self.report("columnar_load_materialize_seconds",
+                    timed(lambda: [[s.to_fullsentence() for s in loads(data)] for data in columnar]))
+
+    def sentence_store(self):
+        """Measures how long the corpus cache takes to yield the first and all the tokens of --benchmark_word,
+        streaming from the sentence store, and the memory used to do so.
+        """
+        manifest = get_cached_manifest()
+        index = TokenIndex.open(dirs['output_cache_corpus']['path'] + "index")
+
+        if manifest is None or index is None:
+            return
+
+        start = time.time()
+        store = SentenceStore(manifest, load_pickle)
+        tokens = index.get_tokens(store.get_sentence, self.argv.benchmark_word)
+
+        total = 0
+        for token, sentence in tokens:
+            if total == 0:
+                self.report("format", manifest["format"])
+                self.report("first_token_seconds", time.time() - start)
+            total += 1
+
+        self.report("tokens", total)
+        self.report("all_tokens_seconds", time.time() - start)
+        self.report("max_resident_kilobytes", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+        store.close()
+        index.close()
+
+    def sentence_pickle(self):
+        """Compares the size, dump and load time of the sentences of --benchmark_word pickled as get_cached_tokens
+        saves them (pickle.HIGHEST_PROTOCOL), with their trees as flat arrays and as a tuple for each node, as they
+        were pickled before.
+        """
+        tokens = get_cached_word_tokens(self.argv.benchmark_word)
+
+        if tokens is None:
+            return
+
+        sentences = list(dict((id(sentence), sentence) for token, sentence in tokens).values())
+
+        def dump_arrays():
+            return pickle.dumps(sentences, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def dump_tuples():
+            return pickle.dumps([to_tuples(sentence) for sentence in sentences], protocol=pickle.HIGHEST_PROTOCOL)
+
+        arrays = dump_arrays()
+        tuples = dump_tuples()
+
+        def load_arrays():
+            return pickle.loads(arrays)
+
+        def load_tuples():
+            return [from_tuples(state, flat) for state, flat in pickle.loads(tuples)]
+
+        def to_comparable(loaded):
+            return [(s.file_id, s.id, str(s), [(n.dep_, n.pos_, n.orth_, n.lemma_, n.idx, n.n_lefts, n.n_rights,
+                                                 n.head.idx, len(n.children)) for n in s]) for s in loaded]
+
+        self.report("sentences", len(sentences))
+        self.report("same_sentences", to_comparable(sentences) == to_comparable(load_arrays()) ==
+                    to_comparable(load_tuples()))
+        self.report("view_bytes", len(pickle.dumps(tokens, protocol=pickle.HIGHEST_PROTOCOL)))
+
+        for name, dump, load, data in (("arrays", dump_arrays, load_arrays, arrays),
+                                       ("tuples", dump_tuples, load_tuples, tuples)):
+            self.report(name + "_bytes", len(data))
+            self.report(name + "_dump_seconds", timed(dump))
+            self.report(name + "_load_seconds", timed(load))
@@ -0,0 +1,80 @@
+import time
+import tracemalloc
+
+from parsers_backend import get_input_files, load_spacy_model, parse_texts_from_spacy, raw_parsing, \
+    doc_to_fullsentences, doc_to_spacysentences, filter_sentences
+from postprocess.benchmark import Benchmark, timed
+
+
+class ParsingBenchmark(Benchmark):
+    def parse_throughput(self):
+        """Compares the parsing throughput (documents and tokens per second) of calling the SpaCy model once for each
+        input file against streaming them through the batched pipeline, with --benchmark_batch_size files per batch.
+        """
+        en_nlp = load_spacy_model()
+
+        texts = []
+        for file_id, name in get_input_files():
+            with open(name, 'r') as file_input:
+                texts.append(raw_parsing(file_input.read()))
+
+        def count_tokens(docs):
+            return sum(len(en_doc) for en_doc in docs)
+
+        start = time.time()
+        tokens = count_tokens(en_nlp(text) for text in texts)
+        per_document_seconds = time.time() - start
+
+        start = time.time()
+        count_tokens(parse_texts_from_spacy(en_nlp, texts, self.argv.benchmark_batch_size))
+        pipe_seconds = time.time() - start
+
+        self.report("documents", len(texts))
+        self.report("tokens", tokens)
+
+        for name, seconds in (("per_document", per_document_seconds), ("pipe", pipe_seconds)):
+            self.report(name + "_seconds", seconds)
+            self.report(name + "_documents_per_second", len(texts) / max(seconds, 1e-9))
+            self.report(name + "_tokens_per_second", tokens / max(seconds, 1e-9))
+
+    def lazy_conversion(self):
+        """Compares the time and peak memory taken to select the tokens of --benchmark_word out of the parsed SpaCy
+        documents of the files containing it, building the trees of every sentence (as before) or only of the
+        sentences containing the word.
+        """
+        en_nlp = load_spacy_model()
+        words = [self.argv.benchmark_word]
+
+        texts = []
+        for file_id, name in get_input_files():
+            with open(name, 'r') as file_input:
+                raw_text = file_input.read()
+
+            if self.argv.benchmark_word in raw_text:
+                texts.append((file_id, raw_parsing(raw_text)))
+
+        docs = [(file_id, en_doc) for (file_id, text), en_doc in
+                zip(texts, parse_texts_from_spacy(en_nlp, [text for file_id, text in texts]))]
+
+        def eager():
+            return [filter_sentences(doc_to_fullsentences(en_doc, file_id), words) for file_id, en_doc in docs]
+
+        def lazy():
+            return [filter_sentences(doc_to_spacysentences(en_doc, file_id), words) for file_id, en_doc in docs]
+
+        def to_comparable(results):
+            return [(sentence.file_id, sentence.id, token.idx, sentence.root.to_tree_string())
+                    for tokens in results for token, sentence in tokens]
+
+        self.report("documents", len(docs))
+        self.report("sentences", sum(len(list(en_doc.sents)) for file_id, en_doc in docs))
+        self.report("tokens", sum(len(tokens) for tokens in lazy()))
+        self.report("same_tokens", to_comparable(eager()) == to_comparable(lazy()))
+
+        for name, convert in (("eager", eager), ("lazy", lazy)):
+            self.report(name + "_seconds", timed(convert))
+
+            tracemalloc.start()
+            convert()
+            self.report(name + "_peak_bytes", tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
@@ -0,0 +1,103 @@
+from tree_overlay import SentenceOverlay
+from tree_utils import get_node_representation
+from tetre.graph_processing import Process
+from tetre.graph_processing_children import ProcessChildren
+from tetre.rule_profiler import RuleProfiler
+from tetre.rule_memo import RuleMemo
+from vocabulary import vocabulary
+from postprocess.benchmark import Benchmark, timed, get_cached_word_tokens
+
+
+def apply_rules(tokens, dispatch_by_triggers, profiler=None, memo=None):
+    """Applies the growth, reduction, obj and subj rules to the tokens of a word, as CommandSimplifiedGroup does when
+    grouping by the verb, each one on its own copy-on-write tree.
+
+    Args:
+        tokens: A list with a (TreeNode, tree.FullSentence) pair for each token.
+        dispatch_by_triggers: A boolean, False to call every rule instead of only the ones whose trigger tags are
+            around the node (see RuleApplier.triggered_by).
+        profiler: The rule_profiler.RuleProfiler object recording the rules called, if any.
+        memo: The rule_memo.RuleMemo object memoizing the outcome of the rules, if any.
+
+    Returns:
+        A list with the resulting signatures, the rules applied and the changed tree under each token.
+    """
+    process = Process()
+    process_children = ProcessChildren()
+
+    process.set_memo(memo)
+    process_children.set_memo(memo)
+
+    for rule_applier in (process.growth, process.reduction, process_children.obj, process_children.subj):
+        rule_applier.dispatch_by_triggers = dispatch_by_triggers
+        rule_applier.profiler = profiler
+
+    subj_ids = vocabulary.containing("subj")
+    obj_ids = vocabulary.containing("obj")
+
+    results = []
+
+    for token_original, sentence in tokens:
+        token = SentenceOverlay(sentence).get_node(token_original)
+
+        tree, applied = process.apply_all(get_node_representation("dep_", token), token)
+
+        tree_subj = ""
+        tree_obj = ""
+        for child in token.children:
+            if child.dep_id in subj_ids:
+                tree_subj = get_node_representation("dep_", child)
+            if child.dep_id in obj_ids:
+                tree_obj = get_node_representation("dep_", child)
+
+        tree_obj, tree_subj, applied_children = process_children.apply_all(tree_obj, tree_subj, token)
+
+        nodes = [(node.idx, node.dep_, node.no_follow, len(node.children)) for node in token.walk()]
+
+        results.append((tree, tree_obj, tree_subj, applied + applied_children, nodes))
+
+    return results
+
+
+class RulesBenchmark(Benchmark):
+    def rule_dispatch(self):
+        """Compares the time taken to apply the rules to the tokens of --benchmark_word calling every rule, as before,
+        against calling only the rules whose trigger tags are around the node (see RuleApplier.triggered_by).
+        """
+        tokens = get_cached_word_tokens(self.argv.benchmark_word)
+
+        if tokens is None:
+            return
+
+        self.report("tokens", len(tokens))
+        self.report("same_results", apply_rules(tokens, False) == apply_rules(tokens, True))
+
+        for name, dispatch_by_triggers in (("all_rules", False), ("triggered_rules", True)):
+            profiler = RuleProfiler()
+            apply_rules(tokens, dispatch_by_triggers, profiler)
+
+            self.report(name + "_calls", sum(rule["calls"] for rule in profiler.get_report()["rules"]))
+            self.report(name + "_seconds", timed(lambda: apply_rules(tokens, dispatch_by_triggers), repeat=5))
+
+    def rule_memo(self):
+        """Compares the time taken to apply the rules to the tokens of --benchmark_word always applying the rules
+        against replaying their memoized outcome for the features of the tree already seen (see rule_memo.RuleMemo),
+        and reports the hit rate of each class of rules.
+        """
+        tokens = get_cached_word_tokens(self.argv.benchmark_word)
+
+        if tokens is None:
+            return
+
+        memo = RuleMemo()
+
+        self.report("tokens", len(tokens))
+        self.report("same_results", apply_rules(tokens, True) == apply_rules(tokens, True, memo=memo))
+        self.report("signatures", len(memo.entries))
+
+        for stats in memo.get_report():
+            for name in ("hits", "misses", "not_replayable", "bypassed", "hit_rate"):
+                self.report(stats["rule_applier"] + "_" + name, stats[name])
+
+        self.report("rules_seconds", timed(lambda: apply_rules(tokens, True), repeat=5))
+        self.report("memo_seconds", timed(lambda: apply_rules(tokens, True, memo=RuleMemo()), repeat=5))
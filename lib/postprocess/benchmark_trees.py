@@ -0,0 +1,127 @@
+import copy
+import pickle
+import tracemalloc
+
+from tree import TreeNode, FullSentence, SubtreeIndex
+from tree_overlay import SentenceOverlay
+from tree_utils import to_nltk_tree, find_in_spacynode, get_token_representation
+from tree_columnar import dumps, loads, count_relations
+from postprocess.benchmark import Benchmark, timed, get_cached_sentences
+
+
+def get_deep_tree(depth):
+    """Builds a synthetic sentence whose tree is a chain of nodes, each one the only child of the previous one, as
+    run-on sentences from extracted text can get.
+
+    Args:
+        depth: The number of nodes in the chain.
+
+    Returns:
+        The tree.FullSentence object.
+    """
+    root = TreeNode("ROOT", "VERB", "improves", 0, 0, 1, "improve")
+    node = root
+
+    for i in range(1, depth):
+        child = TreeNode("prep", "ADP", "of", i * 3, 0, 1 if i < depth - 1 else 0, "of")
+        child.set_head(node)
+        child.set_root(root)
+        node.add_child(child)
+        node = child
+
+    return FullSentence(root, 1, 1)
+
+
+def walk_relations(sentences, word, attributes):
+    """Counts the relations of the tokens of a word to their heads and children by walking their trees, as
+    CommandAccumulative does, to be compared with tree_columnar.count_relations.
+
+    Args:
+        sentences: A list of tree.FullSentence objects.
+        word: The word being searched for.
+        attributes: The attributes forming the representation of the related tokens.
+
+    Returns:
+        A tuple with the parents and children dictionaries, as returned by tree_columnar.count_relations.
+    """
+    tetre_format = ",".join(attributes)
+    parents = {}
+    children = {}
+
+    for sentence in sentences:
+        for token in sentence:
+            if token.orth_.lower() != word or token.pos_ != "VERB":
+                continue
+
+            for dep, node, accumulator in [(token.dep_, token.head, parents)] + \
+                    [(child.dep_, child, children) for child in token.children]:
+                if dep.strip() == "":
+                    continue
+
+                values = accumulator.setdefault(dep, {})
+                representation = get_token_representation(tetre_format, node)
+
+                if representation != "":
+                    values[representation] = values.get(representation, 0) + 1
+
+    return parents, children
+
+
+class TreesBenchmark(Benchmark):
+    def tree_memory(self):
+        """Measures the memory taken by the TreeNode trees of the whole corpus cache, and the size of their pickles.
+        """
+        tracemalloc.start()
+        shards = get_cached_sentences()
+        tree_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        nodes = sum(len(list(sentence)) for sentences in shards for sentence in sentences)
+
+        self.report("sentences", sum(len(sentences) for sentences in shards))
+        self.report("nodes", nodes)
+        self.report("tree_bytes", tree_bytes)
+        self.report("tree_bytes_per_node", tree_bytes / max(nodes, 1))
+        self.report("pickle_bytes",
+                    sum(len(pickle.dumps(sentences, protocol=pickle.HIGHEST_PROTOCOL)) for sentences in shards))
+
+    def deep_trees(self):
+        """Measures the traversals, subtree index queries, pickling and copying of a synthetic tree of
+        --benchmark_depth levels.
+        """
+        sentence = get_deep_tree(self.argv.benchmark_depth)
+        token = sentence.root.children[0]
+
+        self.report("depth", self.argv.benchmark_depth)
+        self.report("to_sentence_list_seconds", timed(lambda: sentence.root.to_sentence_list()))
+        self.report("to_nltk_tree_seconds", timed(lambda: to_nltk_tree(sentence.root)))
+        self.report("find_in_spacynode_seconds", timed(lambda: find_in_spacynode(sentence.root, "dobj", "")))
+        self.report("subtree_index_build_seconds", timed(lambda: SubtreeIndex(sentence.root)))
+        self.report("subtree_index_find_seconds",
+                    timed(lambda: find_in_spacynode(SentenceOverlay(sentence).get_node(sentence.root), "dobj", "")))
+        self.report("pickle_seconds", timed(lambda: pickle.loads(pickle.dumps(sentence, pickle.HIGHEST_PROTOCOL))))
+        self.report("deepcopy_seconds", timed(lambda: copy.deepcopy(token)))
+
+    def relation_stats(self):
+        """Compares counting the relations of --benchmark_word to its heads and children by walking the TreeNode
+        trees of the corpus cache (already in memory, or materialized from the columnar format) against computing
+        them from the columns of the sentences.
+        """
+        shards = get_cached_sentences()
+        sentences = [sentence for sentences in shards for sentence in sentences]
+        columnar = [dumps(sentences) for sentences in shards]
+
+        attributes = ("dep_", "pos_")
+        word = self.argv.benchmark_word.lower()
+
+        def materialize_and_walk():
+            return walk_relations([s.to_fullsentence() for data in columnar for s in loads(data)], word, attributes)
+
+        def count():
+            return count_relations((s for data in columnar for s in loads(data)), word, attributes)
+
+        self.report("sentences", len(sentences))
+        self.report("same_counts", walk_relations(sentences, word, attributes) == materialize_and_walk() == count())
+        self.report("walk_seconds", timed(lambda: walk_relations(sentences, word, attributes)))
+        self.report("materialize_walk_seconds", timed(materialize_and_walk))
+        self.report("columnar_seconds", timed(count))
@@ -1,4 +1,7 @@
 from parsers import get_uncached_tokens
+from parsers_cache import load_pickle, get_cached_manifest
+from parsers_store import SentenceStore
+from tree_columnar import to_columnar, count_relations
 
 
 class PossibleRelations(object):
@@ -34,6 +37,43 @@ class PossibleRelations(object):
         print(prepared_output)
 
 
+class Relations(object):
+    def __init__(self, argv):
+        """Constructor, simply stores command line parameters internally.
+
+         Args:
+             argv: An object with the command line arguments.
+
+         """
+        self.argv = argv
+
+    def run(self):
+        """Counts the relations of --stats_word to its heads and children in the whole corpus cache, as the
+        accumulator behaviour does, but computed shard by shard from the columns of the sentences instead of walking
+        their trees.
+        """
+        manifest = get_cached_manifest()
+
+        if manifest is None:
+            return
+
+        store = SentenceStore(manifest, load_pickle)
+
+        sentences = (sentence for file_id in store.file_ids for sentence in to_columnar(store.get_shard(file_id)))
+        parents, children = count_relations(sentences, self.argv.stats_word, tuple(self.argv.stats_format.split(",")))
+
+        store.close()
+
+        # structure the output text: relation,dep,representation,N
+        lines = []
+        for relation, accumulator in (("parent", parents), ("child", children)):
+            for dep, values in sorted(accumulator.items()):
+                for representation, count in sorted(values.items(), key=lambda x: x[1], reverse=True):
+                    lines.append(relation + "," + dep + "," + representation + "," + str(count))
+
+        print("\n".join(lines))
+
+
 def run(argv):
     """Module entry point for the command line.
 
@@ -42,5 +82,9 @@ def run(argv):
 
     """
 
-    cmd = PossibleRelations(argv)
+    if argv.stats_target == "relations":
+        cmd = Relations(argv)
+    else:
+        cmd = PossibleRelations(argv)
+
     cmd.run()
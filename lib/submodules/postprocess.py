@@ -11,5 +11,9 @@ def start(argv):
         import postprocess.stats as stats
         stats.run(argv)
 
+    elif argv.workflow == "benchmark":
+        import postprocess.benchmark as benchmark
+        benchmark.run(argv)
+
     else:
         print("Not implemented.")
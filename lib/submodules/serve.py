@@ -0,0 +1,11 @@
+
+
+def start(argv):
+    """Module entry point for the command line.
+
+    Args:
+        argv: The command line parameters.
+
+    """
+    import tetre.serve as serve
+    serve.run(argv)
@@ -2,7 +2,7 @@ from graphviz import Digraph
 
 from parsers_cache import get_cached_sentence_image
 from directories import dirs
-from tree_utils import nltk_tree_to_qtree
+from tree_utils import get_group_key
 
 
 class GroupImageNameGenerator(object):
@@ -78,18 +78,18 @@ class ResultsGroupMatcher(object):
         """Adds a new sentence to its correct group.
 
         Args:
-            tree: The NLTK tree with the node representation.
+            tree: The GroupSignature with the node representation.
             token: The TreeNode SpaCy-like node.
             sentence: The raw sentence text.
             img_path: The path to the image related to this sentence.
-            representative: The NLTK tree or TreeNode SpaCy-like node that represents this group.
+            representative: The GroupSignature or TreeNode SpaCy-like node that represents this group.
             img_renderer: The GroupImageRenderer object related to this command.
             extracted_relations: The relations extracted.
             applied: The applied rules that helped with the relations extraction.
         """
 
         # generates the key for this sentences group
-        group_key = nltk_tree_to_qtree(tree)
+        group_key = get_group_key(tree)
 
         if group_key in self.groups:
             group = self.groups[group_key]
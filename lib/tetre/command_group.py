@@ -1,9 +1,9 @@
 from graphviz import Digraph
 
 from django.utils.safestring import mark_safe
-from django.template import Template, Context
+from django.template import Context
 
-from tetre.command_utils import setup_django_template_system
+from tetre.command_utils import setup_django_template_system, get_template
 from tetre.command import SentencesAccumulator, ResultsGroupMatcher, GroupImageNameGenerator
 
 from directories import dirs
@@ -103,15 +103,6 @@ class OutputGenerator(object):
         setup_django_template_system()
         file_name = "results-" + self.argv.tetre_word + ".html"
 
-        with open(dirs['html_templates']['path'] + 'index_group.html', 'r') as index_group:
-            index_group = index_group.read()
-
-        with open(dirs['html_templates']['path'] + 'each_img.html', 'r') as each_img:
-            each_img = each_img.read()
-
-        with open(dirs['html_templates']['path'] + 'each_img_accumulator.html', 'r') as each_img_accumulator:
-            each_img_accumulator = each_img_accumulator.read()
-
         i = 0
 
         all_imgs_html = ""
@@ -119,7 +110,7 @@ class OutputGenerator(object):
 
         for group in group_sorting(self.groups):
 
-            t = Template(each_img_accumulator)
+            t = get_template('each_img_accumulator.html')
             c = Context({"accumulator_img": group["img"],
                          "total_group_sentences": len(group["sentences"])})
             all_imgs_html += t.render(c)
@@ -130,7 +121,7 @@ class OutputGenerator(object):
                 max_sentences = len(group["sentences"])
 
             for sentence in group["sentences"]:
-                t = Template(each_img)
+                t = get_template('each_img.html')
                 c = Context({"gf_id": sentence["sentence"].file_id,
                              "gs_id": sentence["sentence"].id,
                              "gt_id": sentence["token"].idx,
@@ -145,7 +136,7 @@ class OutputGenerator(object):
         avg_per_group = self.commandgroup.get_average_per_group()
         max_num_params = self.commandgroup.get_max_params()
 
-        t = Template(index_group)
+        t = get_template('index_group.html')
         c = Context({"sentences_num": len(self.sentence),
                      "groups_num": len(self.groups),
                      "max_group_num": max_sentences,
@@ -176,25 +167,39 @@ class CommandGroup(SentencesAccumulator, ResultsGroupMatcher):
         """Groups the sentences based on the child nodes of the token with the word being searched.
 
         Args:
-            tree: The NLTK tree with the node representation.
+            tree: The GroupSignature with the node representation.
             token: The TreeNode SpaCy-like node.
             sentence: The raw sentence text.
             img_path: The path to the image related to this sentence.
         """
         self.group_accounting_add(tree, token, sentence, img_path, token, self.img_renderer)
 
-    def run(self):
-        """Execution entry point.
+    def process_token(self, token, sentence):
+        """Adds the sentence of a single token of the word being searched for to its group.
+
+        Args:
+            token: The TreeNode SpaCy-like node.
+            sentence: The tree.FullSentence the token belongs to.
         """
-        for token, sentence in get_tokens(self.argv):
-            img_path = self.process_sentence(sentence)
+        img_path = self.process_sentence(sentence)
 
-            tree = get_node_representation(self.argv.tetre_format, token)
+        tree = get_node_representation(self.argv.tetre_format, token)
 
-            self.group_accounting_add_by_token(tree, token, sentence, img_path)
+        self.group_accounting_add_by_token(tree, token, sentence, img_path)
 
+    def output(self):
+        """Generates the HTML output for the word being searched for.
+        """
         output_generator = OutputGenerator(self.argv,
                                            self.sentence_imgs,
                                            self.sentence,
                                            self)
         output_generator.graph_gen_html()
+
+    def run(self):
+        """Execution entry point.
+        """
+        for token, sentence in get_tokens(self.argv):
+            self.process_token(token, sentence)
+
+        self.output()
@@ -1,24 +1,30 @@
 from graphviz import Digraph
 
 import json
-import copy
 import random
 import csv
 import sys
+import itertools
+import collections
+import multiprocessing
 
 from django.utils.safestring import mark_safe
-from django.template import Template, Context
+from django.template import Context
 
-from tetre.command_utils import setup_django_template_system, percentage
+from tetre.command_utils import setup_django_template_system, get_template, percentage
 from tetre.command import SentencesAccumulator, ResultsGroupMatcher, GroupImageNameGenerator
 
-from directories import dirs
+from directories import dirs, get_dir
 
 from tetre.graph_processing import Process, Reduction
 from tetre.graph_processing_children import ProcessChildren
 from tetre.graph_extraction import ProcessExtraction
+from tetre.rule_profiler import RuleProfiler
+from tetre.rule_memo import RuleMemo
 from parsers import get_tokens, highlight_word
 from tree_utils import group_sorting, get_node_representation
+from tree_overlay import SentenceOverlay
+from vocabulary import vocabulary
 
 
 class GroupImageRenderer(object):
@@ -38,7 +44,7 @@ class GroupImageRenderer(object):
         """Generates the images based on the node that represents this group.
 
         Args:
-            tree: The NLTK Tree node.
+            tree: The GroupSignature of the group.
 
         Returns:
             A string with the image path.
@@ -186,13 +192,7 @@ class OutputGenerator(object):
             A string with the HTML/JSON for all the output of this sentence.
         """
 
-        with open(dirs['html_templates']['path'] + 'each_sentence.html', 'r') as each_sentence:
-            each_sentence = each_sentence.read()
-
-        with open(dirs['html_templates']['path'] + 'each_sentence_opt.html', 'r') as each_sentence_opt:
-            each_sentence_opt = each_sentence_opt.read()
-
-        to = Template(each_sentence_opt)
+        to = get_template('each_sentence_opt.html')
 
         subj, obj, others = self.get_extracted_results(sentence, {"html": True, "template": to})
 
@@ -201,7 +201,7 @@ class OutputGenerator(object):
         if self.argv.tetre_include_external:
             text_allenai_openie, text_stanford_openie, text_mpi_clauseie = self.get_external_results(sentence)
 
-        ts = Template(each_sentence)
+        ts = get_template('each_sentence.html')
         c = Context({
             "add_external": self.argv.tetre_include_external,
             "gf_id": sentence["sentence"].file_id,
@@ -227,17 +227,11 @@ class OutputGenerator(object):
         setup_django_template_system()
         file_name = "results-" + self.argv.tetre_word + ".html"
 
-        with open(dirs['html_templates']['path'] + 'index_group.html', 'r') as index_group:
-            index_group = index_group.read()
-
-        with open(dirs['html_templates']['path'] + 'each_img_accumulator.html', 'r') as each_img_accumulator:
-            each_img_accumulator = each_img_accumulator.read()
-
         all_imgs_html = ""
         max_sentences = 0
 
         for group in group_sorting(self.groups):
-            t = Template(each_img_accumulator)
+            t = get_template('each_img_accumulator.html')
             c = Context({"accumulator_img": group["img"],
                          "total_group_sentences": len(group["sentences"])})
             all_imgs_html += t.render(c)
@@ -264,7 +258,7 @@ class OutputGenerator(object):
         avg_per_group = self.command_simplified_group.get_average_per_group()
         max_num_params = self.command_simplified_group.get_max_params()
 
-        t = Template(index_group)
+        t = get_template('index_group.html')
         c = Context({"sentences_num": self.command_simplified_group.get_sentence_totals(),
                      "groups_num": len(self.groups),
                      "max_group_num": max_sentences,
@@ -276,8 +270,11 @@ class OutputGenerator(object):
         with open(dirs['output_html']['path'] + file_name, 'w') as output:
             output.write(t.render(c))
 
-    def graph_gen_json(self):
-        """Generates the JSON output for all the sentences for the word being searched for.
+    def get_json_results(self):
+        """Generates the relations extracted from all the sentences for the word being searched for.
+
+        Returns:
+            A list with a dictionary for each sentence, ready to be serialised as JSON.
         """
         json_result = []
 
@@ -291,30 +288,71 @@ class OutputGenerator(object):
                      "other_relations": others,
                      "rules_applied": ",".join(sentence["applied"])})
 
-        print(json.dumps(json_result, sort_keys=True))
+        return json_result
+
+    def graph_gen_json(self):
+        """Generates the JSON output for all the sentences for the word being searched for. When searching for more
+        than one word, the output of each word is written to its own file instead of printed.
+        """
+        json_result = self.get_json_results()
+
+        if len(self.argv.tetre_words) > 1:
+            file_name = "results-" + self.argv.tetre_word + ".json"
+
+            with open(get_dir('output_json') + file_name, 'w') as output:
+                output.write(json.dumps(json_result, sort_keys=True))
+        else:
+            print(json.dumps(json_result, sort_keys=True))
 
 
 class CommandSimplifiedGroup(SentencesAccumulator, ResultsGroupMatcher):
-    def __init__(self, argv):
+    def __init__(self, argv, rule_engines=None):
         """Generates the HTML for all sentences containing the searched word. It groups the sentences based on the
         child nodes of the token with the word being searched. Rules are applied to increase number of relations
         obtained.
 
         Args:
             argv: The command line arguments.
+            rule_engines: A tuple with the Process, ProcessChildren and ProcessExtraction objects applying the rules,
+                so they can be shared (e.g.: by tetre.serve). New ones are created by default.
         """
         SentencesAccumulator.__init__(self, argv)
         ResultsGroupMatcher.__init__(self, argv)
 
         self.img_renderer = GroupImageRenderer(argv)
 
+        if rule_engines is None:
+            rule_engines = (Process(), ProcessChildren(), ProcessExtraction())
+
+        self.rule_applier, self.rule_applier_children, self.rule_extraction = rule_engines
+
+        self.profiler = None
+        if argv.tetre_profile_rules:
+            self.set_profiler(RuleProfiler())
+
+        if argv.tetre_memoize_rules:
+            memo = RuleMemo()
+            self.rule_applier.set_memo(memo)
+            self.rule_applier_children.set_memo(memo)
+
         self.argv = argv
 
+    def set_profiler(self, profiler):
+        """Records the measurements of the rules applied from now on.
+
+        Args:
+            profiler: The rule_profiler.RuleProfiler object.
+        """
+        self.profiler = profiler
+
+        for rule_engine in (self.rule_applier, self.rule_applier_children, self.rule_extraction):
+            rule_engine.set_profiler(profiler)
+
     def group_accounting_add_by_tree(self, tree, token, sentence, img_path, extracted_relations, applied):
         """Groups the sentences based on the child nodes of the token with the word being searched.
 
         Args:
-            tree: The NLTK tree with the node representation.
+            tree: The GroupSignature with the node representation.
             token: The TreeNode SpaCy-like node.
             sentence: The raw sentence text.
             img_path: The path to the image related to this sentence.
@@ -364,51 +402,90 @@ class CommandSimplifiedGroup(SentencesAccumulator, ResultsGroupMatcher):
 
         return simplified_groups
 
-    def run(self):
-        """Execution entry point.
+    def process_token(self, token_original, sentence):
+        """Applies the rules to a single token of the word being searched for and adds its sentence to its group.
+
+        Args:
+            token_original: The TreeNode SpaCy-like node.
+            sentence: The tree.FullSentence the token belongs to.
+        """
+        img_path = self.process_sentence(sentence)
+
+        self.add_token_result(token_original, sentence, img_path, self.apply_rules(token_original, sentence))
+
+    def apply_rules(self, token_original, sentence):
+        """Applies the rules to a single token of the word being searched for.
+
+        Args:
+            token_original: The TreeNode SpaCy-like node. The rules change its copy-on-write version (see
+                tree_overlay.SentenceOverlay) instead, so the sentence is left unchanged.
+            sentence: The tree.FullSentence the token belongs to.
+
+        Returns:
+            A tuple with the GroupSignature of the group of the token, the relations extracted and the rules applied,
+            as expected by add_token_result.
         """
-        rule_applier = Process()
-        rule_applier_children = ProcessChildren()
-        rule_extraction = ProcessExtraction()
+        token = SentenceOverlay(sentence).get_node(token_original)
+
+        if self.profiler is not None:
+            self.profiler.start_match(sentence)
+
+        tree = get_node_representation(self.argv.tetre_format, token)
+
+        tree, applied_verb = self.rule_applier.apply_all(tree, token)
 
-        for token_original, sentence in get_tokens(self.argv):
+        tree_grouping = tree
+        tree_subj_grouping = ""
+        tree_obj_grouping = ""
 
-            img_path = self.process_sentence(sentence)
-            token = copy.deepcopy(token_original)
-            tree = get_node_representation(self.argv.tetre_format, token)
+        if self.argv.tetre_behaviour_root != "verb":
+            tree_grouping = ""
+            # the behaviour root is given by each query of serve, so it is matched on the strings instead of being
+            # registered in the vocabulary (see Vocabulary.containing)
+            behaviour_root = self.argv.tetre_behaviour_root
+            subj_ids = vocabulary.containing("subj")
+            obj_ids = vocabulary.containing("obj")
+            for child in token.children:
+                if behaviour_root in child.dep_:
+                    tree_grouping = get_node_representation(self.argv.tetre_format, child)
+                if child.dep_id in subj_ids:
+                    tree_subj_grouping = get_node_representation(self.argv.tetre_format, child)
+                if child.dep_id in obj_ids:
+                    tree_obj_grouping = get_node_representation(self.argv.tetre_format, child)
 
-            tree, applied_verb = rule_applier.apply_all(tree, token)
+        tree_obj_grouping, tree_subj_grouping, applied_obj_subj = \
+            self.rule_applier_children.apply_all(tree_obj_grouping,
+                                                 tree_subj_grouping,
+                                                 token)
 
-            tree_grouping = tree
-            tree_subj_grouping = ""
-            tree_obj_grouping = ""
+        if "subj" in self.argv.tetre_behaviour_root:
+            tree_grouping = tree_subj_grouping
+        if "obj" in self.argv.tetre_behaviour_root:
+            tree_grouping = tree_obj_grouping
 
-            if self.argv.tetre_behaviour_root != "verb":
-                tree_grouping = ""
-                for child in token.children:
-                    if self.argv.tetre_behaviour_root in child.dep_:
-                        tree_grouping = get_node_representation(self.argv.tetre_format, child)
-                    if "subj" in child.dep_:
-                        tree_subj_grouping = get_node_representation(self.argv.tetre_format, child)
-                    if "obj" in child.dep_:
-                        tree_obj_grouping = get_node_representation(self.argv.tetre_format, child)
+        extracted_relations = self.rule_extraction.apply_all(tree, token, sentence)
 
-            tree_obj_grouping, tree_subj_grouping, applied_obj_subj = \
-                rule_applier_children.apply_all(tree_obj_grouping,
-                                                tree_subj_grouping,
-                                                token)
+        applied = applied_verb + applied_obj_subj
 
-            if "subj" in self.argv.tetre_behaviour_root:
-                tree_grouping = tree_subj_grouping
-            if "obj" in self.argv.tetre_behaviour_root:
-                tree_grouping = tree_obj_grouping
+        return tree_grouping, extracted_relations, applied
 
-            extracted_relations = rule_extraction.apply_all(tree, token, sentence)
+    def add_token_result(self, token_original, sentence, img_path, result):
+        """Adds the sentence of a token of the word being searched for to its group.
 
-            applied = applied_verb + applied_obj_subj
+        Args:
+            token_original: The TreeNode SpaCy-like node.
+            sentence: The tree.FullSentence the token belongs to.
+            img_path: The path to the image related to this sentence.
+            result: The tuple returned by apply_rules for this token.
+        """
+        tree_grouping, extracted_relations, applied = result
 
-            self.group_accounting_add_by_tree(tree_grouping, token, sentence, img_path, extracted_relations, applied)
+        self.group_accounting_add_by_tree(tree_grouping, token_original, sentence, img_path, extracted_relations,
+                                          applied)
 
+    def output(self):
+        """Samples the groups, if requested, and generates the HTML/JSON output for the word being searched for.
+        """
         self.set_groups(self.filter(self.get_groups()))
 
         output_generator = OutputGenerator(self.argv, self)
@@ -417,3 +494,111 @@ class CommandSimplifiedGroup(SentencesAccumulator, ResultsGroupMatcher):
             output_generator.graph_gen_json()
         elif self.argv.tetre_output == "html":
             output_generator.graph_gen_html()
+
+        if self.profiler is not None:
+            self.profiler.save(get_dir('output_json') + "rules-profile-" + self.argv.tetre_word + ".json")
+
+    def run(self):
+        """Execution entry point.
+        """
+        if self.argv.tetre_rule_workers > 1:
+            apply_rules_in_pool(self.argv, ((self, token, sentence) for token, sentence in get_tokens(self.argv)))
+        else:
+            for token_original, sentence in get_tokens(self.argv):
+                self.process_token(token_original, sentence)
+
+        self.output()
+
+
+# the CommandSimplifiedGroup of each process started by apply_rules_in_pool
+rule_worker = None
+
+
+def init_rule_worker(argv):
+    """Creates the rule engines of a process applying the rules, only once per process.
+
+    Args:
+        argv: The command line arguments.
+    """
+    global rule_worker
+    rule_worker = CommandSimplifiedGroup(argv)
+
+
+def apply_rules_worker(task):
+    """Applies the rules to a chunk of the tokens of the words being searched for, see apply_rules_in_pool.
+
+    Args:
+        task: A list of tuples with the key of the command of the word, a tree.FullSentence and the idx of a token
+            of it.
+
+    Returns:
+        A tuple with a list of the results of CommandSimplifiedGroup.apply_rules for each token, and a dictionary
+        with the rule_profiler.RuleProfiler with the measurements of the rules of each command key, when profiling.
+    """
+    profilers = {}
+    results = []
+
+    for key, sentence, idx in task:
+        if rule_worker.profiler is not None:
+            if key not in profilers:
+                profilers[key] = RuleProfiler()
+
+            rule_worker.set_profiler(profilers[key])
+
+        results.append(rule_worker.apply_rules(sentence.get_token(idx), sentence))
+
+    return results, profilers
+
+
+def apply_rules_in_pool(argv, matches):
+    """Applies the rules to the tokens of the words being searched for across --tetre_rule_workers processes, in
+    chunks of --tetre_rule_chunk_size tokens. The results are added to the groups of their words in the order of the
+    tokens, so the output is the same as calling CommandSimplifiedGroup.process_token for one token at a time. The
+    tokens are only read as the processes take their chunks, so the rules start being applied while the corpus is
+    still being read.
+
+    Args:
+        argv: The command line arguments.
+        matches: An iterable of tuples with the CommandSimplifiedGroup of the word, the TreeNode SpaCy-like node and
+            the tree.FullSentence it belongs to.
+    """
+    matches = iter(matches)
+    chunk_size = argv.tetre_rule_chunk_size
+
+    commands = []
+    keys = {}
+
+    # the chunks sent to the processes and not merged yet, in the order of the tasks
+    chunks = collections.deque()
+
+    def tasks():
+        chunk = list(itertools.islice(matches, chunk_size))
+
+        while len(chunk) > 0:
+            for command, token, sentence in chunk:
+                if id(command) not in keys:
+                    keys[id(command)] = len(commands)
+                    commands.append(command)
+
+            chunks.append(chunk)
+
+            # the tokens are sent by their idx, so each sentence is pickled along with its tree only once per chunk
+            yield [(keys[id(command)], sentence, token.idx) for command, token, sentence in chunk]
+
+            chunk = list(itertools.islice(matches, chunk_size))
+
+    pool = multiprocessing.Pool(argv.tetre_rule_workers, initializer=init_rule_worker, initargs=(argv,))
+    try:
+        # the chunks are read as the pool takes them, and imap yields in the order of the tasks, regardless of
+        # which worker finishes first, so each result belongs to the oldest chunk not merged yet
+        for results, profilers in pool.imap(apply_rules_worker, tasks()):
+            chunk = chunks.popleft()
+
+            for (command, token, sentence), result in zip(chunk, results):
+                command.add_token_result(token, sentence, command.process_sentence(sentence), result)
+
+            for key, profiler in profilers.items():
+                commands[key].profiler.merge(profiler)
+    finally:
+        pool.close()
+        pool.join()
@@ -1,10 +1,21 @@
 import django
 from django.conf import settings
+from django.template import Template
+
+from directories import dirs
+
+
+# the compiled templates, by file name, shared by all the words being output
+templates = {}
 
 
 def setup_django_template_system():
-    """Initialises the Django templating system as to be used standalone.
+    """Initialises the Django templating system as to be used standalone. It is only initialised once, even if
+    output is generated for several words.
     """
+    if settings.configured:
+        return
+
     settings.configure()
     settings.TEMPLATES = [
         {
@@ -14,6 +25,22 @@ def setup_django_template_system():
     django.setup()
 
 
+def get_template(name):
+    """Reads and compiles a template from the templates folder, only the first time it is requested.
+
+    Args:
+        name: The file name of the template.
+
+    Returns:
+        The compiled template (django.template.Template).
+    """
+    if name not in templates:
+        with open(dirs['html_templates']['path'] + name, 'r') as template_file:
+            templates[name] = Template(template_file.read())
+
+    return templates[name]
+
+
 def percentage(percent, whole):
     """Simple method for percentage calculation.
 
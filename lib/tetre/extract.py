@@ -1,6 +1,39 @@
+import copy
+
+from parsers import get_tokens_by_word
 from tetre.command_accumulative import CommandAccumulative
 from tetre.command_group import CommandGroup
-from tetre.command_simplified import CommandSimplifiedGroup
+from tetre.command_simplified import CommandSimplifiedGroup, apply_rules_in_pool
+
+
+def get_words(argv):
+    """Lists the words being searched for, given either as a comma separated --tetre_word or in a --tetre_word_file
+    with one word per line.
+
+    Args:
+        argv: An object with the command line arguments.
+
+    Returns:
+        A list with the words, without repetitions, in the order they were given.
+    """
+    words = []
+
+    if isinstance(argv.tetre_word, str):
+        words.extend(argv.tetre_word.split(","))
+
+    if isinstance(argv.tetre_word_file, str):
+        with open(argv.tetre_word_file, 'r') as word_file:
+            words.extend(word_file.read().splitlines())
+
+    unique_words = []
+
+    for word in words:
+        word = word.strip()
+
+        if word != "" and word not in unique_words:
+            unique_words.append(word)
+
+    return unique_words
 
 
 def argv_preprocessing(argv):
@@ -16,13 +49,46 @@ def argv_preprocessing(argv):
         argv.tetre_output = "html"
         argv.tetre_output_csv = True
 
+    argv.tetre_words = get_words(argv)
+
+    if len(argv.tetre_words) > 0:
+        argv.tetre_word = argv.tetre_words[0]
+
     behaviours_needs_word = ["accumulator", "groupby", "simplified_groupby"]
-    if any(argv.tetre_behaviour in b for b in behaviours_needs_word) and not isinstance(argv.tetre_word, str):
+    if any(argv.tetre_behaviour in b for b in behaviours_needs_word) and len(argv.tetre_words) == 0:
         print("Please define --tetre_word param")
 
     return argv
 
 
+def run_by_word(argv, command_class):
+    """Runs a grouping command for each of the words being searched for, reading the corpus only once. Each word
+    has its own command object, receiving the tokens of its word, and its own output.
+
+    Args:
+        argv: An object with the command line arguments.
+        command_class: The command class, either CommandGroup or CommandSimplifiedGroup.
+    """
+    commands = {}
+
+    for word in argv.tetre_words:
+        argv_word = copy.copy(argv)
+        argv_word.tetre_word = word
+        commands[word] = command_class(argv_word)
+
+    matches = ((commands[word], token, sentence)
+               for word, token, sentence in get_tokens_by_word(argv, argv.tetre_words))
+
+    if command_class == CommandSimplifiedGroup and argv.tetre_rule_workers > 1:
+        apply_rules_in_pool(argv, matches)
+    else:
+        for command, token, sentence in matches:
+            command.process_token(token, sentence)
+
+    for word in argv.tetre_words:
+        commands[word].output()
+
+
 def run(argv):
     """Interface for the TETRE extraction tools module, given the command line parameters.
 
@@ -35,13 +101,14 @@ def run(argv):
     argv = argv_preprocessing(argv)
 
     if argv.tetre_behaviour == "accumulator":
-        cmd = CommandAccumulative(argv)
+        for word in argv.tetre_words:
+            argv_word = copy.copy(argv)
+            argv_word.tetre_word = word
+            CommandAccumulative(argv_word).run()
     elif argv.tetre_behaviour == "groupby":
-        cmd = CommandGroup(argv)
+        run_by_word(argv, CommandGroup)
     elif argv.tetre_behaviour == "simplified_groupby":
-        cmd = CommandSimplifiedGroup(argv)
+        run_by_word(argv, CommandSimplifiedGroup)
     else:
         print("No command!")
         return
-
-    cmd.run()
@@ -37,7 +37,7 @@ class Extraction(RuleApplier):
         """Apply all extraction rules and returns a list with its results.
 
         Args:
-            nltk_tree: The NLTK tree with the tree representation.
+            nltk_tree: The GroupSignature with the tree representation.
             spacy_tree: The SpaCy-like TreeNode tree, rooted at the word being searched for.
 
         Returns:
@@ -48,8 +48,11 @@ class Extraction(RuleApplier):
 
         relations = []
         
-        for rule in self.get_rules():
-            relations.append(rule(self, root, node_set, spacy_tree))
+        for rule, rule_name in self.get_rules():
+            if self.profiler is None:
+                relations.append(rule(self, root, node_set, spacy_tree))
+            else:
+                relations.append(self.profiler.run_rule(rule, rule_name, self, root, node_set, spacy_tree))
 
         return relations
 
@@ -60,6 +63,14 @@ class ProcessExtraction(object):
         """
         self.extraction = Extraction()
 
+    def set_profiler(self, profiler):
+        """Records the measurements of the extraction rules.
+
+        Args:
+            profiler: The rule_profiler.RuleProfiler object, or None to stop recording.
+        """
+        self.extraction.profiler = profiler
+
     def apply_all(self, nltk_tree, spacy_tree, sentence):
         """Apply all extraction rules to the provided parameters. This would extract available relations. It is
         expected that at this point that the SpaCy-like tree (TreeNode) was manipulated as to improve the amount
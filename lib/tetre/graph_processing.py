@@ -2,6 +2,7 @@ from functools import reduce
 
 from tetre.rule_applier import *
 from tree_utils import find_in_spacynode, merge_nodes
+from vocabulary import vocabulary
 
 
 class Growth(RuleApplier):
@@ -12,11 +13,43 @@ class Growth(RuleApplier):
         RuleApplier.__init__(self)
         self.subs = ['nsubj', 'csubj', 'nsubjpass', 'csubjpass']
         self.objs = ['dobj', 'iobj', 'pobj']
+        self.subs_ids = vocabulary.get_ids(self.subs)
+        self.objs_ids = vocabulary.get_ids(self.objs)
         self.move_if = [("xcomp", "obj"), ("ccomp", "obj"), ("xcomp", "subj"), ("ccomp", "subj")]
         self.downwards_subj = "nsubj"
         self.downwards_obj = "dobj"
 
+    def get_memo_key(self, spacy_tree):
+        """Returns the features of the tree read by the rules of this class (see RuleApplier.get_memo_key): the
+        dependency tag of the node, if it is the root, and the dependency tag of each of its children, along with
+        whether it is "in" (see transform_prep_in_to_dobj) and, for a relcl or ccomp node, its part of speech (see
+        replace_subj_if_dep_is_relcl_or_ccomp).
+
+        Args:
+            spacy_tree: The TreeNode object the rules are applied to.
+
+        Returns:
+            A tuple with the features, or None for a conj node, as recurse_on_dep_conj_if_no_subj then also reads
+            the tree above the node.
+        """
+        # these features are enough only because apply makes a single pass over the rules, each one reading the node,
+        # its head and its children as left by the rules before it: recurse_on_dep_conj_if_no_subj, which reads up
+        # the tree, is bypassed through the conj check below, and once replace_subj_if_dep_is_relcl_or_ccomp (or
+        # add_dobj_if_dep_is_subj) moves the head under the node, the rules after it only read the dep_ it was given,
+        # never its pos_ or orth_. A rule reading anything else, or a second pass over the rules, must extend the key
+        # (see tests/test_rule_memo.py)
+        if spacy_tree.dep_ == "conj":
+            return None
+
+        if spacy_tree.dep_ == "relcl" or spacy_tree.dep_ == "ccomp":
+            return spacy_tree.dep_, spacy_tree.is_root(), \
+                tuple((child.dep_, child.pos_, child.orth_ == "in") for child in spacy_tree.children)
+
+        return spacy_tree.dep_, spacy_tree.is_root(), \
+            tuple((child.dep_, child.orth_ == "in") for child in spacy_tree.children)
+
     @RuleApplier.register_function
+    @RuleApplier.triggered_by("relcl", "ccomp")
     def replace_subj_if_dep_is_relcl_or_ccomp(self, root, node_set, spacy_tree):
         """
             1) Consider the following sentence:
@@ -63,7 +96,7 @@ class Growth(RuleApplier):
 
             children_list = token.children[:]
             for i in range(0, len(children_list)):
-                if children_list[i].dep_ in self.subs:
+                if children_list[i].dep_id in self.subs_ids:
                     has_subj = True
 
                     if not (token.children[i].pos_ in ["NOUN", "PROPN", "VERB", "NUM", "PRON", "X"]):
@@ -95,6 +128,7 @@ class Growth(RuleApplier):
         return root, node_set, spacy_tree, is_applied
 
     @RuleApplier.register_function
+    @RuleApplier.triggered_by("conj")
     def recurse_on_dep_conj_if_no_subj(self, root, node_set, spacy_tree):
         """
             1) Consider the following sentence:
@@ -141,6 +175,7 @@ class Growth(RuleApplier):
         is_applied = False
 
         upwards = ["conj"]
+        subj_ids = vocabulary.containing("subj")
 
         token = spacy_tree
         token_head = spacy_tree
@@ -149,7 +184,7 @@ class Growth(RuleApplier):
 
             if token_head.dep_ in upwards        \
                         and token_head.head != token_head \
-                        and len([child for child in token.children if child.dep_ in self.subs]) == 0:
+                        and len([child for child in token.children if child.dep_id in self.subs_ids]) == 0:
 
                 token_head = token_head.head
                 children_list = token_head.children[:]
@@ -166,15 +201,15 @@ class Growth(RuleApplier):
                     if token_head.children[j].dep_ in "conj" \
                             and token_head.children[j] != token:
                         other_conj_exists = True
-                    if "subj" in token_head.children[j].dep_:
+                    if token_head.children[j].dep_id in subj_ids:
                         has_subj = True
                     # if "obj" in token_head.children[j].dep_:
                     #     has_obj = True
 
                 for i in range(0, len(children_list)):
                     is_other_conj = token_head.children[i].dep_ == "conj" and token_head.children[i] != token
-                    is_subj = token_head.children[i].dep_ in self.subs
-                    is_obj = token_head.children[i].dep_ in self.objs
+                    is_subj = token_head.children[i].dep_id in self.subs_ids
+                    is_obj = token_head.children[i].dep_id in self.objs_ids
 
                     node_result = find_in_spacynode(token_head.children[i], token.dep_, token.orth_)
 
@@ -215,6 +250,7 @@ class Growth(RuleApplier):
         return root, node_set, spacy_tree, is_applied
 
     @RuleApplier.register_function
+    @RuleApplier.triggered_by("xcomp", "ccomp")
     def transform_xcomp_to_dobj_or_sub_if_doesnt_exists(self, root, node_set, spacy_tree):
         """
             1) Consider the sentences:
@@ -254,26 +290,28 @@ class Growth(RuleApplier):
         for replace, target in self.move_if:
             is_obj = False
 
+            target_ids = vocabulary.containing(target)
             for child in spacy_tree.children:
-                if target in child.dep_:
+                if child.dep_id in target_ids:
                     is_obj = True
                     break
 
             if is_obj:
                 continue
 
+            replace_ids = vocabulary.containing(replace)
             for child in spacy_tree.children:
-                if replace in child.dep_:
+                if child.dep_id in replace_ids:
                     is_applied = True
 
                     child.dep_ = target
                     node_set = [target if node == replace else node for node in node_set]
                     break
 
-        node_set = set([self.rewrite_dp_tag(node) for node in node_set])
         return root, node_set, spacy_tree, is_applied
 
     @RuleApplier.register_function
+    @RuleApplier.triggered_by("prep")
     def transform_prep_in_to_dobj(self, root, node_set, spacy_tree):
         """
             1) Consider the following sentence:
@@ -301,22 +339,44 @@ class Growth(RuleApplier):
         replace = "prep"
 
         is_obj = False
+        target_ids = vocabulary.containing(target)
         for child in spacy_tree.children:
-            if target in child.dep_:
+            if child.dep_id in target_ids:
                 is_obj = True
 
+        replace_ids = vocabulary.containing(replace)
         for child in spacy_tree.children:
-            if replace in child.dep_ and child.orth_ == "in":
+            if child.dep_id in replace_ids and child.orth_ == "in":
                 if not is_obj:
                     is_applied = True
 
                     child.dep_ = target
                     node_set = [target if node == replace else node for node in node_set]
 
-        node_set = list(set([self.rewrite_dp_tag(node) for node in node_set]))
         return root, node_set, spacy_tree, is_applied
 
     @RuleApplier.register_function
+    def rewrite_tags(self, root, node_set, spacy_tree):
+        """Translates the tags of the nodes of the NLTK tree into their simplified versions (see rewrite_dp_tag),
+        removing the duplicates. It is not triggered by any tag, so the tags are translated even if none of the rules
+        before it are applied.
+
+        Args:
+            root: The head of the NLTK tree.
+            node_set: The nodes of the NLTK tree.
+            spacy_tree: The TreeNode object, rooted at the word being searched for.
+
+        Returns:
+            root: The unaltered head of the NLTK tree.
+            node_set: The translated nodes of the NLTK tree, as a list, as add_dobj_if_dep_is_subj appends to it.
+            spacy_tree: The unaltered TreeNode object.
+            is_applied: Always False, as the tree is not changed.
+        """
+        node_set = list(set([self.rewrite_dp_tag(node) for node in node_set]))
+        return root, node_set, spacy_tree, False
+
+    @RuleApplier.register_function
+    @RuleApplier.triggered_by("subj")
     def add_dobj_if_dep_is_subj(self, root, node_set, spacy_tree):
         """
             1) Consider the following sentence:
@@ -347,13 +407,16 @@ class Growth(RuleApplier):
         has_subj = False
         has_obj = False
 
+        subj_ids = vocabulary.containing("subj")
+        obj_ids = vocabulary.containing("obj")
+
         for j in range(0, len(token.children)):
-            if "subj" in token.children[j].dep_:
+            if token.children[j].dep_id in subj_ids:
                 has_subj = True
-            if "obj" in token.children[j].dep_:
+            if token.children[j].dep_id in obj_ids:
                 has_obj = True
 
-        if "subj" in token.dep_ and has_subj and not has_obj:
+        if token.dep_id in subj_ids and has_subj and not has_obj:
             is_applied = True
             
             children_list = token_head.children[:]
@@ -379,6 +442,19 @@ class Reduction(RuleApplier):
         """
         RuleApplier.__init__(self)
         self.tags_to_be_removed = {'punct', 'mark', ' ', '', 'meta'}
+        self.tags_to_be_removed_ids = vocabulary.get_ids(self.tags_to_be_removed)
+
+    def get_memo_key(self, spacy_tree):
+        """Returns the features of the tree read by the rules of this class (see RuleApplier.get_memo_key): the
+        dependency tag of each child of the node.
+
+        Args:
+            spacy_tree: The TreeNode object the rules are applied to.
+
+        Returns:
+            A tuple with the features.
+        """
+        return tuple(child.dep_ for child in spacy_tree.children)
 
     @RuleApplier.register_function
     def remove_duplicates(self, root, node_set, spacy_tree):
@@ -418,7 +494,7 @@ class Reduction(RuleApplier):
         node_set = set(node_set) - self.tags_to_be_removed
 
         for child in spacy_tree.children:
-            if child.dep_ in self.tags_to_be_removed:
+            if child.dep_id in self.tags_to_be_removed_ids:
                 is_applied = True
                 child.no_follow = True
 
@@ -444,6 +520,7 @@ class Reduction(RuleApplier):
         return root, node_set, spacy_tree, False
 
     @RuleApplier.register_function
+    @RuleApplier.triggered_by("subj", "obj")
     def merge_multiple_subj_or_dobj(self, root, node_set, spacy_tree):
         """This intends to unify multiple subj and fix representation. Consider the following sentence:
             "Another partitional method ORCLUS [2] improves PROCLUS by selecting principal components so that clusters
@@ -470,7 +547,8 @@ class Reduction(RuleApplier):
         
         for group in groups:
             this_group = []
-            count = reduce(lambda x, y: x + 1 if group in y.dep_ else x, spacy_tree.children, 0)
+            group_ids = vocabulary.containing(group)
+            count = reduce(lambda x, y: x + 1 if y.dep_id in group_ids else x, spacy_tree.children, 0)
 
             if count < 2:
                 continue
@@ -481,7 +559,7 @@ class Reduction(RuleApplier):
                 children_list = spacy_tree.children[:]
 
                 for i in range(0, len(children_list)):
-                    if group in children_list[i].dep_:
+                    if children_list[i].dep_id in group_ids:
                         this_group.append(children_list[i])
                         spacy_tree.children.pop(i)
 
@@ -504,6 +582,24 @@ class Process(object):
         self.reduction = Reduction()
         return
 
+    def set_profiler(self, profiler):
+        """Records the measurements of the growth and reduction rules.
+
+        Args:
+            profiler: The rule_profiler.RuleProfiler object, or None to stop recording.
+        """
+        self.growth.profiler = profiler
+        self.reduction.profiler = profiler
+
+    def set_memo(self, memo):
+        """Memoizes the outcome of the growth and reduction rules.
+
+        Args:
+            memo: The rule_memo.RuleMemo object, or None to always apply the rules.
+        """
+        self.growth.memo = memo
+        self.reduction.memo = memo
+
     def apply_all(self, nltk_tree, spacy_tree):
         """Apply all growth and reduction rules.
 
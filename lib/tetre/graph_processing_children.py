@@ -1,5 +1,6 @@
 from tetre.rule_applier import *
 from tree_utils import find_in_spacynode
+from vocabulary import vocabulary
 
 
 class Children(RuleApplier):
@@ -10,6 +11,7 @@ class Children(RuleApplier):
         """
         RuleApplier.__init__(self)
         self.tags_to_be_removed = {'det', ' ', ''}
+        self.tags_to_be_removed_ids = vocabulary.get_ids(self.tags_to_be_removed)
 
     def bring_grandchild_prep_or_relcl_up_as_child(self, root, node_set, spacy_tree):
         """
@@ -197,7 +199,7 @@ class Obj(Children):
         node_set = set(node_set) - self.tags_to_be_removed
 
         for child in spacy_tree.children:
-            if child.dep_ in self.tags_to_be_removed:
+            if child.dep_id in self.tags_to_be_removed_ids:
                 is_applied = True
                 child.no_follow = True
 
@@ -302,7 +304,7 @@ class Subj(Children):
         node_set = set(node_set) - self.tags_to_be_removed
 
         for child in spacy_tree.children:
-            if child.dep_ in self.tags_to_be_removed:
+            if child.dep_id in self.tags_to_be_removed_ids:
                 is_applied = True
                 child.no_follow = True
 
@@ -352,6 +354,24 @@ class ProcessChildren(object):
         self.obj = Obj()
         self.subj = Subj()
 
+    def set_profiler(self, profiler):
+        """Records the measurements of the obj and subj rules.
+
+        Args:
+            profiler: The rule_profiler.RuleProfiler object, or None to stop recording.
+        """
+        self.obj.profiler = profiler
+        self.subj.profiler = profiler
+
+    def set_memo(self, memo):
+        """Memoizes the outcome of the obj and subj rules, when possible (see RuleApplier.get_memo_key).
+
+        Args:
+            memo: The rule_memo.RuleMemo object, or None to always apply the rules.
+        """
+        self.obj.memo = memo
+        self.subj.memo = memo
+
     def apply_all(self, nltk_tree_obj, nltk_tree_subj, spacy_tree):
         """Apply all obj and subj rules.
 
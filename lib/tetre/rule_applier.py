@@ -1,8 +1,14 @@
-from nltk import Tree
+from tree_utils import GroupSignature
+from vocabulary import vocabulary
 
 
 class RuleApplier(object):
-    deco_list = []
+    # the rules of each class, as pairs with the function and its qualified name, in the order they are defined. It is
+    # filled in once, when the class is created (see __init_subclass__)
+    rules = ()
+
+    # for each rule, in the same order, the ids of the dependency tags that can make it fire, or None if it always runs
+    rule_triggers = ()
 
     def __init__(self):
         """The rule applier class. It provides functionality as to centralize certain structures used into all
@@ -13,7 +19,8 @@ class RuleApplier(object):
         from the ruleset.
 
         The class with the rules to be applied then extends this RuleApplier class. It can then iterate through the
-        rules and apply them by calling the apply method. E.g.: see Process.apply_all()
+        rules and apply them by calling the apply method. E.g.: see Process.apply_all(). Only the rules defined in
+        the class itself are applied, not the ones of the classes it extends.
 
         """
         # c.f. the grouping at http://universaldependencies.org/u/dep/all.html#al-u-dep/nsubjpass
@@ -24,12 +31,27 @@ class RuleApplier(object):
                 (['dobj', 'iobj', 'pobj'], 'obj'),
                 (['npadvmod', 'amod', 'advmod', 'nummod', 'quantmod', 'rcmod', 'tmod', 'vmod'], 'mod')
             ]
+
+        # the simplified version of each source tag, in the order of the rules
+        self.translations = {}
+        for source_tags, target_tag in reversed(self.translation_rules):
+            for source_tag in source_tags:
+                self.translations[source_tag] = target_tag
+
+        # records the measurements of each rule when set, see rule_profiler.RuleProfiler
+        self.profiler = None
+
+        # skips the rules whose trigger tags are not around the node, see triggered_by
+        self.dispatch_by_triggers = True
+
+        # replays the outcome of the rules for the trees already seen when set, see rule_memo.RuleMemo
+        self.memo = None
         return
 
     @staticmethod
     def register_function(func):
-        """The static method that serves as the decorator method. It adds a function to the the deco_list static
-        list and returns the unaltered function.
+        """The static method that serves as the decorator method. It marks a function as a rule and returns the
+        unaltered function. The rules of a class are gathered when the class is created (see __init_subclass__).
 
         Args:
             func: A method of a class.
@@ -37,19 +59,53 @@ class RuleApplier(object):
         Returns:
             The same method.
         """
-        RuleApplier.deco_list.append(func)
+        func.is_rule = True
         return func
 
-    def get_rules(self):
-        """Returns a list with all the rules registered for this class.
+    @staticmethod
+    def triggered_by(*deps):
+        """The static method that serves as the decorator declaring which dependency tags a rule needs: the rule can
+        only be applied if the node it is applied to, or one of its children, has a dependency tag containing one of
+        them, e.g.: "subj" for "nsubj" and "csubjpass". Otherwise, the rule is not called at all, so it must leave the
+        tree unaltered in this case, and anything it does to the nodes of the NLTK tree must be redone by the rules
+        after it, e.g.: translating the tags, see Growth.rewrite_tags. Rules without this decorator are always called.
+
+        Args:
+            deps: The dependency tags (or parts of them).
 
         Returns:
-             A list with all the rules.
+            The decorator, which returns the unaltered function.
+        """
+        def decorator(func):
+            func.trigger_deps = deps
+            return func
+
+        return decorator
+
+    def __init_subclass__(cls, **kwargs):
+        """Gathers the rules of a class extending RuleApplier, the methods marked by the register_function decorator,
+        in the order they are defined in the class.
+
+        Args:
+            kwargs: The keyword arguments of the class creation.
         """
+        super().__init_subclass__(**kwargs)
+
+        cls.rules = tuple((func, func.__qualname__) for func in cls.__dict__.values()
+                          if getattr(func, "is_rule", False))
 
-        # Given deco_list is static we need to remove the methods from other classes that are also
-        # using this functionality at this point.
-        return iter([rule for rule in RuleApplier.deco_list if self.__class__.__name__ in str(rule)])
+        # the sets returned by vocabulary.containing are kept up to date, so tags seen later still trigger the rules
+        cls.rule_triggers = tuple(None if getattr(func, "trigger_deps", None) is None else
+                                  tuple(vocabulary.containing(dep) for dep in func.trigger_deps)
+                                  for func, rule_name in cls.rules)
+
+    def get_rules(self):
+        """Returns all the rules registered for this class.
+
+        Returns:
+             A tuple with a pair for each rule: its function and its qualified name, e.g.: "Growth.remove_duplicates".
+        """
+        return self.rules
 
     def rewrite_dp_tag(self, tag):
         """Given a more complex dependency tag, returns its simplified version according to the rules
@@ -61,21 +117,64 @@ class RuleApplier(object):
         Returns:
             tag: A string with the simpler dependency tag.
         """
-        for rule in self.translation_rules:
-            source_tags = rule[0]
-            target_tag = rule[1]
+        # if no translation rule is found, returns itself
+        return self.translations.get(tag, tag)
 
-            if tag in source_tags:
-                return target_tag
+    def get_memo_key(self, spacy_tree):
+        """Returns the features of the tree read by the rules of this class, so their outcome can be memoized (see
+        rule_memo.RuleMemo): applying the rules to any node with the same features (and the same NLTK tree) must make
+        the same changes to the node, its head and its children. Classes whose rules read further than that return
+        None, as by default.
 
-        # if no translation rule is found, returns itself
-        return tag
+        Args:
+            spacy_tree: The TreeNode object the rules are applied to.
+
+        Returns:
+            A tuple with the features, or None if the outcome of the rules cannot be memoized.
+        """
+        return None
+
+    @staticmethod
+    def get_local_deps(spacy_tree):
+        """Returns the ids of the dependency tags around a node, the ones the triggers of the rules are checked
+        against (see triggered_by).
+
+        Args:
+            spacy_tree: The TreeNode object the rules are applied to.
+
+        Returns:
+            A set with the dependency tag ids of the node and of its children.
+        """
+        local_deps = set([child.dep_id for child in spacy_tree.children])
+        local_deps.add(spacy_tree.dep_id)
+
+        return local_deps
+
+    @staticmethod
+    def can_fire(trigger, local_deps):
+        """Checks if a rule can be applied given the dependency tags around the node.
+
+        Args:
+            trigger: The trigger of the rule, as in rule_triggers.
+            local_deps: The set returned by get_local_deps.
+
+        Returns:
+            A boolean, True if the rule has no trigger or one of its tags is around the node, False otherwise.
+        """
+        if trigger is None:
+            return True
+
+        for trigger_ids in trigger:
+            if not local_deps.isdisjoint(trigger_ids):
+                return True
+
+        return False
 
     def apply(self, nltk_tree, spacy_tree, tree_root=""):
         """Apply registered rules.
 
         Args:
-            nltk_tree: The tree in the NLTK structure that represents the grouping.
+            nltk_tree: The GroupSignature (or NLTK tree) that represents the grouping.
             spacy_tree: The actual TreeNode in which the rules will be extracted from, rooted at the word being
                 searched for.
             tree_root: A string containing the dependency tree tag of the immediate child not of the word being
@@ -83,7 +182,7 @@ class RuleApplier(object):
                 child nodes, mostly obj and subj.
 
         Returns:
-            t: The new NLTK tree after rule application.
+            t: The new GroupSignature after rule application.
             applied: A list with the method signatures of the applied rules.
         """
 
@@ -100,21 +199,48 @@ class RuleApplier(object):
 
         if tree_root != "":
             root_spacy_tree = None
+            tree_root_ids = vocabulary.containing(tree_root)
             for child in spacy_tree.children:
-                if tree_root in child.dep_:
+                if child.dep_id in tree_root_ids:
                     root_spacy_tree = child
 
         applied = []
 
+        # the rules are always applied while profiling them
+        memo_key = None
+        if root_spacy_tree is not None and self.memo is not None and self.profiler is None:
+            memo_key = self.memo.get_key(self, root, node_set, root_spacy_tree)
+
+        if memo_key is not None:
+            memoized = self.memo.replay(memo_key, root_spacy_tree)
+
+            if memoized is not None:
+                return memoized
+
+            memo_started = self.memo.start(root_spacy_tree)
+
         if root_spacy_tree is not None:
-            for rule in self.get_rules():
-                root, node_set, spacy_tree, is_applied = rule(self, root, node_set, root_spacy_tree)
+            local_deps = self.get_local_deps(root_spacy_tree)
+
+            for (rule, rule_name), trigger in zip(self.get_rules(), self.rule_triggers):
+                if self.dispatch_by_triggers and not self.can_fire(trigger, local_deps):
+                    continue
+
+                if self.profiler is None:
+                    root, node_set, spacy_tree, is_applied = rule(self, root, node_set, root_spacy_tree)
+                else:
+                    root, node_set, spacy_tree, is_applied = \
+                        self.profiler.run_rule(rule, rule_name, self, root, node_set, root_spacy_tree)
 
                 if is_applied:
-                    rule_representation = str(rule).replace("<function ", "")
-                    rule_representation = rule_representation[:rule_representation.find(" at")]
-                    applied.append(rule_representation)
+                    applied.append(rule_name)
+
+                    # the rule may have changed the tags around the node
+                    local_deps = self.get_local_deps(root_spacy_tree)
+
+        t = GroupSignature.get(root, node_set)
 
-        t = Tree(root, list(sorted(node_set)))
+        if memo_key is not None:
+            self.memo.store(memo_key, memo_started, root_spacy_tree, t, applied)
 
         return t, applied
@@ -0,0 +1,182 @@
+from tree_overlay import OverlayNode
+
+
+class RuleMemo(object):
+    # stored instead of the edits when the rules changed the tree in a way that cannot be replayed on another token
+    not_replayable = None
+
+    def __init__(self):
+        """Memoizes the outcome of the rules of a RuleApplier by the features of the tree they read (see
+        RuleApplier.get_memo_key): many tokens share the same dependency tags and part of speech tags around them, and
+        so the same outcome. The first time a signature is seen, the rules are applied and the changes they made to
+        the tree (see tree_overlay.SentenceOverlay.edits) are recorded, relative to the node the rules were applied
+        to. The next times, these changes are replayed instead of applying the rules. It is attached to the rule
+        engines with their set_memo methods, see CommandSimplifiedGroup.
+        """
+        self.entries = {}
+        self.stats = {}
+        self.class_names = []
+
+    def count(self, class_name, outcome):
+        """Counts a lookup.
+
+        Args:
+            class_name: The name of the RuleApplier class.
+            outcome: A string, either "hits", "misses", "not_replayable" or "bypassed" (no signature).
+        """
+        stats = self.stats.get(class_name)
+
+        if stats is None:
+            stats = {"hits": 0, "misses": 0, "not_replayable": 0, "bypassed": 0}
+            self.stats[class_name] = stats
+            self.class_names.append(class_name)
+
+        stats[outcome] += 1
+
+    def get_key(self, rule_applier, root, node_set, spacy_tree):
+        """Returns the signature of an application of the rules.
+
+        Args:
+            rule_applier: The RuleApplier object.
+            root: The head of the NLTK tree.
+            node_set: The nodes of the NLTK tree.
+            spacy_tree: The TreeNode object the rules are applied to.
+
+        Returns:
+            A tuple with the signature, or None if this application cannot be memoized.
+        """
+        features = None
+
+        if isinstance(spacy_tree, OverlayNode):
+            # while nothing was changed, the features are read from the sentence, without wrapping the children
+            if len(spacy_tree.overlay.edits) == 0:
+                features = rule_applier.get_memo_key(spacy_tree.node)
+            else:
+                features = rule_applier.get_memo_key(spacy_tree)
+
+        if features is None:
+            self.count(type(rule_applier).__name__, "bypassed")
+            return None
+
+        return type(rule_applier).__name__, root, tuple(sorted(node_set)), features
+
+    @staticmethod
+    def get_nodes(spacy_tree):
+        """Returns the nodes the recorded changes are relative to.
+
+        Args:
+            spacy_tree: The OverlayNode the rules are applied to.
+
+        Returns:
+            A list with the node itself, its head and its children, in this order.
+        """
+        return [spacy_tree, spacy_tree.head] + list(spacy_tree.children)
+
+    def replay(self, key, spacy_tree):
+        """Replays the changes recorded for a signature, if any.
+
+        Args:
+            key: The signature returned by get_key.
+            spacy_tree: The OverlayNode the rules are applied to.
+
+        Returns:
+            The GroupSignature and the list of the rules applied, as returned by RuleApplier.apply, or None if the
+            rules have to be applied.
+        """
+        if key not in self.entries:
+            self.count(key[0], "misses")
+            return None
+
+        edits, t, applied = self.entries[key]
+
+        if edits is self.not_replayable:
+            self.count(key[0], "not_replayable")
+            return None
+
+        self.count(key[0], "hits")
+
+        if len(edits) == 0:
+            return t, list(applied)
+
+        nodes = self.get_nodes(spacy_tree)
+
+        for kind, position, value in edits:
+            node = nodes[position]
+
+            if kind == "dep_":
+                node.dep_ = value
+            elif kind == "no_follow":
+                node.no_follow = value
+            elif kind == "head":
+                node.head = nodes[value]
+            elif kind == "remove":
+                # the children are compared by identity, as OverlayNode does not define equality
+                node.children.pop(node.children.index(nodes[value]))
+            elif kind == "append":
+                node.children.append(nodes[value])
+
+        return t, list(applied)
+
+    def start(self, spacy_tree):
+        """Marks the start of the application of the rules, before storing its outcome.
+
+        Args:
+            spacy_tree: The OverlayNode the rules are applied to.
+
+        Returns:
+            A tuple with the nodes the changes are relative to and the number of changes already recorded.
+        """
+        return self.get_nodes(spacy_tree), len(spacy_tree.overlay.edits)
+
+    def store(self, key, started, spacy_tree, t, applied):
+        """Records the outcome of the application of the rules for a signature.
+
+        Args:
+            key: The signature returned by get_key.
+            started: The tuple returned by start.
+            spacy_tree: The OverlayNode the rules were applied to.
+            t: The resulting GroupSignature.
+            applied: The list of the rules applied.
+        """
+        nodes, first_edit = started
+
+        # when a node is at several positions, e.g.: the root is its own head, the first one is used
+        positions = {}
+        for position in range(len(nodes) - 1, -1, -1):
+            positions[id(nodes[position])] = position
+
+        edits = []
+
+        for kind, node, value in spacy_tree.overlay.edits[first_edit:]:
+            position = positions.get(id(node))
+
+            if kind in ("head", "remove", "append"):
+                value = positions.get(id(value))
+
+                if value is None:
+                    position = None
+
+            if position is None:
+                edits = self.not_replayable
+                break
+
+            edits.append((kind, position, value))
+
+        self.entries[key] = (edits, t, tuple(applied))
+
+    def get_report(self):
+        """Summarises the lookups of every RuleApplier class, in the order they were first made.
+
+        Returns:
+            A list with a dictionary for each class, with its hits, misses, lookups whose changes could not be
+            replayed, lookups without a signature and hit rate over all lookups.
+        """
+        report = []
+
+        for class_name in self.class_names:
+            stats = dict(self.stats[class_name])
+            stats["rule_applier"] = class_name
+            stats["hit_rate"] = stats["hits"] / float(sum(self.stats[class_name].values()))
+            report.append(stats)
+
+        return report
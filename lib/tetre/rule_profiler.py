@@ -0,0 +1,184 @@
+import json
+import math
+import time
+
+
+def count_nodes(spacy_tree):
+    """Counts the nodes of a tree that are still followed, i.e.: not in a branch marked through the "no_follow"
+    attribute.
+
+    Args:
+        spacy_tree: The TreeNode (or OverlayNode) at the top of the tree.
+
+    Returns:
+        An integer with the number of nodes.
+    """
+    return sum(1 for node in spacy_tree.walk(follow_all=False))
+
+
+def percentile(values, percent):
+    """Returns a percentile of a list of values, by the nearest-rank method.
+
+    Args:
+        values: A non empty list of numbers.
+        percent: The percentile, between 0 and 100.
+
+    Returns:
+        The value at the percentile.
+    """
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+
+    return values[max(rank, 1) - 1]
+
+
+class RuleProfiler(object):
+    def __init__(self):
+        """Records, for each rule applied by a RuleApplier, how many times it was called and applied, the wall time it
+        took, how many nodes of the tree it added or removed, and how many sentences it changed. It is attached to the
+        rule engines with their set_profiler methods, see CommandSimplifiedGroup.
+        """
+        self.stats = {}
+        self.rule_names = []
+
+        self.matches = 0
+        self.sentence_key = None
+
+    def start_match(self, sentence):
+        """Marks the start of the rules being applied to a new token of the word being searched for.
+
+        Args:
+            sentence: The tree.FullSentence the token belongs to.
+        """
+        self.matches += 1
+        self.sentence_key = (sentence.file_id, sentence.id)
+
+    def run_rule(self, rule, rule_name, rule_applier, root, node_set, spacy_tree):
+        """Applies a rule, as RuleApplier.apply does, recording its measurements.
+
+        Args:
+            rule: The function of the rule.
+            rule_name: The qualified name of the rule.
+            rule_applier: The RuleApplier object the rule belongs to.
+            root: The head of the NLTK tree.
+            node_set: The nodes of the NLTK tree.
+            spacy_tree: The TreeNode object the rule is applied to.
+
+        Returns:
+            The result of the rule.
+        """
+        nodes = count_nodes(spacy_tree)
+
+        start = time.perf_counter()
+        result = rule(rule_applier, root, node_set, spacy_tree)
+        seconds = time.perf_counter() - start
+
+        # the growth and reduction rules return if they were applied, the extraction rules return their relations
+        if isinstance(result, tuple):
+            is_applied = result[3]
+        else:
+            is_applied = len(result) > 0
+
+        self.record(rule_name, seconds, is_applied, count_nodes(spacy_tree) - nodes)
+
+        return result
+
+    def get_stats(self, rule_name):
+        """Returns the measurements of a rule, starting them the first time the rule is seen.
+
+        Args:
+            rule_name: The qualified name of the rule.
+
+        Returns:
+            A dictionary with the measurements of the rule.
+        """
+        stats = self.stats.get(rule_name)
+
+        if stats is None:
+            stats = {"calls": 0, "applied": 0, "seconds": [], "nodes_added": 0, "nodes_removed": 0,
+                     "sentences": set()}
+            self.stats[rule_name] = stats
+            self.rule_names.append(rule_name)
+
+        return stats
+
+    def record(self, rule_name, seconds, is_applied, node_delta):
+        """Records a single call of a rule.
+
+        Args:
+            rule_name: The qualified name of the rule.
+            seconds: The wall time the call took.
+            is_applied: A boolean marking if the rule was applied or not.
+            node_delta: The number of nodes of the tree after the call minus the number before it.
+        """
+        stats = self.get_stats(rule_name)
+
+        stats["calls"] += 1
+        stats["seconds"].append(seconds)
+
+        if node_delta > 0:
+            stats["nodes_added"] += node_delta
+        else:
+            stats["nodes_removed"] -= node_delta
+
+        if is_applied:
+            stats["applied"] += 1
+
+            if self.sentence_key is not None:
+                stats["sentences"].add(self.sentence_key)
+
+    def merge(self, other):
+        """Adds the measurements of another profiler to this one, e.g.: the ones recorded by a process applying the
+        rules to a chunk of the tokens (see command_simplified.apply_rules_in_pool). Merging the profilers in the
+        order of the tokens keeps the rules in the order they were first called.
+
+        Args:
+            other: The other RuleProfiler object.
+        """
+        self.matches += other.matches
+
+        for rule_name in other.rule_names:
+            other_stats = other.stats[rule_name]
+            stats = self.get_stats(rule_name)
+
+            stats["calls"] += other_stats["calls"]
+            stats["applied"] += other_stats["applied"]
+            stats["seconds"].extend(other_stats["seconds"])
+            stats["nodes_added"] += other_stats["nodes_added"]
+            stats["nodes_removed"] += other_stats["nodes_removed"]
+            stats["sentences"].update(other_stats["sentences"])
+
+    def get_report(self):
+        """Summarises the measurements of every rule, in the order the rules were first called.
+
+        Returns:
+            A dictionary with the number of matches and, for each rule, its calls, applied count and rate, total
+            and 95th percentile wall time, nodes added and removed and number of sentences changed.
+        """
+        rules = []
+
+        for rule_name in self.rule_names:
+            stats = self.stats[rule_name]
+
+            rules.append({
+                "rule": rule_name,
+                "calls": stats["calls"],
+                "applied": stats["applied"],
+                "applied_rate": stats["applied"] / float(stats["calls"]),
+                "total_seconds": sum(stats["seconds"]),
+                "p95_seconds": percentile(stats["seconds"], 95),
+                "nodes_added": stats["nodes_added"],
+                "nodes_removed": stats["nodes_removed"],
+                "sentences_changed": len(stats["sentences"]),
+            })
+
+        return {"matches": self.matches, "rules": rules}
+
+    def save(self, path):
+        """Saves the report (see get_report) as a JSON file.
+
+        Args:
+            path: The path of the JSON file.
+        """
+        with open(path, 'w') as output:
+            output.write(json.dumps(self.get_report(), sort_keys=True, indent=2))
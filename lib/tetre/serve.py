@@ -0,0 +1,214 @@
+import copy
+import json
+import time
+import traceback
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from parsers_cache import get_cached_corpus
+from tree_columnar import materialize
+from tetre.graph_processing import Process
+from tetre.graph_processing_children import ProcessChildren
+from tetre.graph_extraction import ProcessExtraction
+from tetre.rule_memo import RuleMemo
+from tetre.command_simplified import CommandSimplifiedGroup, OutputGenerator
+
+
+class ExtractionServer(object):
+    def __init__(self, argv):
+        """Keeps everything an extraction needs in memory between queries: the corpus cache, with its index and the
+        sentences already materialized, and the rule engines. Each query then only has to apply the rules to the
+        sentences of its word.
+
+        Args:
+            argv: The command line arguments, serving as the defaults of every query.
+        """
+        self.argv = argv
+
+        # the parameters of the extraction that are not given when serving
+        self.argv.tetre_output = "json"
+        self.argv.tetre_output_csv = False
+        self.argv.tetre_include_external = False
+        self.argv.tetre_cache_mode = "corpus"
+        self.argv.tetre_cache_views = False
+        self.argv.tetre_prefilter = False
+        self.argv.tetre_match_lemma = False
+        self.argv.tetre_sampling = None
+        self.argv.tetre_seed = None
+        self.argv.tetre_profile_rules = False
+
+        self.store, self.index = get_cached_corpus(argv)
+
+        # loads every shard once, so queries never wait for the disk
+        for file_id in self.store.file_ids:
+            self.store.get_shard(file_id)
+
+        self.sentences = {}
+
+        self.rule_engines = (Process(), ProcessChildren(), ProcessExtraction())
+
+        # the outcomes of the rules are memoized across queries, instead of by the command of each query
+        if self.argv.tetre_memoize_rules:
+            memo = RuleMemo()
+            self.rule_engines[0].set_memo(memo)
+            self.rule_engines[1].set_memo(memo)
+
+            self.argv.tetre_memoize_rules = False
+
+    def get_sentence(self, file_id, sentence_id):
+        """Returns a sentence of the corpus with its tree materialized, materializing it only the first time. The
+        rules change a copy-on-write overlay of the tree, so the same sentence can be shared by every query.
+
+        Args:
+            file_id: The id of the input file.
+            sentence_id: The id of the sentence.
+
+        Returns:
+            The tree.FullSentence object.
+        """
+        key = (file_id, sentence_id)
+
+        if key not in self.sentences:
+            self.sentences[key] = materialize(self.store.get_sentence(file_id, sentence_id))
+
+        return self.sentences[key]
+
+    def get_query_argv(self, params):
+        """Builds the arguments of a single query, starting from the command line arguments.
+
+        Args:
+            params: A dictionary with the query parameters: word (required), and optionally format, behaviour_root,
+                match_lemma, sampling and seed, as their --tetre_* counterparts.
+
+        Returns:
+            An object with the arguments of the query.
+        """
+        argv = copy.copy(self.argv)
+
+        argv.tetre_word = params["word"]
+        argv.tetre_words = [params["word"]]
+        argv.tetre_format = params.get("format", argv.tetre_format)
+        argv.tetre_behaviour_root = params.get("behaviour_root", argv.tetre_behaviour_root)
+        argv.tetre_match_lemma = params.get("match_lemma", "") in ("1", "true")
+        argv.tetre_sampling = params.get("sampling")
+        argv.tetre_seed = params.get("seed", "0")
+
+        return argv
+
+    def query(self, params):
+        """Extracts the relations of a word, as the simplified_groupby behaviour with the JSON output does.
+
+        Args:
+            params: A dictionary with the query parameters, see get_query_argv.
+
+        Returns:
+            A list with the extracted relations, the same as printed by OutputGenerator.graph_gen_json.
+        """
+        argv = self.get_query_argv(params)
+
+        cmd = CommandSimplifiedGroup(argv, self.rule_engines)
+
+        for token, sentence in self.index.get_tokens(self.get_sentence, argv.tetre_word, argv.tetre_match_lemma):
+            if token.pos_ != "VERB":
+                continue
+
+            cmd.process_token(token, sentence)
+
+        cmd.set_groups(cmd.filter(cmd.get_groups()))
+
+        return OutputGenerator(argv, cmd).get_json_results()
+
+    def serve(self):
+        """Answers queries over HTTP until interrupted, e.g.:
+        http://localhost:8000/extract?word=improves&behaviour_root=subj
+        """
+        server = HTTPServer((self.argv.serve_host, self.argv.serve_port), get_request_handler(self))
+
+        print("Serving on http://" + self.argv.serve_host + ":" + str(self.argv.serve_port) + "/extract?word=...")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.index.close()
+            self.store.close()
+
+
+def get_request_handler(extraction_server):
+    """Creates the HTTP request handler class answering the queries with the given server.
+
+    Args:
+        extraction_server: The ExtractionServer object.
+
+    Returns:
+        A subclass of BaseHTTPRequestHandler.
+    """
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            """Answers GET /extract requests, with the query parameters in the URL.
+            """
+            url = urlparse(self.path)
+            params = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+
+            if url.path != "/extract":
+                self.respond(404, {"error": "Not found, please use /extract?word=..."})
+                return
+
+            if "word" not in params:
+                self.respond(400, {"error": "Please define the word parameter"})
+                return
+
+            start = time.time()
+
+            try:
+                results = extraction_server.query(params)
+            except ValueError as error:
+                # e.g.: a sampling or seed that is not a number
+                self.respond(400, {"error": "Invalid parameter: " + str(error)})
+                return
+            except Exception as error:
+                self.log_error("Query %s failed", url.query)
+                traceback.print_exc()
+                self.respond(500, {"error": "Internal error: " + str(error)})
+                return
+
+            elapsed = time.time() - start
+
+            self.respond(200, results, {"X-Tetre-Query-Milliseconds": "%.1f" % (elapsed * 1000)})
+
+        def respond(self, status, body, headers=None):
+            """Writes a JSON response.
+
+            Args:
+                status: The HTTP status code.
+                body: The object to be written as JSON.
+                headers: A dictionary with extra headers.
+            """
+            data = json.dumps(body, sort_keys=True).encode("utf-8")
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+
+            self.end_headers()
+            self.wfile.write(data)
+
+    return RequestHandler
+
+
+def run(argv):
+    """Module entry point for the command line.
+
+    Args:
+        argv: The command line parameters.
+
+    """
+    server = ExtractionServer(argv)
+    server.serve()
@@ -1,7 +1,29 @@
+import bisect
+from array import array
+
+from vocabulary import vocabulary
+
+
+# bumped whenever the flat form in which trees and sentences are pickled changes (see flatten_tree)
+pickle_format_version = 3
+
+# the integer columns kept for each node by flatten_tree, in order
+node_columns = ("dep", "pos", "orth", "lemma", "idx", "n_lefts", "n_rights", "parent")
+
+# the array types the columns of a tree can be kept in, from the smallest, with the largest value each one holds
+column_typecodes = (("B", 0xff), ("H", 0xffff), ("I", 0xffffffff), ("Q", 0xffffffffffffffff))
 
 
 class TreeNode(object):
-    def __init__(self, dep_, pos_, orth_, idx, n_lefts, n_rights):
+    # nodes have no __dict__, as there are millions of them in a corpus
+    __slots__ = ("children", "dep_", "pos_", "orth_", "lemma_", "idx", "n_lefts", "n_rights", "no_follow",
+                 "root", "head")
+
+    # the attributes used to compare nodes, shared by every node
+    comparing_rule_head = ("pos_",)
+    comparing_rule_child = ("dep_",)
+
+    def __init__(self, dep_, pos_, orth_, idx, n_lefts, n_rights, lemma_=""):
         """Constructs a TreeNode. A TreeNode is a mirror object of a SpaCy token (spacy.token) however intended
         to be Pickable for caching purposes. This allows iterations where new rules for information extraction
         to be tested much faster given iterations between runs are faster and raw text does not need to be
@@ -14,16 +36,17 @@ class TreeNode(object):
             idx: A global id for this token.
             n_lefts: Number of child nodes to the left.
             n_rights: Number of child nodes to the right.
+            lemma_: The lemma of the token, if known.
         """
 
         self.children = []
 
-        self.comparing_rule_head = ["pos_"]
-        self.comparing_rule_child = ["dep_"]
-
-        self.dep_ = dep_
-        self.pos_ = pos_
+        # the tags are kept by the vocabulary, so all the nodes with the same tag share it. The orthographies and
+        # lemmas are only shared within a tree, when it is unpickled (see build_tree)
+        self.dep_ = vocabulary.intern(dep_)
+        self.pos_ = vocabulary.intern(pos_)
         self.orth_ = orth_
+        self.lemma_ = lemma_
         self.idx = idx
 
         self.n_lefts = n_lefts
@@ -35,6 +58,62 @@ class TreeNode(object):
         self.head = None
         self.set_is_root()
 
+    def __reduce__(self):
+        """Pickles (and deep copies) this node together with its whole tree, as a flat list of nodes referencing each
+        other by position (see flatten_tree), so pickling never recurses through the head and children links, however
+        deep the tree is. A node other than the root is pickled as its root and its position in the flat list, which
+        is only computed once for all the nodes of a tree (see get_flat_position).
+
+        Returns:
+            A tuple with the function rebuilding this node and its arguments.
+        """
+        root = self.root if isinstance(self.root, TreeNode) else self
+
+        if root is not self:
+            position = get_flat_position(root, self)
+
+            if position is not None:
+                return get_tree_node, (root, position)
+
+        return build_tree, flatten_tree(self)
+
+    @property
+    def dep_id(self):
+        """The id of the dependency tag in the vocabulary.
+        """
+        return vocabulary.add(self.dep_)
+
+    @property
+    def pos_id(self):
+        """The id of the part of speech tag in the vocabulary.
+        """
+        return vocabulary.add(self.pos_)
+
+    def walk(self, follow_all=True):
+        """Yields the nodes of this tree in depth-first order, starting by this node, using an explicit stack instead
+        of recursion.
+
+        Args:
+            follow_all: A boolean, if False the branches marked through the "no_follow" attribute are skipped.
+
+        Yields:
+            Each TreeNode of the tree.
+        """
+        if not follow_all and self.no_follow:
+            return
+
+        stack = [self]
+
+        while len(stack) > 0:
+            node = stack.pop()
+            yield node
+
+            children = node.children
+            if not follow_all:
+                children = [child for child in children if not child.no_follow]
+
+            stack.extend(reversed(children))
+
     def add_child(self, child):
         """Adds a child node to an existing node.
 
@@ -92,7 +171,7 @@ class TreeNode(object):
 
     def to_sentence_list(self, to_sort=True):
         """Returns a flat list of the nodes of this tree. It can be sorted as per their original position in
-        the sentence.
+        the sentence. Branches marked through the "no_follow" attribute are ignored.
 
         Args:
             to_sort: A Boolean parameter, specifying if the list should be sorted (as per their original position in
@@ -101,12 +180,12 @@ class TreeNode(object):
         Returns:
             The list of nodes.
         """
+        sentence = list(self.walk(follow_all=False))
+
         if to_sort:
-            sorted_sentence = self.sort(flatten_list(self.to_sentence_list_internal()))
-        else:
-            sorted_sentence = flatten_list(self.to_sentence_list_internal())
+            return self.sort(sentence)
 
-        return sorted_sentence
+        return sentence
 
     def to_sentence_string(self):
         """Returns a string with a reconstructed version of the original sentence this tree represents.
@@ -116,34 +195,35 @@ class TreeNode(object):
         """
         return " ".join([t.orth_ for t in self.to_sentence_list()])
 
-    def to_sentence_list_internal(self):
-        """Transforms this tree in a list. Ignores branches marked through the "no_follow" attribute.
-
-        Returns:
-            A list containig each node of the tree.
-        """
-        if self.no_follow:
-            return []
-
-        sentence = [self] + [child.to_sentence_list_internal() for child in self.children if not child.no_follow]
-        return sentence
-
     def to_tree_string(self, level=1):
         """Returns a string representation of the tree for debugging purposes.
 
         Args:
-            level: The current level of the tree, used for spacing. Should not be passed by the caller.
+            level: The level of this node in the tree, used for spacing.
 
         Returns:
             A string constaining a representation of this tree.
         """
-        self_representation = "\n" + (level*"\t") + "  (" + self.orth_ + "/" + self.dep_ + "/" + self.pos_ + ")  "
+        parts = []
 
-        if len(self.children) > 0:
-            return self_representation + " [ " +\
-                   "".join([child.to_tree_string(level+1) for child in self.children]) + " ] "
+        # each item is either a node with its level or a closing bracket
+        stack = [(self, level)]
 
-        return self_representation
+        while len(stack) > 0:
+            node, node_level = stack.pop()
+
+            if node is None:
+                parts.append(" ] ")
+                continue
+
+            parts.append("\n" + (node_level*"\t") + "  (" + node.orth_ + "/" + node.dep_ + "/" + node.pos_ + ")  ")
+
+            if len(node.children) > 0:
+                parts.append(" [ ")
+                stack.append((None, node_level))
+                stack.extend((child, node_level+1) for child in reversed(node.children))
+
+        return "".join(parts)
 
     def to_comparable_value_as_child(self):
         """Returns a comparable version of this node.
@@ -191,13 +271,16 @@ class FullSentence(object):
                 (e.g.: same sentence always receives same id).
         """
 
-        self.iterable = []
         self.root = root
         self.string_representation = ""
-        self.pointer = 0
         self.file_id = file_id
         self.id = sentence_id
 
+        # the nodes in sentence order, by their idx and their subtree index, only computed when first needed
+        self.tokens = None
+        self.tokens_by_idx = None
+        self.subtree_index = None
+
     def set_string_representation(self, string_representation):
         """Sets the original raw string before it was parsed to form this sentence. The SpaCy segmenter is used
         to determine the strings.
@@ -207,33 +290,72 @@ class FullSentence(object):
         """
         self.string_representation = string_representation
 
-    def __iter__(self):
-        """Prepares the list (self.iterable) containing the nodes of the tree to be iterated upon.
+    def __reduce__(self):
+        """Pickles this sentence as its metadata and its tree, the latter kept as flat arrays (see flatten_tree). The
+        nodes order, idx map and subtree index are not pickled, as they are computed again when needed. The tree is
+        pickled as an object of its own, so the nodes of this sentence pickled along with it (e.g.: the tokens of the
+        cached views) keep referencing the same tree once loaded.
 
         Returns:
-            The FullSentence object itself.
+            A tuple with the function rebuilding this sentence and its arguments.
         """
-        self.pointer = 0
-        self.iterable = self.root.to_sentence_list()
-        return self
+        return build_full_sentence, (pickle_format_version, self.root, self.file_id, self.id,
+                                     self.string_representation)
 
-    # Declared in Python3 style
-    def __next__(self):
-        """Returns the current node of the iteration.
+    def invalidate(self):
+        """Forgets the nodes order, idx map and subtree index of this sentence. It must be called whenever the tree of
+        this sentence is changed in place (e.g.: the idx of its nodes). The rules change a copy-on-write overlay of the
+        trees instead (see tree_overlay.SentenceOverlay), so the sentences being processed are not changed by them.
+        """
+        self.tokens = None
+        self.tokens_by_idx = None
+        self.subtree_index = None
 
-         Returns:
-             The TreeNode object being referenced in the list.
-         """
-        if self.pointer >= len(self.iterable):
-            raise StopIteration
+        forget_flat_positions(self.root)
+
+    def get_tokens(self):
+        """Returns the nodes of the tree in their original order in the sentence. They are only sorted the first time.
+
+        Returns:
+            A list of TreeNode objects.
+        """
+        if self.tokens is None:
+            self.tokens = self.root.to_sentence_list()
+
+        return self.tokens
+
+    def get_token(self, idx):
+        """Returns the node with a given idx.
+
+        Args:
+            idx: The idx of the node.
+
+        Returns:
+            The TreeNode object, or None if no node of this sentence has this idx.
+        """
+        if self.tokens_by_idx is None:
+            self.tokens_by_idx = dict((token.idx, token) for token in self.get_tokens())
+
+        return self.tokens_by_idx.get(idx)
 
-        next_value = self.iterable[self.pointer]
-        self.pointer += 1
+    def get_subtree_index(self):
+        """Returns the SubtreeIndex of the tree of this sentence. It is only built the first time.
 
-        return next_value
+        Returns:
+            The SubtreeIndex object.
+        """
+        if self.subtree_index is None:
+            self.subtree_index = SubtreeIndex(self.root)
 
-    # Python2 compatibility
-    next = __next__
+        return self.subtree_index
+
+    def __iter__(self):
+        """Iterates through the nodes of the tree, in their original order in the sentence.
+
+        Returns:
+            An iterator of TreeNode objects.
+        """
+        return iter(self.get_tokens())
 
     def __str__(self):
         """Returns the original string representation of this sentence
@@ -244,17 +366,384 @@ class FullSentence(object):
         return self.string_representation
 
 
+class SubtreeIndex(object):
+    def __init__(self, root):
+        """Constructs a SubtreeIndex. A SubtreeIndex numbers the nodes of a tree in depth-first order (an Euler tour),
+        so the subtree of each node is the interval between its entry and exit numbers. It also keeps the entry
+        numbers of the nodes by orthography and by dependency tag, so a node can be found under another one without
+        traversing its subtree.
+
+        Args:
+            root: The TreeNode at the top of the tree.
+        """
+        self.nodes = list(root.walk())
+        self.entries = dict((id(node), position) for position, node in enumerate(self.nodes))
+
+        # the subtree of a node ends where the subtree of its last child ends, so they are computed bottom-up
+        self.exits = [position + 1 for position in range(0, len(self.nodes))]
+        for position in range(len(self.nodes) - 1, -1, -1):
+            children = self.nodes[position].children
+            if len(children) > 0:
+                self.exits[position] = self.exits[self.entries[id(children[-1])]]
+
+        self.by_orth = {}
+        self.by_dep = {}
+        for position, node in enumerate(self.nodes):
+            self.by_orth.setdefault(node.orth_, []).append(position)
+            self.by_dep.setdefault(node.dep_, []).append(position)
+
+    def contains(self, ancestor, node):
+        """Checks if a node is in the subtree of another one (including the node itself).
+
+        Args:
+            ancestor: The TreeNode at the top of the subtree.
+            node: The TreeNode being checked.
+
+        Returns:
+            A boolean, True if the node is in the subtree, False otherwise.
+        """
+        start = self.entries[id(ancestor)]
+        return start <= self.entries[id(node)] < self.exits[start]
+
+    @staticmethod
+    def first_in_range(positions, start, end):
+        """Returns the first entry number of a sorted list that is inside an interval.
+
+        Args:
+            positions: The sorted list of entry numbers.
+            start: The start of the interval.
+            end: The end of the interval (exclusive).
+
+        Returns:
+            The entry number, or None if none is inside the interval.
+        """
+        i = bisect.bisect_left(positions, start)
+
+        if i < len(positions) and positions[i] < end:
+            return positions[i]
+
+        return None
+
+    def find(self, node, dep, orth):
+        """Returns the first node, in depth-first order, of the subtree of a node whose dependency tag contains dep
+        and whose orthography is orth, as tree_utils.find_in_spacynode does. An empty dep or orth matches any node.
+
+        Args:
+            node: The TreeNode at the top of the subtree.
+            dep: The dependency tag (or part of it) of the node being searched.
+            orth: The orthography of the node being searched.
+
+        Returns:
+            The TreeNode, or None if nothing is found.
+        """
+        start = self.entries[id(node)]
+        end = self.exits[start]
+
+        if orth != "":
+            positions = self.by_orth.get(orth, [])
+            i = bisect.bisect_left(positions, start)
+
+            while i < len(positions) and positions[i] < end:
+                if dep in self.nodes[positions[i]].dep_:
+                    return self.nodes[positions[i]]
+                i += 1
+
+            return None
+
+        if dep == "":
+            return None
+
+        found = None
+        for node_dep, positions in self.by_dep.items():
+            if dep in node_dep:
+                position = self.first_in_range(positions, start, end)
+
+                if position is not None and (found is None or position < found):
+                    found = position
+
+        if found is None:
+            return None
+
+        return self.nodes[found]
+
+
 def flatten_list(l):
-    """Given a list of lists, yields a flattened version of this list.
+    """Given a list of lists, yields a flattened version of this list. Nested lists are followed with an explicit
+    stack, so there is no limit to how deeply they can be nested.
 
      Yields:
          A list.
      """
-    for el in l:
-        if isinstance(el, list) and not isinstance(el, (str, bytes)):
-            # python3 version converted back to python2 version:
-            # yield from flatten_list(el)
-            for sublist in flatten_list(el):
-                yield sublist
-        else:
+    stack = [iter(l)]
+
+    while len(stack) > 0:
+        for el in stack[-1]:
+            if isinstance(el, list) and not isinstance(el, (str, bytes)):
+                stack.append(iter(el))
+                break
+
             yield el
+        else:
+            stack.pop()
+
+
+# the last tree flattened, with its nodes in the order of flatten_tree and their positions by id, only computed when
+# first needed. They let the other nodes of this tree pickled along with it find their position without traversing
+# the tree for each node (see TreeNode.__reduce__)
+flattened_root = None
+flattened_nodes = []
+flattened_positions = None
+
+# the last tree rebuilt by build_tree, with its nodes in the same order, so its nodes are found by their position when
+# unpickled (see get_tree_node). It is kept apart from the one above, as deep copies flatten and rebuild in turn
+built_root = None
+built_nodes = []
+
+
+def get_flat_nodes(root):
+    """Returns the nodes of a tree in the order of flatten_tree: breadth-first, with the children of each node in
+    their order.
+
+    Args:
+        root: The TreeNode at the top of the tree.
+
+    Returns:
+        A tuple with the list of the nodes and, for each node, the position of its parent plus one, 0 for the first
+        node.
+    """
+    nodes = [root]
+    parents = [0]
+
+    # in breadth-first order, the children of each node are appended after it, with its position (plus one)
+    position = 0
+    while position < len(nodes):
+        children = nodes[position].children
+        position += 1
+
+        nodes.extend(children)
+        parents.extend([position] * len(children))
+
+    return nodes, parents
+
+
+def set_flattened_nodes(root, nodes):
+    """Keeps the nodes of the last tree flattened, for get_flat_position.
+
+    Args:
+        root: The TreeNode at the top of the tree, or None to forget the last one.
+        nodes: The list of the nodes of the tree, in the order of flatten_tree.
+    """
+    global flattened_root, flattened_nodes, flattened_positions
+    flattened_root = root
+    flattened_nodes = nodes
+    flattened_positions = None
+
+
+def forget_flat_positions(root):
+    """Forgets the positions kept for a tree, as they are no longer valid once it is changed in place (see
+    FullSentence.invalidate).
+
+    Args:
+        root: The TreeNode at the top of the tree.
+    """
+    if flattened_root is root:
+        set_flattened_nodes(None, [])
+
+
+def get_flat_position(root, node):
+    """Returns the position of a node in the flat list of the nodes of its tree (see flatten_tree). The positions of
+    all the nodes of a tree are computed at once, and kept until another tree is flattened, so pickling the nodes of
+    a tree one after the other only traverses it once.
+
+    Args:
+        root: The TreeNode at the top of the tree.
+        node: The TreeNode being looked for.
+
+    Returns:
+        An integer with the position, or None if the node is not part of this tree.
+    """
+    global flattened_positions
+
+    if flattened_root is not root:
+        set_flattened_nodes(root, get_flat_nodes(root)[0])
+
+    if flattened_positions is None:
+        flattened_positions = dict((id(flat_node), position) for position, flat_node in enumerate(flattened_nodes))
+
+    return flattened_positions.get(id(node))
+
+
+def flatten_tree(root):
+    """Transforms a tree in flat arrays, in which nodes reference each other by their position in breadth-first order.
+    This is the form in which trees are pickled: a few arrays and a short list of strings pickle and load much faster
+    than an object (or a tuple) for each node.
+
+    Args:
+        root: The TreeNode at the top of the tree.
+
+    Returns:
+        A tuple with:
+            - The format version (pickle_format_version).
+            - A list with the distinct strings of the tree.
+            - The lowest idx of the nodes.
+            - An array with the node_columns, one column after the other, each with a value for every node: the
+              ids of the dep_, pos_, orth_ and lemma_ of the nodes in the list of strings, their idx (minus the lowest
+              one), n_lefts, n_rights and the position of their parent (in whose children they are) plus one, 0 for
+              the first node. The array is of the smallest type holding all the values.
+            - A list with the nodes that are not linked as usual, as tuples (position, head, root, no_follow). Usually
+              the head of a node is its parent (or itself, for the first node) and its root is the first node, and
+              no_follow is False. A head or root outside of the tree is kept as the node itself.
+    """
+    nodes, parents = get_flat_nodes(root)
+    set_flattened_nodes(root, nodes)
+
+    strings = [node.dep_ for node in nodes] + [node.pos_ for node in nodes] + [node.orth_ for node in nodes] + \
+        [node.lemma_ for node in nodes]
+
+    # the ids of the distinct strings, in the order they are first seen
+    string_ids = {}
+    values = [string_ids.setdefault(string, len(string_ids)) for string in strings]
+
+    idxs = [node.idx for node in nodes]
+    first_idx = min(idxs)
+
+    values += [idx - first_idx for idx in idxs]
+    values += [node.n_lefts for node in nodes]
+    values += [node.n_rights for node in nodes]
+    values += parents
+
+    links = []
+    for position, node in enumerate(nodes):
+        parent = parents[position]
+
+        if node.head is not (nodes[parent - 1] if parent > 0 else node) or node.root is not root or node.no_follow:
+            links.append((position, node.head, node.root, node.no_follow))
+
+    # heads and roots are kept by their position when they are part of the tree
+    if len(links) > 0:
+        positions = dict((id(node), position) for position, node in enumerate(nodes))
+        links = [(position, positions.get(id(head), head), positions.get(id(tree_root), tree_root), no_follow)
+                 for position, head, tree_root, no_follow in links]
+
+    highest = max(values)
+    columns = array([typecode for typecode, largest in column_typecodes if highest <= largest][0], values)
+
+    return pickle_format_version, list(string_ids), first_idx, columns, links
+
+
+def build_tree(version, strings, first_idx, columns, links):
+    """Rebuilds a tree out of its flat arrays (see flatten_tree).
+
+    Args:
+        version: The format version the tree was flattened with.
+        strings: The list with the distinct strings of the tree.
+        first_idx: The lowest idx of the nodes.
+        columns: The array with the node_columns.
+        links: The list with the nodes that are not linked as usual.
+
+    Returns:
+        The TreeNode at the top of the tree.
+
+    Raises:
+        ValueError: If the tree was flattened with another format version.
+    """
+    if version != pickle_format_version:
+        raise ValueError("Trees pickled with format version " + str(version) + " cannot be loaded by version " +
+                         str(pickle_format_version) + ", please clean the cache.")
+
+    values = columns.tolist()
+    count = len(values) // len(node_columns)
+
+    deps, poss, orths, lemmas, idxs, n_leftss, n_rightss, parents = \
+        [values[start:start + count] for start in range(0, len(values), count)]
+
+    # only the tags are kept by the vocabulary, the other strings are shared by the nodes of this tree alone
+    strings = list(strings)
+    for position in set(deps).union(poss):
+        strings[position] = vocabulary.intern(strings[position])
+
+    nodes = []
+    new_node = TreeNode.__new__
+
+    for dep, pos, orth, lemma, idx, n_lefts, n_rights, parent in \
+            zip(deps, poss, orths, lemmas, idxs, n_leftss, n_rightss, parents):
+        # the tags are already interned, so the nodes are filled in directly instead of through TreeNode.__init__
+        node = new_node(TreeNode)
+        node.children = []
+        node.dep_ = strings[dep]
+        node.pos_ = strings[pos]
+        node.orth_ = strings[orth]
+        node.lemma_ = strings[lemma]
+        node.idx = idx + first_idx
+        node.n_lefts = n_lefts
+        node.n_rights = n_rights
+        node.no_follow = False
+        nodes.append(node)
+
+        # the nodes are in breadth-first order, so children are added to their parents in their original order
+        if parent > 0:
+            parent_node = nodes[parent - 1]
+            parent_node.children.append(node)
+            node.head = parent_node
+        else:
+            node.head = node
+
+        node.root = nodes[0]
+
+    for position, head, root, no_follow in links:
+        node = nodes[position]
+        node.head = nodes[head] if isinstance(head, int) else head
+        node.root = nodes[root] if isinstance(root, int) else root
+        node.no_follow = no_follow
+
+    global built_root, built_nodes
+    built_root = nodes[0]
+    built_nodes = nodes
+
+    return nodes[0]
+
+
+def build_full_sentence(version, root, file_id, sentence_id, string_representation):
+    """Rebuilds a pickled sentence (see FullSentence.__reduce__).
+
+    Args:
+        version: The format version the sentence was pickled with.
+        root: The TreeNode at the top of its tree.
+        file_id: The id of the file of the sentence.
+        sentence_id: The id of the sentence.
+        string_representation: The original string of the sentence.
+
+    Returns:
+        The FullSentence object.
+
+    Raises:
+        ValueError: If the sentence was pickled with another format version.
+    """
+    if version != pickle_format_version:
+        raise ValueError("Sentences pickled with format version " + str(version) + " cannot be loaded by version " +
+                         str(pickle_format_version) + ", please clean the cache.")
+
+    sentence = FullSentence(root, file_id, sentence_id)
+    sentence.set_string_representation(string_representation)
+
+    return sentence
+
+
+def get_tree_node(root, position):
+    """Returns the node at a given position of an unpickled tree (see TreeNode.__reduce__).
+
+    Args:
+        root: The TreeNode at the top of the tree.
+        position: The position of the node in the flat list of the nodes of the tree (see flatten_tree).
+
+    Returns:
+        The TreeNode.
+    """
+    global built_root, built_nodes
+
+    # the tree was usually just rebuilt by build_tree, which kept its nodes
+    if built_root is not root:
+        built_root = root
+        built_nodes = get_flat_nodes(root)[0]
+
+    return built_nodes[position]
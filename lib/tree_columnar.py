@@ -0,0 +1,690 @@
+import bisect
+import struct
+from array import array
+
+from tree import TreeNode, FullSentence, SubtreeIndex
+from vocabulary import vocabulary
+
+
+columnar_magic = b"TETRECOL"
+columnar_version = 2
+
+# header: magic, version, number of strings, number of sentences. The header is followed by the string pool, by the
+# offsets table of the sentence records and then by the records themselves
+header_format = "=8sIII"
+# each sentence record: file_id, sentence_id, id of the sentence text, number of tokens
+sentence_format = "=iiII"
+
+# the per token columns of each sentence record, in the order they are written
+columns = ("head", "dep", "pos", "orth", "lemma", "idx")
+
+# the TreeNode attribute read from each of the string columns
+attribute_columns = {"dep_": "dep", "pos_": "pos", "orth_": "orth", "lemma_": "lemma"}
+
+
+class StringPool(object):
+    def __init__(self):
+        """Interns the strings of a columnar file (dependency tags, part of speech tags, orthographies, lemmas and the
+        sentence texts), so each distinct string is stored only once and referenced by its id.
+        """
+        self.ids = {}
+        self.strings = []
+
+    def add(self, string):
+        """Returns the id of a string, adding it to the pool if needed.
+
+        Args:
+            string: The string.
+
+        Returns:
+            An integer with the id of the string.
+        """
+        string_id = self.ids.get(string)
+
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[string] = string_id
+            self.strings.append(string)
+
+        return string_id
+
+    def to_bytes(self):
+        """Serialises the pool as an offsets table followed by the concatenated UTF-8 strings.
+
+        Returns:
+            The bytes of the pool.
+        """
+        encoded = [string.encode("utf-8") for string in self.strings]
+
+        offsets = array("I", [0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+
+        return offsets.tobytes() + b"".join(encoded)
+
+
+class ColumnarSentence(object):
+    def __init__(self, strings, file_id, sentence_id, text_id, data):
+        """Constructs a ColumnarSentence. A ColumnarSentence is the compact version of a FullSentence, in which each
+        token is a row of parallel integer arrays (head offsets, dependency tag, part of speech, orthography and
+        lemma ids into the string pool, and idx). The TreeNode tree is only materialized on demand.
+
+        Args:
+            strings: The strings of the file this sentence was read from (a list or LazyStrings).
+            file_id: A number identifyng the file the sentence belongs to.
+            sentence_id: A number identifyng the sentence.
+            text_id: The id of the original sentence string.
+            data: A dictionary with one array for each of the columns.
+        """
+        self.strings = strings
+        self.file_id = file_id
+        self.id = sentence_id
+        self.text_id = text_id
+        self.data = data
+        self.full_sentence = None
+
+        # the head positions, the children and the node views, only computed when first needed
+        self.heads = None
+        self.children = None
+        self.nodes = None
+        self.subtree_index = None
+
+    def __len__(self):
+        """Returns the number of tokens in this sentence.
+
+        Returns:
+            integer
+        """
+        return len(self.data["idx"])
+
+    def __iter__(self):
+        """Yields lightweight versions of the tokens (with orth_, lemma_ and idx only), in sentence order, without
+        materializing the tree.
+
+        Yields:
+            A ColumnarToken for each token.
+        """
+        strings = self.strings
+
+        for orth, lemma, idx in zip(self.data["orth"], self.data["lemma"], self.data["idx"]):
+            yield ColumnarToken(strings[orth], strings[lemma], idx)
+
+    def __str__(self):
+        """Returns the original string representation of this sentence
+
+         Returns:
+             A string with the sentence.
+         """
+        return self.strings[self.text_id]
+
+    def get_heads(self):
+        """Returns the position of the head of each token (the head column keeps offsets instead). The root is its own
+        head.
+
+        Returns:
+            An array with a position for each token.
+        """
+        if self.heads is None:
+            self.heads = array("i", [position + offset for position, offset in enumerate(self.data["head"])])
+
+        return self.heads
+
+    def get_children(self, position):
+        """Returns the positions of the children of a token, in sentence order.
+
+        Args:
+            position: The position of the token.
+
+        Returns:
+            A list of positions.
+        """
+        if self.children is None:
+            self.children = [[] for i in range(0, len(self))]
+
+            for child, head in enumerate(self.get_heads()):
+                if child != head:
+                    self.children[head].append(child)
+
+        return self.children[position]
+
+    def get_node(self, position):
+        """Returns the TreeNode-like view of a token (see ColumnarNode), always the same object for the same token.
+
+        Args:
+            position: The position of the token.
+
+        Returns:
+            The ColumnarNode object.
+        """
+        if self.nodes is None:
+            self.nodes = [ColumnarNode(self, i) for i in range(0, len(self))]
+
+        return self.nodes[position]
+
+    @property
+    def root(self):
+        """The view of the root of the tree of this sentence.
+        """
+        heads = self.get_heads()
+
+        for position in range(0, len(heads)):
+            if heads[position] == position:
+                return self.get_node(position)
+
+        return None
+
+    def get_tokens(self):
+        """Returns the views of the tokens, in their original order in the sentence.
+
+        Returns:
+            A list of ColumnarNode objects.
+        """
+        return [self.get_node(position) for position in range(0, len(self))]
+
+    def get_token(self, idx):
+        """Returns the view of the token with a given idx. The tokens are sorted by idx, so it is a binary search.
+
+        Args:
+            idx: The idx of the token.
+
+        Returns:
+            The ColumnarNode object, or None if no token of this sentence has this idx.
+        """
+        idxs = self.data["idx"]
+        position = bisect.bisect_left(idxs, idx)
+
+        if position < len(idxs) and idxs[position] == idx:
+            return self.get_node(position)
+
+        return None
+
+    def get_subtree_index(self):
+        """Returns the SubtreeIndex of the tree of this sentence (see tree.FullSentence.get_subtree_index).
+
+        Returns:
+            The SubtreeIndex object.
+        """
+        if self.subtree_index is None:
+            self.subtree_index = SubtreeIndex(self.root)
+
+        return self.subtree_index
+
+    def to_fullsentence(self):
+        """Materializes the TreeNode tree of this sentence. The result is kept, so all tokens of a sentence refer to
+        the same FullSentence object.
+
+        Returns:
+            The tree.FullSentence object.
+        """
+        if self.full_sentence is None:
+            self.full_sentence = columns_to_fullsentence(self.strings, self.file_id, self.id, self.text_id, self.data)
+
+        return self.full_sentence
+
+
+class ColumnarToken(object):
+    __slots__ = ("orth_", "lemma_", "idx")
+
+    def __init__(self, orth_, lemma_, idx):
+        """A token of a ColumnarSentence, with only the attributes needed for indexing.
+
+        Args:
+            orth_: The orthography (the token itself).
+            lemma_: The lemma of the token.
+            idx: The position of the token.
+        """
+        self.orth_ = orth_
+        self.lemma_ = lemma_
+        self.idx = idx
+
+
+class ColumnarNode(object):
+    __slots__ = ("sentence", "position")
+
+    # the views are read-only, so no branch of their trees is ever skipped
+    no_follow = False
+
+    def __init__(self, sentence, position):
+        """A read-only view of a token of a ColumnarSentence with the attributes of a TreeNode, so the trees can be
+        traversed, and the rules applied through a tree_overlay.SentenceOverlay, without materializing the TreeNode
+        objects.
+
+        Args:
+            sentence: The ColumnarSentence.
+            position: The position of the token in the sentence.
+        """
+        self.sentence = sentence
+        self.position = position
+
+    dep_ = property(lambda self: self.sentence.strings[self.sentence.data["dep"][self.position]])
+    pos_ = property(lambda self: self.sentence.strings[self.sentence.data["pos"][self.position]])
+    orth_ = property(lambda self: self.sentence.strings[self.sentence.data["orth"][self.position]])
+    lemma_ = property(lambda self: self.sentence.strings[self.sentence.data["lemma"][self.position]])
+    idx = property(lambda self: self.sentence.data["idx"][self.position])
+    dep_id = property(lambda self: vocabulary.add(self.dep_))
+    pos_id = property(lambda self: vocabulary.add(self.pos_))
+
+    @property
+    def head(self):
+        """The view of the head/parent token.
+        """
+        return self.sentence.get_node(self.sentence.get_heads()[self.position])
+
+    @property
+    def children(self):
+        """The list of views of the child tokens.
+        """
+        return [self.sentence.get_node(child) for child in self.sentence.get_children(self.position)]
+
+    @property
+    def n_lefts(self):
+        """Number of child tokens to the left.
+        """
+        return len([child for child in self.sentence.get_children(self.position) if child < self.position])
+
+    @property
+    def n_rights(self):
+        """Number of child tokens to the right.
+        """
+        return len([child for child in self.sentence.get_children(self.position) if child > self.position])
+
+    @property
+    def root(self):
+        """The view of the root of the tree.
+        """
+        return self.sentence.root
+
+    def is_root(self):
+        """Checks if this token is the tree root.
+
+        Returns:
+            A boolean, True if this token is the root, False otherwise.
+        """
+        return self.sentence.get_heads()[self.position] == self.position
+
+    # the traversals only read the attributes above, so the ones of TreeNode are used as they are
+    walk = TreeNode.walk
+    sort = staticmethod(TreeNode.sort)
+    to_sentence_list = TreeNode.to_sentence_list
+    to_sentence_string = TreeNode.to_sentence_string
+    to_tree_string = TreeNode.to_tree_string
+    comparing_rule_head = TreeNode.comparing_rule_head
+    comparing_rule_child = TreeNode.comparing_rule_child
+    to_comparable_value_as_child = TreeNode.to_comparable_value_as_child
+    to_comparable_value_as_head = TreeNode.to_comparable_value_as_head
+
+    def __str__(self):
+        """Returns the string version of this token.
+
+        Returns:
+            A string constaining a representation of this token.
+        """
+        return self.orth_
+
+
+def fullsentence_to_columns(sentence, pool):
+    """Transforms a FullSentence in its columnar version.
+
+    Args:
+        sentence: The tree.FullSentence object.
+        pool: The StringPool of the file being written.
+
+    Returns:
+        A dictionary with one array for each of the columns, with the tokens sorted by their idx.
+    """
+    nodes = []
+    stack = [sentence.root]
+    while len(stack) > 0:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.children)
+
+    nodes.sort(key=lambda obj: obj.idx)
+    positions = dict((id(node), position) for position, node in enumerate(nodes))
+
+    data = dict((column, array("i")) for column in columns)
+
+    for position, node in enumerate(nodes):
+        head_position = position if node.is_root() else positions[id(node.head)]
+
+        data["head"].append(head_position - position)
+        data["dep"].append(pool.add(node.dep_))
+        data["pos"].append(pool.add(node.pos_))
+        data["orth"].append(pool.add(node.orth_))
+        data["lemma"].append(pool.add(node.lemma_))
+        data["idx"].append(node.idx)
+
+    return data
+
+
+def columns_to_fullsentence(strings, file_id, sentence_id, text_id, data):
+    """Builds the TreeNode tree of a sentence out of its columns.
+
+    Args:
+        strings: The strings of the file this sentence was read from (a list or LazyStrings).
+        file_id: A number identifyng the file the sentence belongs to.
+        sentence_id: A number identifyng the sentence.
+        text_id: The id of the original sentence string.
+        data: A dictionary with one array for each of the columns.
+
+    Returns:
+        The tree.FullSentence object.
+    """
+    heads = data["head"]
+
+    nodes = []
+    for position in range(0, len(heads)):
+        nodes.append(TreeNode(strings[data["dep"][position]], strings[data["pos"][position]],
+                              strings[data["orth"][position]], data["idx"][position], 0, 0,
+                              strings[data["lemma"][position]]))
+
+    root = None
+    for position, node in enumerate(nodes):
+        if heads[position] == 0:
+            root = node
+            continue
+
+        head = nodes[position + heads[position]]
+        node.set_head(head)
+        head.add_child(node)
+
+        if heads[position] > 0:
+            head.n_lefts += 1
+        else:
+            head.n_rights += 1
+
+    for node in nodes:
+        node.set_root(root)
+
+    sentence = FullSentence(root, file_id, sentence_id)
+    sentence.set_string_representation(strings[text_id])
+
+    return sentence
+
+
+def to_columnar(sentences):
+    """Transforms FullSentence objects in ColumnarSentence objects sharing a single string pool, without serialising
+    them. Sentences that are already columnar are kept as they are.
+
+    Args:
+        sentences: An iterable of tree.FullSentence (or ColumnarSentence) objects.
+
+    Returns:
+        A list of ColumnarSentence objects.
+    """
+    pool = StringPool()
+    result = []
+
+    for sentence in sentences:
+        if isinstance(sentence, ColumnarSentence):
+            result.append(sentence)
+            continue
+
+        data = fullsentence_to_columns(sentence, pool)
+        result.append(ColumnarSentence(pool.strings, sentence.file_id, sentence.id, pool.add(str(sentence)), data))
+
+    return result
+
+
+def count_relations(sentences, word, attributes=("dep_",), pos="VERB"):
+    """Counts the relations of the tokens of a word to their heads and children, as CommandAccumulative does, straight
+    from the columns of the sentences instead of walking their trees. The tokens, heads and children are found and
+    counted through their column ids, and each distinct (relation, representation) pair is decoded only once.
+
+    Args:
+        sentences: An iterable of ColumnarSentence objects.
+        word: The word being searched for, matched on the lowercased orthography.
+        attributes: The TreeNode attributes forming the representation of the related tokens, as --tetre_format,
+            among dep_, pos_, orth_ and lemma_.
+        pos: The part of speech tag of the tokens being counted.
+
+    Returns:
+        parents: A dictionary from the dependency tag of each token to a dictionary from the representation of its
+            head to how many times it appears.
+        children: The same, from the dependency tags of the children of each token to their representations.
+    """
+    for attribute in attributes:
+        if attribute not in attribute_columns:
+            raise ValueError('Unsupported attribute for the columnar relations: ' + attribute)
+
+    word = word.lower()
+    keys = [attribute_columns[attribute] for attribute in attributes]
+
+    # (string pool id, dependency tag id, representation ids) -> count, decoded at the end
+    parent_counts = {}
+    child_counts = {}
+
+    # the string pools by their id and, for each one, the ids of the word and of the part of speech tag. They are
+    # found once per pool, so most sentences are skipped by comparing ids only
+    pools = {}
+    pool_ids = {}
+
+    for sentence in sentences:
+        strings = sentence.strings
+        data = sentence.data
+
+        if id(strings) not in pools:
+            pools[id(strings)] = strings
+            pool_ids[id(strings)] = (
+                set(string_id for string_id in range(0, len(strings)) if strings[string_id].lower() == word),
+                set(string_id for string_id in range(0, len(strings)) if strings[string_id] == pos))
+
+        word_ids, pos_ids = pool_ids[id(strings)]
+
+        if word_ids.isdisjoint(data["orth"]):
+            continue
+
+        tokens = set(position for position, (orth, token_pos) in enumerate(zip(data["orth"], data["pos"]))
+                     if orth in word_ids and token_pos in pos_ids)
+
+        if len(tokens) == 0:
+            continue
+
+        dep = data["dep"]
+        columns_of = [data[key] for key in keys]
+
+        for position, offset in enumerate(data["head"]):
+            if position in tokens:
+                head = position + offset
+                key = (id(strings), dep[position], tuple(column[head] for column in columns_of))
+                parent_counts[key] = parent_counts.get(key, 0) + 1
+
+            if offset != 0 and position + offset in tokens:
+                key = (id(strings), dep[position], tuple(column[position] for column in columns_of))
+                child_counts[key] = child_counts.get(key, 0) + 1
+
+    return decode_relations(pools, parent_counts), decode_relations(pools, child_counts)
+
+
+def decode_relations(pools, counts):
+    """Transforms the relation counts keyed by column ids of count_relations in counts keyed by strings, skipping the
+    empty dependency tags and representations as CommandAccumulative does.
+
+    Args:
+        pools: A dictionary with the string pools by their id.
+        counts: A dictionary from (string pool id, dependency tag id, representation ids) to a count.
+
+    Returns:
+        A dictionary from the dependency tag to a dictionary from the representation to how many times it appears.
+    """
+    result = {}
+
+    for (pool_id, dep, ids), count in counts.items():
+        strings = pools[pool_id]
+        dep = strings[dep]
+
+        if dep.strip() == "":
+            continue
+
+        relations = result.setdefault(dep, {})
+        representation = "/".join([strings[string_id] for string_id in ids])
+
+        if representation == "":
+            continue
+
+        relations[representation] = relations.get(representation, 0) + count
+
+    return result
+
+
+def dumps(sentences):
+    """Serialises a list of FullSentence objects in the columnar binary format.
+
+    Args:
+        sentences: The list of tree.FullSentence objects.
+
+    Returns:
+        The bytes of the file.
+    """
+    pool = StringPool()
+    records = []
+
+    for sentence in sentences:
+        data = fullsentence_to_columns(sentence, pool)
+        text_id = pool.add(str(sentence))
+
+        record = [struct.pack(sentence_format, sentence.file_id, sentence.id, text_id, len(data["idx"]))]
+        record.extend(data[column].tobytes() for column in columns)
+        records.append(b"".join(record))
+
+    offsets = array("Q", [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    header = struct.pack(header_format, columnar_magic, columnar_version, len(pool.strings), len(records))
+
+    return header + pool.to_bytes() + offsets.tobytes() + b"".join(records)
+
+
+class LazyStrings(object):
+    def __init__(self, buffer, offset, count):
+        """The string pool of a columnar file, in which each string is only decoded when first accessed.
+
+        Args:
+            buffer: The bytes of the file (or a memory map of it).
+            offset: Where the string pool starts.
+            count: The number of strings.
+        """
+        self.buffer = buffer
+        self.offsets = array("I")
+        self.offsets.frombytes(buffer[offset:offset + 4 * (count + 1)])
+        self.start = offset + 4 * (count + 1)
+        self.end = self.start + self.offsets[-1]
+        self.decoded = {}
+
+    def __getitem__(self, string_id):
+        """Returns a string of the pool.
+
+        Args:
+            string_id: The id of the string.
+
+        Returns:
+            The string.
+        """
+        string = self.decoded.get(string_id)
+
+        if string is None:
+            start = self.start + self.offsets[string_id]
+            string = self.buffer[start:self.start + self.offsets[string_id + 1]].decode("utf-8")
+            self.decoded[string_id] = string
+
+        return string
+
+    def __len__(self):
+        """Returns the number of strings in the pool.
+
+        Returns:
+            integer
+        """
+        return len(self.offsets) - 1
+
+
+class ColumnarFile(object):
+    def __init__(self, buffer):
+        """Random access to the sentences of a file in the columnar binary format. Through its offsets table only the
+        records of the sentences being accessed are decoded, so the buffer can be a memory map of a large file.
+
+        Args:
+            buffer: The bytes of the file (or a memory map of it).
+        """
+        magic, version, string_count, sentence_count = struct.unpack_from(header_format, buffer, 0)
+
+        if magic != columnar_magic or version != columnar_version:
+            raise ValueError('Unsupported columnar file version')
+
+        self.buffer = buffer
+        self.strings = LazyStrings(buffer, struct.calcsize(header_format), string_count)
+
+        self.offsets = array("Q")
+        self.offsets.frombytes(buffer[self.strings.end:self.strings.end + 8 * (sentence_count + 1)])
+        self.records_start = self.strings.end + 8 * (sentence_count + 1)
+
+    def __len__(self):
+        """Returns the number of sentences in the file.
+
+        Returns:
+            integer
+        """
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        """Decodes a single sentence record.
+
+        Args:
+            position: The position of the sentence in the file.
+
+        Returns:
+            The ColumnarSentence.
+        """
+        if position < 0 or position >= len(self):
+            raise IndexError('Sentence position out of range')
+
+        offset = self.records_start + self.offsets[position]
+
+        file_id, sentence_id, text_id, length = struct.unpack_from(sentence_format, self.buffer, offset)
+        offset += struct.calcsize(sentence_format)
+
+        data = {}
+        for column in columns:
+            data[column] = array("i")
+            data[column].frombytes(self.buffer[offset:offset + 4 * length])
+            offset += 4 * length
+
+        return ColumnarSentence(self.strings, file_id, sentence_id, text_id, data)
+
+    def __iter__(self):
+        """Decodes each sentence record in turn.
+
+        Yields:
+            A ColumnarSentence for each sentence of the file.
+        """
+        for position in range(0, len(self)):
+            yield self[position]
+
+
+def loads(buffer):
+    """Reads all sentences of a file in the columnar binary format, without materializing their trees.
+
+    Args:
+        buffer: The bytes of the file.
+
+    Returns:
+        A list of ColumnarSentence objects.
+    """
+    return list(ColumnarFile(buffer))
+
+
+def materialize(sentence):
+    """Returns the FullSentence version of a sentence, materializing its tree if it is a ColumnarSentence (or any
+    other handle to a sentence with a to_fullsentence method, e.g.: tree_utils.SpacySentence).
+
+    Args:
+        sentence: The tree.FullSentence, ColumnarSentence or tree_utils.SpacySentence object.
+
+    Returns:
+        The tree.FullSentence object.
+    """
+    if not isinstance(sentence, FullSentence):
+        return sentence.to_fullsentence()
+
+    return sentence
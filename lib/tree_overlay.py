@@ -0,0 +1,279 @@
+from tree import TreeNode
+from vocabulary import vocabulary
+
+
+class SentenceOverlay(object):
+    def __init__(self, sentence):
+        """Constructs a SentenceOverlay. A SentenceOverlay is a copy-on-write view of the tree of a FullSentence: the
+        rules change the OverlayNode objects it hands out instead of the TreeNode objects of the sentence, so the same
+        (cached) sentence can be shared by every word and run while each match gets its own changed tree.
+
+        Nodes are only wrapped when they are reached, and each change is recorded in self.edits, in the order it was
+        made, as a tuple (kind, node, value):
+            - ("dep_", node, dep_): the dependency tag of the node was rewritten.
+            - ("no_follow", node, no_follow): the node was marked (or unmarked) to be skipped.
+            - ("head", node, head): the node was reparented.
+            - ("remove", node, child): the child was removed from the children of the node.
+            - ("append", node, child): the child was added to the children of the node.
+
+        Args:
+            sentence: The tree.FullSentence object.
+        """
+        self.sentence = sentence
+        self.file_id = sentence.file_id
+        self.id = sentence.id
+
+        self.nodes = {}
+        self.edits = []
+
+        # the TreeNode objects whose dependency tag or children were changed
+        self.changed_nodes = []
+
+    def get_node(self, node):
+        """Returns the overlay version of a node of the sentence, always the same object for the same node.
+
+        Args:
+            node: The TreeNode of the sentence.
+
+        Returns:
+            The OverlayNode object.
+        """
+        overlay_node = self.nodes.get(id(node))
+
+        if overlay_node is None:
+            overlay_node = OverlayNode(self, node)
+            self.nodes[id(node)] = overlay_node
+
+        return overlay_node
+
+    def get_token(self, idx):
+        """Returns the overlay version of the node with a given idx.
+
+        Args:
+            idx: The idx of the node.
+
+        Returns:
+            The OverlayNode object, or None if no node of this sentence has this idx.
+        """
+        node = self.sentence.get_token(idx)
+
+        if node is None:
+            return None
+
+        return self.get_node(node)
+
+    @property
+    def root(self):
+        """The overlay version of the root of the sentence.
+        """
+        return self.get_node(self.sentence.root)
+
+    def record(self, kind, node, value):
+        """Records a change made to the overlay.
+
+        Args:
+            kind: A string with the kind of change, see the constructor.
+            node: The OverlayNode that was changed.
+            value: The new value, or the child added or removed.
+        """
+        self.edits.append((kind, node, value))
+
+        if kind != "no_follow" and kind != "head":
+            self.changed_nodes.append(node.node)
+
+    def is_unchanged(self, node):
+        """Checks if the subtree of a node is still the same as in the sentence: no node in it had its dependency tag
+        or children changed. The subtree index of the sentence can then answer queries about it. Nodes that are not
+        part of the tree of the sentence are never considered unchanged.
+
+        Args:
+            node: The OverlayNode at the top of the subtree.
+
+        Returns:
+            A boolean, True if the subtree is unchanged, False otherwise.
+        """
+        subtree_index = self.sentence.get_subtree_index()
+
+        if id(node.node) not in subtree_index.entries:
+            return False
+
+        for changed_node in self.changed_nodes:
+            if subtree_index.contains(node.node, changed_node):
+                return False
+
+        return True
+
+    def find(self, node, dep, orth):
+        """Returns the first node of the subtree of a node matching dep and orth, through the subtree index of the
+        sentence (see tree.SubtreeIndex.find). The subtree must be unchanged (see is_unchanged).
+
+        Args:
+            node: The OverlayNode at the top of the subtree.
+            dep: The dependency tag (or part of it) of the node being searched.
+            orth: The orthography of the node being searched.
+
+        Returns:
+            The OverlayNode, or None if nothing is found.
+        """
+        found = self.sentence.get_subtree_index().find(node.node, dep, orth)
+
+        if found is None:
+            return None
+
+        return self.get_node(found)
+
+    def __str__(self):
+        """Returns the original string representation of this sentence
+
+         Returns:
+             A string with the sentence.
+         """
+        return str(self.sentence)
+
+
+class OverlayChildren(list):
+    def __init__(self, overlay, parent, children):
+        """The children of an OverlayNode. It is a regular list, in which the operations the rules use to change it
+        (pop and append) are also recorded in the overlay.
+
+        Args:
+            overlay: The SentenceOverlay.
+            parent: The OverlayNode these are the children of.
+            children: The initial children.
+        """
+        list.__init__(self, children)
+        self.overlay = overlay
+        self.parent = parent
+
+    def append(self, child):
+        """Adds a child node.
+
+        Args:
+            child: The new child.
+        """
+        list.append(self, child)
+        self.overlay.record("append", self.parent, child)
+
+    def pop(self, position=-1):
+        """Removes a child node, given its position in the list.
+
+        Args:
+            position: The position of the child.
+
+        Returns:
+            The removed child.
+        """
+        child = list.pop(self, position)
+        self.overlay.record("remove", self.parent, child)
+        return child
+
+
+class OverlayNode(object):
+    __slots__ = ("overlay", "node", "pos_", "orth_", "lemma_", "idx", "n_lefts", "n_rights", "pos_id", "dep_id",
+                 "overlay_children", "overlay_head", "overlay_dep_", "overlay_no_follow")
+
+    def __init__(self, overlay, node):
+        """Constructs an OverlayNode, the copy-on-write version of a TreeNode (see SentenceOverlay). It reads the
+        attributes of the TreeNode until they are changed, and its head and children are OverlayNode objects as well,
+        only wrapped when first accessed. The attributes the rules never change are copied from the TreeNode.
+
+        Args:
+            overlay: The SentenceOverlay.
+            node: The TreeNode being wrapped.
+        """
+        self.overlay = overlay
+        self.node = node
+
+        self.pos_ = node.pos_
+        self.orth_ = node.orth_
+        self.lemma_ = node.lemma_
+        self.idx = node.idx
+        self.n_lefts = node.n_lefts
+        self.n_rights = node.n_rights
+        self.pos_id = node.pos_id
+        self.dep_id = node.dep_id
+
+        self.overlay_children = None
+        self.overlay_head = None
+        self.overlay_dep_ = node.dep_
+        self.overlay_no_follow = node.no_follow
+
+    @property
+    def dep_(self):
+        """The dependency tag.
+        """
+        return self.overlay_dep_
+
+    @dep_.setter
+    def dep_(self, dep_):
+        self.overlay_dep_ = dep_
+        self.dep_id = vocabulary.add(dep_)
+        self.overlay.record("dep_", self, dep_)
+
+    @property
+    def no_follow(self):
+        """True if this branch is skipped when the tree is traversed.
+        """
+        return self.overlay_no_follow
+
+    @no_follow.setter
+    def no_follow(self, no_follow):
+        self.overlay_no_follow = no_follow
+        self.overlay.record("no_follow", self, no_follow)
+
+    @property
+    def head(self):
+        """The head/parent node.
+        """
+        if self.overlay_head is None:
+            self.overlay_head = self.overlay.get_node(self.node.head)
+
+        return self.overlay_head
+
+    @head.setter
+    def head(self, head):
+        self.overlay_head = head
+        self.overlay.record("head", self, head)
+
+    @property
+    def children(self):
+        """The list of child nodes.
+        """
+        if self.overlay_children is None:
+            self.overlay_children = OverlayChildren(self.overlay, self,
+                                                    [self.overlay.get_node(child) for child in self.node.children])
+
+        return self.overlay_children
+
+    @property
+    def root(self):
+        """The root node of the tree.
+        """
+        return self.overlay.get_node(self.node.root)
+
+    def is_root(self):
+        """Checks if this node is the tree root.
+
+        Returns:
+            A boolean, True if this node is the root, False otherwise.
+        """
+        return self.head == self
+
+    # the traversals only read the attributes above, so the ones of TreeNode are used as they are
+    walk = TreeNode.walk
+    sort = staticmethod(TreeNode.sort)
+    to_sentence_list = TreeNode.to_sentence_list
+    to_sentence_string = TreeNode.to_sentence_string
+    to_tree_string = TreeNode.to_tree_string
+    comparing_rule_head = TreeNode.comparing_rule_head
+    comparing_rule_child = TreeNode.comparing_rule_child
+    to_comparable_value_as_child = TreeNode.to_comparable_value_as_child
+    to_comparable_value_as_head = TreeNode.to_comparable_value_as_head
+
+    def __str__(self):
+        """Returns the string version of this node.
+
+        Returns:
+            A string constaining a representation of this node.
+        """
+        return self.orth_
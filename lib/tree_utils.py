@@ -1,5 +1,8 @@
+import weakref
+
 from nltk import Tree
 from tree import TreeNode, FullSentence
+from tree_overlay import OverlayNode
 
 
 def to_nltk_tree_general(node, attr_list=("dep_", "pos_"), level=99999):
@@ -14,18 +17,7 @@ def to_nltk_tree_general(node, attr_list=("dep_", "pos_"), level=99999):
     Returns:
         A NLTK Tree (nltk.tree)
     """
-
-    # transforms attributes in a node representation
-    value_list = [getattr(node, attr) for attr in attr_list]
-    node_representation = "/".join(value_list)
-
-    if level == 0:
-        return node_representation
-
-    if node.n_lefts + node.n_rights > 0:
-        return Tree(node_representation, [to_nltk_tree_general(child, attr_list, level-1) for child in node.children])
-    else:
-        return node_representation
+    return build_nltk_tree(node, lambda n: "/".join([getattr(n, attr) for attr in attr_list]), level)
 
 
 def to_nltk_tree(node):
@@ -38,10 +30,45 @@ def to_nltk_tree(node):
     Returns:
         A NLTK Tree (nltk.tree)
     """
-    if node.n_lefts + node.n_rights > 0:
-        return Tree(node.dep_+"/"+node.orth_+"/"+node.pos_, [to_nltk_tree(child) for child in node.children])
-    else:
-        return node.dep_+"/"+node.orth_+"/"+node.pos_
+    return build_nltk_tree(node, lambda n: n.dep_ + "/" + n.orth_ + "/" + n.pos_)
+
+
+def build_nltk_tree(node, get_label, level=99999):
+    """Transforms a Spacy (or TreeNode) dependency tree into an NLTK tree, using an explicit stack instead of
+    recursion so trees of any depth can be transformed. Nodes with children become NLTK trees, and the others (or
+    the ones at the maximum depth) become their label only.
+
+    Args:
+        node: The starting node from the tree in which the transformation will occur.
+        get_label: A function returning the label of a node.
+        level: The maximum depth of the tree.
+
+    Returns:
+        A NLTK Tree (nltk.tree), or a string if the starting node has no children.
+    """
+    result = []
+
+    # each entry holds the list its transformation is appended to and, once its children are pushed, the list
+    # collecting their own transformations
+    stack = [(node, level, result, None)]
+
+    while len(stack) > 0:
+        current, current_level, parent_result, children_result = stack.pop()
+
+        label = get_label(current)
+
+        if current_level == 0 or current.n_lefts + current.n_rights == 0:
+            parent_result.append(label)
+        elif children_result is not None:
+            parent_result.append(Tree(label, children_result))
+        else:
+            children_result = []
+            stack.append((current, current_level, parent_result, children_result))
+
+            for child in reversed(list(current.children)):
+                stack.append((child, current_level - 1, children_result, None))
+
+    return result[0]
 
 
 def print_tree(sent):
@@ -65,28 +92,153 @@ def group_sorting(groups):
     return newlist
 
 
+class GroupSignature(object):
+    __slots__ = ("root", "children", "key", "__weakref__")
+
+    # the signatures still in use, so equal signatures are the same object. They are only referenced weakly, so the
+    # ones no longer used by any group are dropped, e.g.: between the queries of serve
+    interned = weakref.WeakValueDictionary()
+
+    def __init__(self, root, children):
+        """Constructs a GroupSignature. A GroupSignature is the representation of a node used to group the sentences:
+        the label of the node and the sorted labels of its children. It replaces the NLTK tree formerly used for it,
+        as it offers the same label(), iteration and len() and is hashable. Please use GroupSignature.get instead, so
+        signatures are interned.
+
+        Args:
+            root: The label of the node.
+            children: A sorted tuple with the labels of the children.
+        """
+        self.root = root
+        self.children = children
+        self.key = None
+
+    @staticmethod
+    def get(root, children):
+        """Returns the signature with a label and children labels, creating it only the first time.
+
+        Args:
+            root: The label of the node.
+            children: An iterable with the labels of the children, in any order.
+
+        Returns:
+            The GroupSignature object.
+        """
+        children = tuple(sorted(children))
+        signature = GroupSignature.interned.get((root, children))
+
+        if signature is None:
+            signature = GroupSignature(root, children)
+            GroupSignature.interned[(root, children)] = signature
+
+        return signature
+
+    def label(self):
+        """Returns the label of the node, as nltk.Tree.label does.
+
+        Returns:
+            A string with the label.
+        """
+        return self.root
+
+    def __iter__(self):
+        """Iterates through the labels of the children.
+
+        Returns:
+            An iterator of strings.
+        """
+        return iter(self.children)
+
+    def __len__(self):
+        """Returns the number of children.
+
+        Returns:
+            integer
+        """
+        return len(self.children)
+
+    def __eq__(self, other):
+        return isinstance(other, GroupSignature) and (self.root, self.children) == (other.root, other.children)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.root, self.children))
+
+    def __reduce__(self):
+        """Pickles the signature through its labels, so it is interned again when unpickled, e.g.: when returned by
+        the processes applying the rules (see command_simplified.apply_rules_in_pool).
+
+        Returns:
+            A tuple with GroupSignature.get and its parameters.
+        """
+        return GroupSignature.get, (self.root, self.children)
+
+    def get_key(self):
+        """Returns the key of the group of this signature, the same QTREE string nltk_tree_to_qtree returns for its
+        NLTK tree. It is only built the first time.
+
+        Returns:
+            A string with the key.
+        """
+        if self.key is None:
+            self.key = " [  " + self.root + " " + " ".join([" [  " + child + "  ] " for child in self.children]) + \
+                       " ] "
+
+        return self.key
+
+    def to_nltk_tree(self):
+        """Returns the NLTK tree of this signature, for the outputs that need one.
+
+        Returns:
+            A NLTK Tree (nltk.tree)
+        """
+        return Tree(self.root, list(self.children))
+
+    def __str__(self):
+        """Returns the string version of this signature.
+
+        Returns:
+            A string with the key of this signature.
+        """
+        return self.get_key()
+
+
 def get_node_representation(tetre_format, token):
-    """Given a format and a SpaCy node (spacy.token), returns this node representation using the NLTK tree (nltk.tree).
-    It recursivelly builds a NLTK tree and returns it, not only the node itself.
+    """Given a format and a SpaCy node (spacy.token), returns this node representation: the part of speech tag of the
+    node and the labels of its children, as formed by the attributes in the format.
 
     Args:
-        tetre_format: The attributes of this node that will be part of its string representation.
+        tetre_format: The attributes of the children that will be part of their string representation.
         token: The SpaCy node itself (spacy.token).
 
     Returns:
-        A NLTK Tree (nltk.tree)
+        The GroupSignature object.
     """
 
     params = tetre_format.split(",")
-    node_representation = token.pos_
 
     if token.n_lefts + token.n_rights > 0:
-        tree = Tree(node_representation,
-                    [to_nltk_tree_general(child, attr_list=params, level=0) for child in token.children])
-    else:
-        tree = Tree(node_representation, [])
+        return GroupSignature.get(token.pos_, ["/".join([getattr(child, param) for param in params])
+                                               for child in token.children])
+
+    return GroupSignature.get(token.pos_, ())
 
-    return tree
+
+def get_group_key(tree):
+    """Returns the key of the group of sentences represented by a tree.
+
+    Args:
+        tree: The GroupSignature object, or a NLTK Tree (nltk.tree).
+
+    Returns:
+        A string with the key.
+    """
+    if isinstance(tree, GroupSignature):
+        return tree.get_key()
+
+    return nltk_tree_to_qtree(tree)
 
 
 def get_token_representation(tetre_format, token):
@@ -108,44 +260,38 @@ def get_token_representation(tetre_format, token):
     return "/".join(string_representation)
 
 
-def spacynode_to_treenode(spacy_token, parent=None, root=None):
+def spacynode_to_treenode(spacy_token):
     """Transforms a SpaCy node (spacy.token) in a Treenode. A Treenode is a pickable version of a SpaCy token parsed
-    tree. Both parent and root parameters are only used internally, and should not be passed by the caller.
+    tree. The tree is copied with an explicit stack instead of recursion, so trees of any depth can be copied.
 
     Args:
         spacy_token: The SpaCy node itself (spacy.token).
-        parent: The Treenode node parent, if exists (Treenode). This is needed so references are maintained accross the
-            tree as to make traversing possible.
-        root: The Treenode root node, if exists (Treenode). This is needed so references are maintained accross the
-            tree as to make traversing possible.
 
     Returns:
         A Treenode pickable copy of the original SpaCy tree.
     """
 
     # if further attributes are needed on the copied version, this constructor will need change
-    node = TreeNode(spacy_token.dep_, spacy_token.pos_, spacy_token.orth_,
-                    spacy_token.idx, spacy_token.n_lefts, spacy_token.n_rights)
+    def copy_node(token):
+        return TreeNode(token.dep_, token.pos_, token.orth_, token.idx, token.n_lefts, token.n_rights, token.lemma_)
 
-    if isinstance(parent, TreeNode):
-        node.set_head(parent)
-    elif parent is None:
-        node.set_is_root()
-    else:
-        raise ValueError('Unsupported parent node provided to spacy_to_tree2 method')
+    root = copy_node(spacy_token)
+    root.set_is_root()
 
-    if isinstance(root, TreeNode):
-        node.set_root(root)
-    elif root is None:
-        root = node
-        node.set_is_root()
-    else:
-        raise ValueError('Unsupported root node provided to spacy_to_tree2 method')
+    stack = [(spacy_token, root)]
+
+    while len(stack) > 0:
+        token, node = stack.pop()
 
-    for child in spacy_token.children:
-        node.add_child(spacynode_to_treenode(child, node, root))
+        for child in token.children:
+            child_node = copy_node(child)
+            child_node.set_head(node)
+            child_node.set_root(root)
+            node.add_child(child_node)
 
-    return node
+            stack.append((child, child_node))
+
+    return root
 
 
 def spacysentence_to_fullsentence(spacy_sentence, file_id, sentence_id):
@@ -172,6 +318,47 @@ def spacysentence_to_fullsentence(spacy_sentence, file_id, sentence_id):
     return sentence
 
 
+class SpacySentence(object):
+    def __init__(self, spacy_sentence, file_id, sentence_id):
+        """Constructs a SpacySentence. A SpacySentence is a lightweight handle to a sentence of a parsed SpaCy
+        document: the SpaCy span itself, which is only a view of the document through the offsets of its tokens. Its
+        tokens can be looked at without building its FullSentence, which is only built when the sentence is used (see
+        to_fullsentence).
+
+        Args:
+            spacy_sentence: The SpaCy span (spacy.span).
+            file_id: A number identifyng the file being processed.
+            sentence_id: A number identifyng the sentence being processed.
+        """
+        self.spacy_sentence = spacy_sentence
+        self.file_id = file_id
+        self.id = sentence_id
+
+    def __iter__(self):
+        """Iterates through the SpaCy tokens of the sentence, in their original order in the sentence.
+
+        Returns:
+            An iterator of SpaCy tokens (spacy.token).
+        """
+        return iter(self.spacy_sentence)
+
+    def to_fullsentence(self):
+        """Builds the FullSentence of this sentence, with its TreeNode tree.
+
+        Returns:
+            The tree.FullSentence object.
+        """
+        return spacysentence_to_fullsentence(self.spacy_sentence, self.file_id, self.id)
+
+    def __str__(self):
+        """Returns the original string representation of this sentence
+
+         Returns:
+             A string with the sentence.
+         """
+        return str(self.spacy_sentence)
+
+
 def nltk_tree_to_qtree(tree):
     """Transforms a NLTK Tree in a QTREE. A QTREE is a string representation of a tree.
 
@@ -201,7 +388,8 @@ def nltk_tree_to_qtree(tree):
 
 def find_in_spacynode(node, dep, orth):
     """Given certain parameters (dep and orth) and a SpaCy or Treenode tree, returns the node in this tree
-    that matches the parameters.
+    that matches the parameters. The tree is searched depth-first, with an explicit stack instead of recursion, or
+    through the subtree index of its sentence (see tree.SubtreeIndex) when possible.
 
     Args:
         node: The Spacy token (spacy.token) or Treenode tree.
@@ -211,26 +399,29 @@ def find_in_spacynode(node, dep, orth):
     Returns:
         False if nothing is found. Or the Spacy token (spacy.token) or Treenode tree if found.
     """
+    # the copy-on-write nodes the rules work on can use the subtree index of their sentence while unchanged
+    if isinstance(node, OverlayNode) and node.overlay.is_unchanged(node):
+        found = node.overlay.find(node, dep, orth)
+        return False if found is None else found
+
+    stack = [node]
+
+    while len(stack) > 0:
+        current = stack.pop()
+
+        if dep != "" and orth != "":
+            if dep in current.dep_ and orth == current.orth_:
+                return current
+        elif orth != "":
+            if orth == current.orth_:
+                return current
+        elif dep != "":
+            if dep in current.dep_:
+                return current
+
+        stack.extend(reversed(list(current.children)))
 
-    if dep != "" and orth != "":
-        if dep in node.dep_ and orth == node.orth_:
-            return node
-    elif orth != "":
-        if orth == node.orth_:
-            return node
-    elif dep != "":
-        if dep in node.dep_:
-            return node
-
-    if len(node.children) > 0:
-        results = []
-        for child in node.children:
-            results.append(find_in_spacynode(child, dep, orth))
-        for result in results:
-            if result:
-                return result
-
-    return False 
+    return False
 
 
 def merge_nodes(nodes, under=False):
@@ -0,0 +1,116 @@
+class Vocabulary(object):
+    def __init__(self, strings=()):
+        """Constructs a Vocabulary. A Vocabulary maps the dependency tags and part of speech tags of the parsed tokens
+        to small integers, in the order they are first seen, and keeps a single copy of each tag. The rules then
+        compare the ids of the tags through integer set lookups instead of comparing strings. Only the tags are kept,
+        so it stays as small as the tag sets of the parser, whatever the size of the corpus.
+
+        The ids are only valid within a process, they are never stored in the cached trees.
+
+        Args:
+            strings: The initial strings, e.g.: the tags known in advance.
+        """
+        self.ids = {}
+        self.strings = []
+
+        # for each substring being matched, the ids of the strings containing it, kept up to date as strings are added
+        self.containing_ids = {}
+
+        self.update(strings)
+
+    def add(self, string):
+        """Returns the id of a string, adding it to the vocabulary if needed.
+
+        Args:
+            string: The string.
+
+        Returns:
+            An integer with the id of the string.
+        """
+        string_id = self.ids.get(string)
+
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[string] = string_id
+            self.strings.append(string)
+
+            for part, ids in self.containing_ids.items():
+                if part in string:
+                    ids.add(string_id)
+
+        return string_id
+
+    def update(self, strings):
+        """Adds several strings to the vocabulary.
+
+        Args:
+            strings: An iterable of strings.
+        """
+        for string in strings:
+            self.add(string)
+
+    def intern(self, string):
+        """Returns the single copy of a string kept by the vocabulary, adding it if needed.
+
+        Args:
+            string: The string.
+
+        Returns:
+            The string kept by the vocabulary.
+        """
+        return self.strings[self.add(string)]
+
+    def get_ids(self, strings):
+        """Returns the ids of several strings, as used by the rules to match tags.
+
+        Args:
+            strings: An iterable of strings.
+
+        Returns:
+            A frozenset with the ids.
+        """
+        return frozenset(self.add(string) for string in strings)
+
+    def containing(self, part):
+        """Returns the ids of all the strings containing a substring, e.g.: "subj" matches "nsubj" and "csubjpass".
+        The set is kept up to date as new strings are added, so it can be kept by the rules.
+
+        Each substring is kept for the life of the process and checked against every new string, so this is only meant
+        for the fixed substrings of the rules, never for ones given by the user, e.g.: in a query of serve.
+
+        Args:
+            part: The substring.
+
+        Returns:
+            A set with the ids.
+        """
+        ids = self.containing_ids.get(part)
+
+        if ids is None:
+            ids = set(string_id for string_id, string in enumerate(self.strings) if part in string)
+            self.containing_ids[part] = ids
+
+        return ids
+
+    def __getitem__(self, string_id):
+        """Returns the string with a given id.
+
+        Args:
+            string_id: The id of the string.
+
+        Returns:
+            The string.
+        """
+        return self.strings[string_id]
+
+    def __len__(self):
+        """Returns the number of strings in the vocabulary.
+
+        Returns:
+            integer
+        """
+        return len(self.strings)
+
+
+# the vocabulary shared by the parser, the cache and the rules
+vocabulary = Vocabulary()
@@ -0,0 +1,56 @@
+from tree_overlay import SentenceOverlay
+from tree_utils import get_node_representation
+from tetre.graph_processing import Growth, Process
+
+from tree_builder import build_sentence, find_token
+
+
+def apply_growth(sentence, orth_, dispatch_by_triggers=True):
+    """Applies the growth rules alone to a token.
+
+    Returns:
+        A tuple with the sorted nodes of the resulting GroupSignature and the rules applied.
+    """
+    token = SentenceOverlay(sentence).get_node(find_token(sentence, orth_))
+
+    growth = Growth()
+    growth.dispatch_by_triggers = dispatch_by_triggers
+    tree, applied = growth.apply(get_node_representation("dep_", token), token)
+
+    return sorted(tree), applied
+
+
+def test_growth_translates_the_tags_without_triggers():
+    # neither xcomp, ccomp nor prep, so none of the rules translating the tags before is applied
+    sentence = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubjpass", "NOUN", "recall", []), ("iobj", "NOUN", "users", []), ("advmod", "ADV", "greatly", []),
+        ("dobj", "NOUN", "ranking", [])]))
+
+    assert apply_growth(sentence, "improves") == (["mod", "obj", "subj"], [])
+    assert apply_growth(sentence, "improves", dispatch_by_triggers=False) == (["mod", "obj", "subj"], [])
+
+
+def test_growth_translates_the_tags_after_the_triggered_rules():
+    sentence = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "factorization", []), ("prep", "ADP", "in", [("pobj", "NOUN", "predicting", [])]),
+        ("advmod", "ADV", "greatly", [])]))
+
+    assert apply_growth(sentence, "improves") == (["mod", "obj", "subj"], ["Growth.transform_prep_in_to_dobj"])
+
+
+def test_all_rules_give_the_same_signature_with_or_without_triggers():
+    sentence = build_sentence(("ROOT", "VERB", "shows", [
+        ("nsubj", "NOUN", "work", []),
+        ("ccomp", "VERB", "improves", [("nsubj", "NOUN", "retrieval", []), ("xcomp", "VERB", "ranking", []),
+                                       ("punct", "PUNCT", ",", []), ("npadvmod", "NOUN", "time", [])])]))
+
+    token = SentenceOverlay(sentence).get_node(find_token(sentence, "improves"))
+    tree, applied = Process().apply_all(get_node_representation("dep_", token), token)
+
+    process = Process()
+    for rule_applier in [process.growth, process.reduction]:
+        rule_applier.dispatch_by_triggers = False
+
+    token = SentenceOverlay(sentence).get_node(find_token(sentence, "improves"))
+    assert process.apply_all(get_node_representation("dep_", token), token) == (tree, applied)
+    assert sorted(tree) == ["mod", "obj", "subj"]
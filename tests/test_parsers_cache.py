@@ -0,0 +1,150 @@
+import os
+import argparse
+
+import pytest
+
+# the cache imports the parsing backend, which needs SpaCy
+pytest.importorskip("spacy")
+
+import parsers_cache
+from directories import dirs
+
+from tree_builder import build_sentence, describe_tokens
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """Points the input and cache folders to a temporary folder, and replaces the parser by one reading a sentence
+    with a single token out of each line of the input files.
+
+    Returns:
+        A tuple with the input folder and the list of the files parsed by each update of the cache.
+    """
+    input_path = tmp_path / "input"
+    input_path.mkdir()
+
+    monkeypatch.setitem(dirs["raw_input"], "path", str(input_path) + os.sep)
+    monkeypatch.setitem(dirs["output_cache_corpus"], "path", str(tmp_path / "cache") + os.sep)
+
+    parsed = []
+
+    def get_corpus(argv, files):
+        parsed.append(sorted(os.path.basename(name) for file_id, name in files))
+
+        corpus = []
+        for file_id, name in files:
+            with open(name) as f:
+                lines = f.read().split()
+
+            corpus.append([build_sentence(("ROOT", "NOUN", line, []), file_id, sentence_id)
+                           for sentence_id, line in enumerate(lines)])
+
+        return corpus
+
+    monkeypatch.setattr(parsers_cache, "get_corpus", get_corpus)
+
+    return input_path, parsed
+
+
+def get_argv(cache_format="pickle", force_clean=False):
+    """Returns the command line arguments used by the cache.
+    """
+    return argparse.Namespace(tetre_cache_format=cache_format, tetre_force_clean=force_clean)
+
+
+def write_file(input_path, fn, contents):
+    """Writes an input file.
+    """
+    (input_path / fn).write_text(contents)
+
+
+def get_shard_words(manifest, fn):
+    """Returns the words of the sentences of an input file, as they were cached.
+    """
+    sentences = parsers_cache.load_shard(manifest["files"][fn]["file_id"], manifest["format"])
+    return [str(sentence) for sentence in sentences]
+
+
+def test_only_new_or_changed_files_are_parsed(corpus):
+    input_path, parsed = corpus
+
+    write_file(input_path, "paper1.txt", "caching\nrecall\n")
+    write_file(input_path, "paper2.txt", "ranking\n")
+
+    manifest = parsers_cache.update_corpus_cache(get_argv())
+    assert parsed == [["paper1.txt", "paper2.txt"]]
+    assert [manifest["files"][fn]["file_id"] for fn in ["paper1.txt", "paper2.txt"]] == [1, 2]
+
+    again = parsers_cache.update_corpus_cache(get_argv())
+    assert len(parsed) == 1
+    assert again["signature"] == manifest["signature"]
+
+    write_file(input_path, "paper2.txt", "scaling\nskew\n")
+
+    changed = parsers_cache.update_corpus_cache(get_argv())
+    assert parsed[1:] == [["paper2.txt"]]
+    assert changed["files"]["paper2.txt"]["file_id"] == 2
+    assert changed["signature"] != manifest["signature"]
+    assert get_shard_words(changed, "paper2.txt") == ["scaling", "skew"]
+    assert get_shard_words(changed, "paper1.txt") == ["caching", "recall"]
+
+
+def test_touched_files_are_not_parsed_again(corpus):
+    input_path, parsed = corpus
+
+    write_file(input_path, "paper1.txt", "caching\n")
+    manifest = parsers_cache.update_corpus_cache(get_argv())
+
+    stat = os.stat(str(input_path / "paper1.txt"))
+    os.utime(str(input_path / "paper1.txt"), (stat.st_atime + 10, stat.st_mtime + 10))
+
+    touched = parsers_cache.update_corpus_cache(get_argv())
+    assert len(parsed) == 1
+    assert touched["signature"] == manifest["signature"]
+    assert touched["files"]["paper1.txt"]["mtime"] == stat.st_mtime + 10
+
+
+def test_file_ids_are_stable(corpus):
+    input_path, parsed = corpus
+
+    write_file(input_path, "paper2.txt", "caching\n")
+    write_file(input_path, "paper3.txt", "recall\n")
+    manifest = parsers_cache.update_corpus_cache(get_argv())
+    assert [manifest["files"][fn]["file_id"] for fn in ["paper2.txt", "paper3.txt"]] == [1, 2]
+
+    # the new file comes first in the folder, but it does not take the id of another file
+    write_file(input_path, "paper1.txt", "ranking\n")
+    os.remove(str(input_path / "paper3.txt"))
+
+    updated = parsers_cache.update_corpus_cache(get_argv())
+    assert parsed[1:] == [["paper1.txt"]]
+    assert sorted(updated["files"]) == ["paper1.txt", "paper2.txt"]
+    assert [updated["files"][fn]["file_id"] for fn in ["paper1.txt", "paper2.txt"]] == [3, 1]
+    assert updated["next_file_id"] == 4
+
+    # the shard of the deleted file was dropped
+    assert sorted(os.listdir(dirs["output_cache_corpus"]["path"])) == \
+        ["manifest.pickle", "shard-1.spacy", "shard-3.spacy"]
+
+
+def test_cache_format_change_parses_everything_again(corpus):
+    input_path, parsed = corpus
+
+    write_file(input_path, "paper1.txt", "caching\nrecall\n")
+    write_file(input_path, "paper2.txt", "ranking\n")
+    pickled = parsers_cache.update_corpus_cache(get_argv())
+    pickled_sentences = [parsers_cache.load_shard(file_id, "pickle") for file_id in [1, 2]]
+
+    columnar = parsers_cache.update_corpus_cache(get_argv("columnar"))
+    assert parsed == [["paper1.txt", "paper2.txt"], ["paper1.txt", "paper2.txt"]]
+    assert columnar["files"] == pickled["files"]
+    assert sorted(os.listdir(dirs["output_cache_corpus"]["path"])) == \
+        ["manifest.pickle", "shard-1.columnar", "shard-2.columnar"]
+
+    # both formats give the same sentences
+    for file_id, sentences in zip([1, 2], pickled_sentences):
+        assert [describe_tokens(sentence.to_fullsentence()) for sentence in
+                parsers_cache.load_shard(file_id, "columnar")] == [describe_tokens(sentence) for sentence in sentences]
+
+    parsers_cache.update_corpus_cache(get_argv("columnar", force_clean=True))
+    assert len(parsed) == 3
@@ -0,0 +1,111 @@
+from parsers_index import TokenIndex
+from tree_columnar import dumps, loads
+
+from tree_builder import build_sentence
+
+
+def get_sentences():
+    """Returns a few sentences of two files, with "improves" and "improved" sharing their lemma.
+    """
+    sentences = [
+        build_sentence(("ROOT", "VERB", "improves", [
+            ("nsubj", "NOUN", "Caching", []), ("dobj", "NOUN", "recall", [])]), 1, 1),
+        build_sentence(("ROOT", "VERB", "shows", [
+            ("nsubj", "NOUN", "caching", []), ("ccomp", "VERB", "improved", [("dobj", "NOUN", "recall", [])])]), 1, 2),
+        build_sentence(("ROOT", "VERB", "improves", [("dobj", "NOUN", "ranking", [])]), 2, 1),
+    ]
+
+    for token in sentences[1]:
+        if token.orth_ == "improved":
+            token.lemma_ = "improves"
+
+    return sentences
+
+
+def get_sentence_getter(sentences):
+    """Returns a function giving a sentence by its file id and sentence id, as parsers_store.SentenceStore does,
+    along with the list of the sentences it gave.
+    """
+    by_id = dict(((sentence.file_id, sentence.id), sentence) for sentence in sentences)
+    given = []
+
+    def get_sentence(file_id, sentence_id):
+        given.append((file_id, sentence_id))
+        return by_id[(file_id, sentence_id)]
+
+    return get_sentence, given
+
+
+def test_lookup():
+    index = TokenIndex.build(get_sentences())
+
+    assert index.lookup("improves") == [(1, 1, 0), (2, 1, 0)]
+    assert index.lookup("CACHING") == [(1, 1, 10), (1, 2, 10)]
+    assert index.lookup("missing") == []
+
+
+def test_lookup_by_lemma():
+    index = TokenIndex.build(get_sentences())
+
+    assert index.lookup("improved") == [(1, 2, 20)]
+    assert index.lookup("improved", by_lemma=True) == [(1, 1, 0), (1, 2, 20), (2, 1, 0)]
+    assert index.lookup("improves", by_lemma=True) == index.lookup("improved", by_lemma=True)
+
+
+def test_get_tokens():
+    sentences = get_sentences()
+    index = TokenIndex.build(sentences)
+    get_sentence, given = get_sentence_getter(sentences)
+
+    tokens = list(index.get_tokens(get_sentence, "recall"))
+
+    assert [(token.orth_, token.idx, sentence.file_id, sentence.id) for token, sentence in tokens] == \
+        [("recall", 20, 1, 1), ("recall", 30, 1, 2)]
+    assert all(token is sentence.get_token(token.idx) for token, sentence in tokens)
+    assert given == [(1, 1), (1, 2)]
+
+
+def test_get_tokens_by_word_reads_each_sentence_once():
+    sentences = get_sentences()
+    index = TokenIndex.build(sentences)
+    get_sentence, given = get_sentence_getter(sentences)
+
+    tokens = list(index.get_tokens_by_word(get_sentence, ["recall", "improves", "caching"]))
+
+    assert [(word, token.idx, sentence.file_id, sentence.id) for word, token, sentence in tokens] == \
+        [("improves", 0, 1, 1), ("caching", 10, 1, 1), ("recall", 20, 1, 1), ("caching", 10, 1, 2),
+         ("recall", 30, 1, 2), ("improves", 0, 2, 1)]
+    assert given == [(1, 1), (1, 2), (2, 1)]
+
+    # the same tokens as looking the words up one after the other
+    for word in ["recall", "improves", "caching"]:
+        assert [(token.idx, sentence.file_id, sentence.id) for token, sentence in
+                index.get_tokens(get_sentence, word)] == \
+            [(token.idx, sentence.file_id, sentence.id) for found, token, sentence in tokens if found == word]
+
+
+def test_columnar_sentences_give_the_same_index():
+    sentences = get_sentences()
+
+    assert TokenIndex.build(loads(dumps(sentences))).entries == TokenIndex.build(sentences).entries
+
+
+def test_save_open_round_trip(tmp_path):
+    sentences = get_sentences()
+    path = str(tmp_path / "index")
+
+    assert TokenIndex.open(path) is None
+
+    index = TokenIndex.build(sentences)
+    index.set_signature("signature")
+    index.save(path)
+
+    saved = TokenIndex.open(path)
+    try:
+        assert saved.get_signature() == "signature"
+
+        for word in ["improves", "improved", "caching", "recall", "missing"]:
+            assert saved.lookup(word) == index.lookup(word)
+            assert saved.lookup(word, by_lemma=True) == index.lookup(word, by_lemma=True)
+    finally:
+        saved.close()
@@ -0,0 +1,110 @@
+from tree_overlay import SentenceOverlay
+from tree_utils import get_node_representation
+from tetre.graph_processing import Process
+from tetre.rule_memo import RuleMemo
+
+from tree_builder import build_sentence, find_token, describe_tree
+
+
+def apply_rules(process, sentence, orth_):
+    """Applies the growth and reduction rules to a token, as CommandSimplifiedGroup does.
+
+    Returns:
+        A tuple with the resulting GroupSignature, the rules applied, the head of the token and its tree.
+    """
+    token = SentenceOverlay(sentence).get_node(find_token(sentence, orth_))
+    tree, applied = process.apply_all(get_node_representation("dep_", token), token)
+
+    return tree, applied, token.head.orth_, describe_tree(token)
+
+
+def apply_memoized(seed, sentence, orth_):
+    """Applies the rules to the token of a seed sentence and then to the one of another sentence with the same memo,
+    checking the latter gives the same outcome as without the memo.
+
+    Returns:
+        A tuple with the outcome for the seed sentence, the one for the other sentence and the RuleMemo object.
+    """
+    memo = RuleMemo()
+    process = Process()
+    process.set_memo(memo)
+
+    seeded = apply_rules(process, seed, orth_)
+    memoized = apply_rules(process, sentence, orth_)
+
+    assert memoized == apply_rules(Process(), sentence, orth_)
+
+    return seeded, memoized, memo
+
+
+def test_relcl_head_moved_under_the_token_is_replayed():
+    seed = build_sentence(("ROOT", "NOUN", "area", [
+        ("relcl", "VERB", "improves", [("nsubj", "DET", "which", []), ("dobj", "NOUN", "relevance", [])])]))
+    sentence = build_sentence(("ROOT", "NOUN", "work", [
+        ("det", "DET", "the", []),
+        ("relcl", "VERB", "improves", [("nsubj", "DET", "that", []), ("dobj", "NOUN", "ranking", [])])]))
+
+    seeded, memoized, memo = apply_memoized(seed, sentence, "improves")
+
+    assert "Growth.replace_subj_if_dep_is_relcl_or_ccomp" in memoized[1]
+    assert [child[0] for child in memoized[3][4]] == ["ranking", "work"]
+    assert memo.stats["Growth"]["hits"] == 1
+
+
+def test_ccomp_subject_part_of_speech_is_part_of_the_key():
+    seed = build_sentence(("ROOT", "VERB", "shows", [
+        ("ccomp", "VERB", "improves", [("nsubj", "PROPN", "GeckoFTL", []), ("dobj", "NOUN", "skew", [])])]))
+    sentence = build_sentence(("ROOT", "VERB", "shows", [
+        ("ccomp", "VERB", "improves", [("nsubj", "DET", "this", []), ("dobj", "NOUN", "skew", [])])]))
+
+    seeded, memoized, memo = apply_memoized(seed, sentence, "improves")
+
+    assert "Growth.replace_subj_if_dep_is_relcl_or_ccomp" not in seeded[1]
+    assert "Growth.replace_subj_if_dep_is_relcl_or_ccomp" in memoized[1]
+    assert memo.stats["Growth"]["hits"] == 0
+
+
+def test_subj_token_taking_its_head_as_dobj_is_replayed():
+    seed = build_sentence(("ROOT", "VERB", "extends", [
+        ("csubj", "VERB", "improves", [("nsubj", "PRON", "which", [])]), ("dobj", "NOUN", "approach", [])]))
+    sentence = build_sentence(("ROOT", "VERB", "helps", [
+        ("csubj", "VERB", "improves", [("nsubj", "PRON", "it", [])]), ("dobj", "NOUN", "recall", [])]))
+
+    seeded, memoized, memo = apply_memoized(seed, sentence, "improves")
+
+    assert "Growth.add_dobj_if_dep_is_subj" in memoized[1]
+    assert ("helps", "dobj") == memoized[3][4][-1][:2]
+    assert memo.stats["Growth"]["hits"] == 1
+
+
+def test_prep_in_becomes_an_obj_only_for_in():
+    seed = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "factorization", []), ("prep", "ADP", "in", [("pobj", "NOUN", "predicting", [])])]))
+    same = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "caching", []), ("prep", "ADP", "in", [("pobj", "NOUN", "scaling", [])])]))
+    other = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "caching", []), ("prep", "ADP", "on", [("pobj", "NOUN", "both", [])])]))
+
+    seeded, memoized, memo = apply_memoized(seed, same, "improves")
+
+    assert "Growth.transform_prep_in_to_dobj" in memoized[1]
+    assert ("in", "obj") == memoized[3][4][1][:2]
+    assert memo.stats["Growth"]["hits"] == 1
+
+    seeded, memoized, memo = apply_memoized(seed, other, "improves")
+
+    assert "Growth.transform_prep_in_to_dobj" not in memoized[1]
+    assert memo.stats["Growth"]["hits"] == 0
+
+
+def test_merged_subjects_are_not_replayed():
+    seed = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "method", []), ("nsubj", "PROPN", "ORCLUS", []), ("dobj", "PROPN", "PROCLUS", [])]))
+    sentence = build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "approach", []), ("nsubj", "PROPN", "LRA", []), ("dobj", "NOUN", "recall", [])]))
+
+    seeded, memoized, memo = apply_memoized(seed, sentence, "improves")
+
+    assert "Reduction.merge_multiple_subj_or_dobj" in memoized[1]
+    assert memo.stats["Reduction"]["not_replayable"] == 1
+    assert memo.stats["Reduction"]["hits"] == 0
@@ -0,0 +1,105 @@
+from tree import TreeNode, FullSentence
+from tree_columnar import StringPool, ColumnarSentence, fullsentence_to_columns, columns_to_fullsentence, \
+    to_columnar, dumps, loads, materialize
+
+from tree_builder import build_sentence, describe_tokens
+
+
+def build_sentence_with_lefts(file_id=1, sentence_id=1):
+    """Builds "The method improves recall .", in which the root has children on both sides, as SpaCy would have
+    parsed it (build_sentence only places children to the right of their heads).
+    """
+    words = [("det", "DET", "The", "the"), ("nsubj", "NOUN", "method", "method"),
+             ("ROOT", "VERB", "improves", "improve"),
+             ("dobj", "NOUN", "recall", "recall"), ("punct", "PUNCT", ".", ".")]
+    heads = [1, 2, 2, 2, 2]
+
+    nodes = []
+    idx = 0
+    for dep_, pos_, orth_, lemma_ in words:
+        nodes.append(TreeNode(dep_, pos_, orth_, idx, 0, 0, lemma_))
+        idx += len(orth_) + 1
+
+    for position, node in enumerate(nodes):
+        if heads[position] == position:
+            continue
+
+        head = nodes[heads[position]]
+        node.set_head(head)
+        head.add_child(node)
+
+        if position < heads[position]:
+            head.n_lefts += 1
+        else:
+            head.n_rights += 1
+
+    for node in nodes:
+        node.set_root(nodes[2])
+
+    sentence = FullSentence(nodes[2], file_id, sentence_id)
+    sentence.set_string_representation("The method improves recall.")
+
+    return sentence
+
+
+def get_sentences():
+    """Returns a few sentences of two files, as they would be in a shard.
+    """
+    return [
+        build_sentence_with_lefts(3, 1),
+        build_sentence(("ROOT", "VERB", "improves", [
+            ("nsubj", "NOUN", "caching", []), ("prep", "ADP", "in", [("pobj", "NOUN", "scaling", [])])]), 3, 2),
+        build_sentence(("ROOT", "NOUN", "area", [
+            ("relcl", "VERB", "improves", [("nsubj", "DET", "which", []), ("dobj", "NOUN", "relevance", [])])]), 4, 1),
+    ]
+
+
+def test_columns_round_trip_keeps_the_tree():
+    for sentence in get_sentences():
+        pool = StringPool()
+        data = fullsentence_to_columns(sentence, pool)
+        rebuilt = columns_to_fullsentence(pool.strings, sentence.file_id, sentence.id, pool.add(str(sentence)), data)
+
+        assert describe_tokens(rebuilt) == describe_tokens(sentence)
+        assert (rebuilt.file_id, rebuilt.id, str(rebuilt)) == (sentence.file_id, sentence.id, str(sentence))
+        assert all(token.root is rebuilt.root for token in rebuilt)
+
+
+def test_string_pool_stores_each_string_once():
+    pool = StringPool()
+
+    assert [pool.add(string) for string in ["nsubj", "NOUN", "nsubj", "method", "NOUN"]] == [0, 1, 0, 2, 1]
+    assert pool.strings == ["nsubj", "NOUN", "method"]
+
+
+def test_dumps_loads_round_trip():
+    sentences = get_sentences()
+    loaded = loads(dumps(sentences))
+
+    assert all(isinstance(sentence, ColumnarSentence) for sentence in loaded)
+    assert [(sentence.file_id, sentence.id, str(sentence)) for sentence in loaded] == \
+        [(sentence.file_id, sentence.id, str(sentence)) for sentence in sentences]
+
+    for sentence, columnar in zip(sentences, loaded):
+        assert describe_tokens(columnar.to_fullsentence()) == describe_tokens(sentence)
+        assert materialize(columnar) is columnar.to_fullsentence()
+
+
+def test_columnar_tokens_without_materializing():
+    sentence = build_sentence_with_lefts()
+    columnar = loads(dumps([sentence]))[0]
+
+    assert len(columnar) == 5
+    assert [(token.orth_, token.lemma_, token.idx) for token in columnar] == \
+        [(token.orth_, token.lemma_, token.idx) for token in sentence]
+
+    assert columnar.get_token(11).orth_ == "improves"
+    assert columnar.get_token(12) is None
+    assert columnar.full_sentence is None
+
+
+def test_to_columnar_gives_the_same_sentences_as_dumps():
+    sentences = get_sentences()
+
+    assert [describe_tokens(materialize(sentence)) for sentence in to_columnar(sentences)] == \
+        [describe_tokens(materialize(sentence)) for sentence in loads(dumps(sentences))]
@@ -0,0 +1,69 @@
+from tree_overlay import SentenceOverlay
+
+from tree_builder import build_sentence, find_token, describe_tree, describe_tokens
+
+
+def get_sentence():
+    """Returns a sentence whose subject is a relative clause, as the rules change them.
+    """
+    return build_sentence(("ROOT", "VERB", "shows", [
+        ("nsubj", "NOUN", "work", [
+            ("relcl", "VERB", "improves", [("nsubj", "DET", "that", []), ("dobj", "NOUN", "ranking", [])])]),
+        ("dobj", "NOUN", "results", [])]))
+
+
+def test_nodes_are_wrapped_once():
+    sentence = get_sentence()
+    overlay = SentenceOverlay(sentence)
+    token = find_token(sentence, "improves")
+
+    assert overlay.get_node(token) is overlay.get_node(token)
+    assert overlay.get_token(token.idx) is overlay.get_node(token)
+    assert overlay.get_token(token.idx + 1) is None
+    assert overlay.root is overlay.get_node(sentence.root)
+    assert overlay.get_node(token).head is overlay.get_node(find_token(sentence, "work"))
+    assert describe_tree(overlay.root) == describe_tree(sentence.root)
+    assert overlay.edits == []
+
+
+def test_edits_are_recorded_and_the_sentence_is_unchanged():
+    sentence = get_sentence()
+    before = describe_tokens(sentence)
+    overlay = SentenceOverlay(sentence)
+
+    token = overlay.get_node(find_token(sentence, "improves"))
+    work = token.head
+    subject = token.children.pop(0)
+
+    token.dep_ = "ROOT"
+    subject.no_follow = True
+    work.head = token
+    token.children.append(work)
+
+    assert overlay.edits == [("remove", token, subject), ("dep_", token, "ROOT"), ("no_follow", subject, True),
+                             ("head", work, token), ("append", token, work)]
+    assert overlay.changed_nodes == [token.node, token.node, token.node]
+
+    assert [child.orth_ for child in token.children] == ["ranking", "work"]
+    assert work.head is token
+    assert subject.no_follow
+
+    assert describe_tokens(sentence) == before
+    assert not find_token(sentence, "that").no_follow
+
+
+def test_unchanged_subtrees():
+    sentence = get_sentence()
+    overlay = SentenceOverlay(sentence)
+
+    token = overlay.get_node(find_token(sentence, "improves"))
+    results = overlay.get_node(find_token(sentence, "results"))
+
+    assert overlay.is_unchanged(overlay.root)
+    assert overlay.find(overlay.root, "dobj", "ranking") is overlay.get_node(find_token(sentence, "ranking"))
+
+    token.dep_ = "ccomp"
+
+    assert not overlay.is_unchanged(overlay.root)
+    assert not overlay.is_unchanged(token)
+    assert overlay.is_unchanged(results)
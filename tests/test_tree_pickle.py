@@ -0,0 +1,95 @@
+import copy
+import pickle
+
+import pytest
+
+from tree import TreeNode, flatten_tree, build_tree, get_flat_nodes
+
+from tree_builder import build_sentence, find_token, describe_tree, describe_tokens
+
+
+def get_sentence():
+    """Returns a sentence with a few levels of nodes.
+    """
+    return build_sentence(("ROOT", "VERB", "improves", [
+        ("nsubj", "NOUN", "method", [("det", "DET", "the", [])]),
+        ("dobj", "NOUN", "recall", [("amod", "ADJ", "overall", [])]),
+        ("prep", "ADP", "in", [("pobj", "NOUN", "scaling", [])])]), 7, 3)
+
+
+def test_flatten_build_round_trip():
+    sentence = get_sentence()
+    root = build_tree(*flatten_tree(sentence.root))
+
+    assert describe_tree(root) == describe_tree(sentence.root)
+    assert [(node.lemma_, node.idx, node.n_lefts, node.n_rights) for node in root.to_sentence_list()] == \
+        [(node.lemma_, node.idx, node.n_lefts, node.n_rights) for node in sentence]
+    assert all(node.root is root for node in root.to_sentence_list())
+    assert all(child.head is node for node in root.to_sentence_list() for child in node.children)
+
+
+def test_flatten_build_keeps_the_unusual_links():
+    sentence = get_sentence()
+    outside = TreeNode("ROOT", "VERB", "shows", 1000, 0, 1)
+
+    find_token(sentence, "in").no_follow = True
+    find_token(sentence, "scaling").head = find_token(sentence, "improves")
+    sentence.root.head = outside
+
+    root = build_tree(*flatten_tree(sentence.root))
+    nodes = dict((node.orth_, node) for node in get_flat_nodes(root)[0])
+
+    assert nodes["in"].no_follow
+    assert not nodes["recall"].no_follow
+    assert nodes["scaling"].head is root
+    assert nodes["scaling"] in nodes["in"].children
+    assert root.head is outside
+
+
+def test_build_tree_refuses_other_versions():
+    version, strings, first_idx, columns, links = flatten_tree(get_sentence().root)
+
+    with pytest.raises(ValueError):
+        build_tree(version - 1, strings, first_idx, columns, links)
+
+
+def test_pickle_round_trip():
+    sentence = get_sentence()
+    loaded = pickle.loads(pickle.dumps(sentence))
+
+    assert describe_tokens(loaded) == describe_tokens(sentence)
+    assert (loaded.file_id, loaded.id, str(loaded)) == (sentence.file_id, sentence.id, str(sentence))
+
+
+def test_pickled_tokens_keep_referencing_their_sentence():
+    sentence = get_sentence()
+    tokens = [find_token(sentence, "scaling"), find_token(sentence, "method"), sentence.root]
+
+    loaded_sentence, loaded_tokens = pickle.loads(pickle.dumps((sentence, tokens)))
+
+    for token, loaded_token in zip(tokens, loaded_tokens):
+        assert loaded_token is loaded_sentence.get_token(token.idx)
+
+
+def test_pickled_tokens_of_several_sentences():
+    sentences = [get_sentence(), build_sentence(("ROOT", "NOUN", "area", [("amod", "ADJ", "new", [])]))]
+    tokens = [(sentence, token) for sentence in sentences for token in sentence]
+
+    loaded = pickle.loads(pickle.dumps(tokens))
+
+    assert [(str(sentence), token.orth_, token.idx) for sentence, token in loaded] == \
+        [(str(sentence), token.orth_, token.idx) for sentence, token in tokens]
+    assert all(token is sentence.get_token(token.idx) for sentence, token in loaded)
+
+
+def test_deepcopy_is_independent():
+    sentence = get_sentence()
+    copied = copy.deepcopy(sentence)
+
+    assert describe_tokens(copied) == describe_tokens(sentence)
+
+    find_token(copied, "recall").dep_ = "obj"
+    find_token(copied, "improves").children.pop()
+
+    assert find_token(sentence, "recall").dep_ == "dobj"
+    assert len(sentence.root.children) == 3
@@ -0,0 +1,80 @@
+from tree import TreeNode, FullSentence
+
+
+def build_sentence(spec, file_id=1, sentence_id=1):
+    """Builds a sentence out of nested tuples, as SpaCy would have parsed it.
+
+    Args:
+        spec: A tuple (dep_, pos_, orth_, children) for the root, with a list of tuples of the same form as children.
+            The idx of the nodes follow the order of the tuples.
+        file_id: The id of the file of the sentence.
+        sentence_id: The id of the sentence.
+
+    Returns:
+        The tree.FullSentence object.
+    """
+    position = [0]
+
+    def build(node_spec, head):
+        dep_, pos_, orth_, children = node_spec
+
+        node = TreeNode(dep_, pos_, orth_, position[0] * 10, 0, len(children), orth_.lower())
+        position[0] += 1
+
+        if head is not None:
+            node.set_head(head)
+            node.set_root(head.root)
+            head.add_child(node)
+
+        for child_spec in children:
+            build(child_spec, node)
+
+        return node
+
+    root = build(spec, None)
+
+    sentence = FullSentence(root, file_id, sentence_id)
+    sentence.set_string_representation(" ".join(token.orth_ for token in sentence))
+
+    return sentence
+
+
+def find_token(sentence, orth_):
+    """Returns the first node of a sentence with a given orthography.
+
+    Args:
+        sentence: The tree.FullSentence object.
+        orth_: The orthography.
+
+    Returns:
+        The TreeNode object.
+    """
+    return [token for token in sentence if token.orth_ == orth_][0]
+
+
+def describe_tree(node):
+    """Describes a tree as nested tuples, with every attribute the rules can change, so trees can be compared.
+
+    Args:
+        node: The TreeNode (or OverlayNode) at the top of the tree.
+
+    Returns:
+        A tuple (orth_, dep_, pos_, no_follow, children).
+    """
+    return (node.orth_, node.dep_, node.pos_, node.no_follow,
+            tuple(describe_tree(child) for child in node.children))
+
+
+def describe_tokens(sentence):
+    """Describes every token of a sentence, with the attributes kept by the caches, so sentences read back from a
+    cache can be compared with the ones written to it.
+
+    Args:
+        sentence: The tree.FullSentence object.
+
+    Returns:
+        A list of tuples (orth_, lemma_, dep_, pos_, idx, n_lefts, n_rights, idx of the head, orth_ of the children),
+        in sentence order.
+    """
+    return [(token.orth_, token.lemma_, token.dep_, token.pos_, token.idx, token.n_lefts, token.n_rights,
+             token.head.idx, [child.orth_ for child in token.children]) for token in sentence]